@@ -0,0 +1,92 @@
+"""Runs the benchmark suite and compares it against the stored baseline.
+
+Run from the repository root::
+
+    python -m benchmarks                  # all suites, compared to baseline.json
+    python -m benchmarks chat --quick     # only the chat suite, without the largest inputs
+    python -m benchmarks --save-baseline  # store the results as the new baseline
+
+The results are printed as JSON. The exit status is 1 if any benchmark is
+slower than its baseline by more than its threshold. Baselines are only
+meaningful on the machine that recorded them.
+"""
+from __future__ import division, print_function
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+from . import bench_chat, bench_import, bench_steamid
+from .harness import compare
+
+SUITES = {
+    "steamid": lambda args: bench_steamid.run(args.repeat),
+    "chat": lambda args: bench_chat.run(args.repeat, args.quick),
+    "import": lambda args: bench_import.run(args.repeat)
+}
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# import timing includes starting an interpreter and is noisier
+DEFAULT_THRESHOLDS = {"import:" + module: 0.5 for module in bench_import.MODULES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("suites", nargs="*",
+                        help="suites to run: {}; all by default".format(", ".join(sorted(SUITES))))
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed rounds per benchmark")
+    parser.add_argument("--quick", action="store_true",
+                        help="skip the largest inputs")
+    parser.add_argument("--baseline", default=BASELINE,
+                        help="baseline file to compare against or save to")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the results as the baseline instead of comparing")
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error("unknown suites: " + ", ".join(sorted(unknown)))
+
+    results = {}
+    for suite in args.suites or sorted(SUITES):
+        results.update(SUITES[suite](args))
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+
+    if args.save_baseline:
+        baseline = {"python": report["python"], "platform": report["platform"],
+                    "results": results, "thresholds": DEFAULT_THRESHOLDS}
+        if os.path.exists(args.baseline):
+            with io.open(args.baseline, encoding="utf-8") as f:
+                previous = json.load(f)
+            # keep results of suites which were not run this time
+            previous["results"].update(results)
+            baseline["results"] = previous["results"]
+            baseline["thresholds"] = previous.get("thresholds", DEFAULT_THRESHOLDS)
+        with io.open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+    elif os.path.exists(args.baseline):
+        with io.open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(results, json.load(f), args.threshold)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
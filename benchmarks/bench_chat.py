@@ -0,0 +1,131 @@
+"""Benchmarks the chat hot paths on synthetic data: parsing the /chat
+bootstrap page, poll dispatch and chat history parsing.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_chat
+"""
+from __future__ import division, print_function
+import json
+from contextlib import contextmanager
+from steamapi import chat as chat_module
+from steamapi import enums, utils
+from steamapi.chat import Chat
+from steamapi.dedupe import Deduplicator
+from . import fixtures
+from .harness import measure
+
+FRIEND_COUNTS = (100, 1000, 10000)
+BATCH_SIZES = (100, 1000, 10000)
+HISTORY_SIZES = (1000, 10000)
+
+
+class FakeResponse(object):
+    def __init__(self, body):
+        self._body = body
+        self.ok = True
+        self.status_code = 200
+
+    def json(self):
+        return self._body
+
+
+class FakeSession(object):
+    """Answers the requests made by `Chat._poll` without a network."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def post(self, url, data=None, **kwargs):
+        return FakeResponse({"pollid": data["pollid"], "error": "OK",
+                             "messagelast": data["message"] + len(self.messages),
+                             "messages": self.messages})
+
+    def get(self, url, **kwargs):
+        accountid = int(url.rstrip("/").rsplit("/", 1)[-1])
+        return FakeResponse(fixtures.friendstate(accountid))
+
+
+@contextmanager
+def offline(messages):
+    """Serves polls from a `FakeSession` and keeps the next poll from
+    being scheduled, with one handler on each chat event."""
+    session, timer = chat_module.session, utils.timer
+    handler = lambda *args: None
+    chat_module.session = FakeSession(messages)
+    utils.timer = lambda *args, **kwargs: None
+    for event in ("chat_message", "chat_typing", "chat_persona_state"):
+        utils.emitter.on(event, handler)
+    try:
+        yield
+    finally:
+        chat_module.session, utils.timer = session, timer
+        for event in ("chat_message", "chat_typing", "chat_persona_state"):
+            utils.emitter.remove_listener(event, handler)
+
+
+def logged_on_chat(friends=100):
+    chat = Chat()
+    chat._parse_initial_details(fixtures.chat_page(friends))
+    chat.state = enums.ChatState.LoggedOn
+    chat._umqid = "1234567890"
+    chat.access_token = "f" * 32
+    chat._message = 0
+    chat._poll_id = 1
+    chat._sec_timeout = 20
+    return chat
+
+
+def run(repeat=5, quick=False):
+    """Benchmarks the chat hot paths.
+
+    Parameters
+    ----------
+    repeat : int, optional
+    quick : bool, optional
+        Skip the largest inputs.
+
+    Returns
+    -------
+    dict
+        Fastest seconds per call, per benchmark.
+    """
+    results = {}
+
+    def sizes(values):
+        return values[:-1] if quick else values
+
+    for count in sizes(FRIEND_COUNTS):
+        page = fixtures.chat_page(count)
+        results["chat:parse_initial_details:{}".format(count)] = measure(
+            lambda chat: chat._parse_initial_details(page), setup=Chat, repeat=repeat)
+
+    for count in sizes(BATCH_SIZES):
+        messages = fixtures.poll_messages(count)
+
+        def setup():
+            chat = logged_on_chat()
+            # every round delivers the same messages, which must not count as redelivered
+            chat.deduplicator = Deduplicator()
+            return chat
+
+        with offline(messages):
+            results["chat:poll_dispatch:{}".format(count)] = measure(
+                lambda chat: chat._poll(), setup=setup, repeat=repeat)
+
+    for count in sizes(HISTORY_SIZES):
+        body = fixtures.chat_log(count)
+
+        def setup():
+            chat = Chat()
+            chat._fetch_chat_log = lambda accountid: body
+            return chat
+
+        results["chat:get_chat_history:{}".format(count)] = measure(
+            lambda chat: chat.get_chat_history(fixtures.BASE_STEAM_ID + 1), setup=setup, repeat=repeat)
+
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2, sort_keys=True))
@@ -0,0 +1,50 @@
+"""Measures how long importing parts of steamapi takes in a fresh interpreter.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_import
+"""
+from __future__ import division, print_function
+import json
+import subprocess
+import sys
+
+MODULES = ["steamapi.steamid", "steamapi", "steamapi.client", "steamapi.chat"]
+
+_SNIPPET = ("import time; t = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - t)")
+
+
+def import_time(module, repeat=7):
+    """Median seconds taken by ``import module`` in a new interpreter.
+
+    Parameters
+    ----------
+    module : str
+        The module to import.
+    repeat : int, optional
+        Number of interpreters to start.
+
+    Returns
+    -------
+    float
+    """
+    timings = sorted(
+        float(subprocess.check_output([sys.executable, "-c", _SNIPPET.format(module=module)]))
+        for _ in range(repeat))
+    return timings[len(timings) // 2]
+
+
+def run(repeat=7):
+    """Benchmarks every module in `MODULES`.
+
+    Returns
+    -------
+    dict
+        Median import seconds per module.
+    """
+    return {"import:" + module: import_time(module, repeat) for module in MODULES}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2, sort_keys=True))
@@ -0,0 +1,52 @@
+"""Benchmarks parsing and rendering Steam IDs in every format.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_steamid
+"""
+from __future__ import division, print_function
+import json
+from steamapi.steamid import SteamID
+from .harness import measure
+
+INPUTS = {
+    "steam2": "STEAM_0:0:23071901",
+    "steam3": "[U:1:46143802]",
+    "steam64": "76561198006409530",
+    "steam64_int": 76561198006409530
+}
+
+RENDERS = ("as_steam2", "as_steam2_zero", "as_steam3", "as_32", "as_64")
+
+# IDs per timed call, so that one call is long enough to time reliably
+BATCH = 1000
+
+
+def run(repeat=5):
+    """Benchmarks SteamID construction and rendering.
+
+    Returns
+    -------
+    dict
+        Fastest seconds per 1000 IDs, per benchmark.
+    """
+    results = {}
+
+    for name, value in sorted(INPUTS.items()):
+        values = [value] * BATCH
+        results["steamid:parse:" + name] = measure(
+            lambda: [SteamID(v) for v in values], repeat=repeat)
+
+    results["steamid:parse:accountid"] = measure(
+        lambda: [SteamID.from_account_id(46143802) for _ in range(BATCH)], repeat=repeat)
+
+    ids = [SteamID(INPUTS["steam64"]) for _ in range(BATCH)]
+    for attr in RENDERS:
+        results["steamid:render:" + attr] = measure(
+            lambda: [getattr(steam_id, attr) for steam_id in ids], repeat=repeat)
+
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2, sort_keys=True))
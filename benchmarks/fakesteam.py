@@ -0,0 +1,495 @@
+"""A local stand-in for the Steam endpoints used by steamapi, for load tests.
+
+Every ``GET /chat`` hands out a new simulated account, so any number of
+``Chat`` instances can log on through one session. While accounts are logged
+on, chat messages and persona changes are generated for them at the
+configured rates, and delivered through long polls like Steam does.
+
+Run a standalone server from the repository root::
+
+    python -m benchmarks.fakesteam --port 8080 --rate 5
+
+and point a session at it with `install`.
+"""
+from __future__ import division, print_function
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from steamapi.metrics import MetricsAdapter
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+
+BASE_STEAM_ID = 76561197960265728
+
+# accounts handed out by /chat start here, friends are numbered from 1
+FIRST_ACCOUNT_ID = 10000000
+
+
+class Config(object):
+    """Behaviour of a `FakeSteam` server.
+
+    Attributes
+    ----------
+    friends : int
+        Friends per account.
+    rate : float
+        Chat messages per second per logged on account.
+    persona_rate : float
+        Persona changes per second per logged on account.
+    error_rate : float
+        Fraction of requests answered with HTTP 500.
+    not_logged_on_rate : float
+        Fraction of polls answered with "Not Logged On", forcing a relog.
+    latency : float
+        Seconds added to every response.
+    jitter : float
+        Up to this many seconds are added at random on top of `latency`.
+    max_poll_wait : float
+        Longest a poll is held open, whatever its ``sectimeout``.
+    """
+
+    def __init__(self, friends=100, rate=1.0, persona_rate=0.0, error_rate=0.0,
+                 not_logged_on_rate=0.0, latency=0.0, jitter=0.0, max_poll_wait=20):
+        self.friends = friends
+        self.rate = rate
+        self.persona_rate = persona_rate
+        self.error_rate = error_rate
+        self.not_logged_on_rate = not_logged_on_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.max_poll_wait = max_poll_wait
+
+
+class Account(object):
+    """A simulated account and its message queue."""
+
+    def __init__(self, accountid, friends):
+        self.accountid = accountid
+        self.token = "{:032x}".format(random.getrandbits(128))
+        self.umqid = None
+        self.friends = friends
+        self.seq = 0
+        self.pending = []
+        self.cond = threading.Condition()
+        self._due = 0.0
+        self._persona_due = 0.0
+
+    @property
+    def logged_on(self):
+        return self.umqid is not None
+
+    def push(self, message):
+        with self.cond:
+            self.seq += 1
+            self.pending.append((self.seq, message))
+            self.cond.notify_all()
+
+    def take(self, after, wait, stopped):
+        """Messages after sequence number ``after``, waiting up to ``wait``
+        seconds for the first one."""
+        deadline = time.time() + wait
+        with self.cond:
+            # acknowledged messages are not redelivered
+            self.pending = [(seq, msg) for seq, msg in self.pending if seq > after]
+            while not self.pending and self.logged_on and not stopped.is_set():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.cond.wait(min(remaining, 1.0))
+            return list(self.pending)
+
+
+def persona(accountid, state=1):
+    return {
+        "m_ulSteamID": str(BASE_STEAM_ID + accountid),
+        "m_strName": "fake {}".format(accountid),
+        "m_ePersonaState": state,
+        "m_nPersonaStateFlags": 0,
+        "m_strAvatarHash": "{:040x}".format(accountid)
+    }
+
+
+class FakeSteam(object):
+    """A threaded HTTP server emulating the Steam endpoints steamapi calls.
+
+    Parameters
+    ----------
+    config : `Config`, optional
+    port : int, optional
+        0 picks a free port.
+    host : str, optional
+    """
+
+    def __init__(self, config=None, port=0, host="127.0.0.1"):
+        self.config = config or Config()
+        self.accounts = {}
+        self.tokens = {}
+        self.requests = {}
+        self.generated = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._next_account = FIRST_ACCOUNT_ID
+        self._stopped = threading.Event()
+        self._rsa = None
+
+        fake = self
+
+        class Handler(_Handler):
+            server_state = fake
+
+        self.httpd = _Server((host, port), Handler)
+        self.url = "http://{}:{}".format(*self.httpd.server_address[:2])
+
+    def start(self):
+        """Starts serving and generating messages on background threads."""
+        for target in (self.httpd.serve_forever, self._generate):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        for account in list(self.accounts.values()):
+            with account.cond:
+                account.cond.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"accounts": len(self.accounts),
+                    "logged_on": sum(1 for a in self.accounts.values() if a.logged_on),
+                    "generated": self.generated,
+                    "injected_errors": self.errors,
+                    "requests": dict(self.requests)}
+
+    def new_account(self):
+        with self._lock:
+            accountid = self._next_account
+            self._next_account += 1
+        account = Account(accountid, list(range(1, self.config.friends + 1)))
+        with self._lock:
+            self.accounts[accountid] = account
+            self.tokens[account.token] = account
+        return account
+
+    def _generate(self):
+        last = time.time()
+        while not self._stopped.wait(0.01):
+            now = time.time()
+            elapsed, last = now - last, now
+            config = self.config
+
+            for account in list(self.accounts.values()):
+                if not account.logged_on or not account.friends:
+                    continue
+
+                account._due += config.rate * elapsed
+                account._persona_due += config.persona_rate * elapsed
+
+                while account._due >= 1:
+                    account._due -= 1
+                    friend = random.choice(account.friends)
+                    with self._lock:
+                        self.generated += 1
+                        number = self.generated
+                    # the driver measures delivery latency from the send time in the text
+                    account.push({"type": "saytext", "accountid_from": friend,
+                                  "utc_timestamp": int(now),
+                                  "text": "load|{}|{}|{:.6f}".format(account.accountid, number, time.time())})
+
+                while account._persona_due >= 1:
+                    account._persona_due -= 1
+                    account.push({"type": "personastate", "accountid_from": random.choice(account.friends),
+                                  "utc_timestamp": int(now), "persona_state": 1})
+
+    @property
+    def rsa_key(self):
+        if self._rsa is None:
+            from Crypto.PublicKey import RSA
+            self._rsa = RSA.generate(1024)
+        return self._rsa
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+_routes = []
+
+
+def route(method, pattern):
+    def decorator(func):
+        _routes.append((method, re.compile(pattern + "$"), func))
+        return func
+    return decorator
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_state = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method):
+        fake = self.server_state
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        params.update({k: v[-1] for k, v in parse_qs(body).items()})
+
+        for route_method, pattern, func in _routes:
+            match = pattern.match(parts.path)
+            if route_method == method and match:
+                break
+        else:
+            return self._reply(404, {"error": "Unknown endpoint"})
+
+        name = func.__name__
+        with fake._lock:
+            fake.requests[name] = fake.requests.get(name, 0) + 1
+
+        config = fake.config
+        if config.latency or config.jitter:
+            time.sleep(config.latency + random.random() * config.jitter)
+
+        if config.error_rate and random.random() < config.error_rate:
+            with fake._lock:
+                fake.errors += 1
+            return self._reply(500, {"error": "Injected error"})
+
+        status, reply, headers = func(fake, params, *match.groups())
+        self._reply(status, reply, headers)
+
+    def _reply(self, status, reply, headers=()):
+        if isinstance(reply, (dict, list)):
+            data = json.dumps(reply).encode("utf-8")
+            content_type = "application/json"
+        else:
+            data = reply.encode("utf-8")
+            content_type = "text/html; charset=utf-8"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _ok(reply, headers=()):
+    return 200, reply, headers
+
+
+def _account(fake, params):
+    return fake.tokens.get(params.get("access_token"))
+
+
+@route("POST", r"/login/getrsakey/?")
+def getrsakey(fake, params):
+    key = fake.rsa_key
+    return _ok({"success": True, "publickey_mod": "{:x}".format(key.n),
+                "publickey_exp": "{:x}".format(key.e), "timestamp": "1"})
+
+
+@route("POST", r"/login/dologin/?")
+def dologin(fake, params):
+    steam_id = str(BASE_STEAM_ID + FIRST_ACCOUNT_ID - 1)
+    token = "{:040x}".format(random.getrandbits(160))
+    cookies = [("Set-Cookie", "steamLogin={}%7C%7C{}; path=/".format(steam_id, token)),
+               ("Set-Cookie", "steamLoginSecure={}%7C%7C{}; path=/".format(steam_id, token))]
+    return _ok({"success": True, "login_complete": True,
+                "oauth": json.dumps({"steamid": steam_id, "oauth_token": token})}, cookies)
+
+
+@route("POST", r"/IMobileAuthService/GetWGToken/v\d+/?")
+def GetWGToken(fake, params):
+    return _ok({"response": {"token": "{:040x}".format(random.getrandbits(160)),
+                             "token_secure": "{:040x}".format(random.getrandbits(160))}})
+
+
+@route("GET", r"/chat/?")
+def chat(fake, params):
+    account = fake.new_account()
+    groups = [{"name": "group", "members": account.friends[:10]}]
+    page = ('<html><script>WebAPI = new CWebAPI( "{}" );\n'
+            'var chat = new CWebChat( WebAPI, {}, {}, {} );</script></html>').format(
+        account.token, json.dumps(persona(account.accountid)),
+        json.dumps([persona(f) for f in account.friends]), json.dumps(groups))
+    return _ok(page)
+
+
+@route("POST", r"/ISteamWebUserPresenceOAuth/Logon/v\d+/?")
+def Logon(fake, params):
+    account = _account(fake, params)
+    if account is None:
+        return _ok({"error": "Not Logged On"})
+
+    with account.cond:
+        if params.get("umqid") != account.umqid or account.umqid is None:
+            account.umqid = "{}".format(random.getrandbits(63))
+        return _ok({"error": "OK", "umqid": account.umqid, "message": account.seq,
+                    "utc_timestamp": int(time.time()), "push": 0})
+
+
+@route("POST", r"/ISteamWebUserPresenceOAuth/Poll/v\d+/?")
+def Poll(fake, params):
+    account = _account(fake, params)
+    pollid = int(params.get("pollid", 0))
+    if account is None or params.get("umqid") != account.umqid or (
+            fake.config.not_logged_on_rate and random.random() < fake.config.not_logged_on_rate):
+        return _ok({"pollid": pollid, "error": "Not Logged On", "message": "Not Logged On"})
+
+    # Steam answers with the timeout as a number
+    sectimeout = int(params.get("sectimeout", 20))
+    wait = min(sectimeout, fake.config.max_poll_wait)
+    pending = account.take(int(params.get("message", 0)), wait, fake._stopped)
+
+    if not pending:
+        return _ok({"pollid": pollid, "error": "Timeout", "sectimeout": sectimeout})
+
+    return _ok({"pollid": pollid, "error": "OK", "sectimeout": sectimeout,
+                "messagebase": pending[0][0], "messagelast": pending[-1][0],
+                "messages": [msg for seq, msg in pending]})
+
+
+@route("POST", r"/ISteamWebUserPresenceOAuth/Message/v\d+/?")
+def Message(fake, params):
+    if _account(fake, params) is None:
+        return _ok({"error": "Not Logged On"})
+    return _ok({"error": "OK", "utc_timestamp": int(time.time())})
+
+
+@route("POST", r"/ISteamWebUserPresenceOAuth/Logoff/v\d+/?")
+def Logoff(fake, params):
+    account = _account(fake, params)
+    if account is not None:
+        with account.cond:
+            account.umqid = None
+            account.cond.notify_all()
+    return _ok({"error": "OK"})
+
+
+@route("GET", r"/chat/friendstate/(\d+)/?")
+def friendstate(fake, params, accountid):
+    data = persona(int(accountid), random.randint(0, 3))
+    data.update({"m_bInGame": False, "m_nInGameAppID": None, "m_strInGameName": None})
+    return _ok(data)
+
+
+@route("POST", r"/chat/chatlog/(\d+)/?")
+def chatlog(fake, params, accountid):
+    return _ok([{"m_unAccountID": int(accountid), "m_tsTimestamp": int(time.time()) - 60 * i,
+                 "m_strMessage": "old message {}".format(i)} for i in range(50)])
+
+
+@route("GET", r"/ISteamUserOAuth/GetFriendList/v\d+/?")
+def GetFriendList(fake, params):
+    account = _account(fake, params)
+    if account is None:
+        return 401, {"error": "Not Logged On"}, ()
+    return _ok({"friends": [{"steam_id": str(BASE_STEAM_ID + f), "relationship": "friend",
+                             "friend_since": 1500000000} for f in account.friends]})
+
+
+class LocalAdapter(MetricsAdapter):
+    """Sends requests for any host to a `FakeSteam` server instead, keeping
+    the path and query."""
+
+    def __init__(self, url, **kwargs):
+        MetricsAdapter.__init__(self, **kwargs)
+        self.base = url.rstrip("/")
+
+    def _send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        local = request.copy()
+        local.url = self.base + parts.path + ("?" + parts.query if parts.query else "")
+        resp = HTTPAdapter.send(self, local, **kwargs)
+        # cookies and redirects stay attributed to the original host
+        resp.request = request
+        resp.url = request.url
+        return resp
+
+
+def install(url, session=None):
+    """Routes every request of a session to a `FakeSteam` server.
+
+    Parameters
+    ----------
+    url : str
+        The server's base URL, e.g. ``FakeSteam.url``.
+    session : ``requests.Session``, optional
+        Defaults to ``steamapi.session.session``.
+    """
+    if session is None:
+        from steamapi.session import session
+
+    adapter = LocalAdapter(url, pool_maxsize=1024)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fakesteam")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--host", default="127.0.0.1")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    fake = FakeSteam(config_from(args), args.port, args.host).start()
+    print("Serving fake Steam on", fake.url)
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(fake.stats(), sort_keys=True))
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+def add_config_arguments(parser):
+    defaults = Config()
+    parser.add_argument("--friends", type=int, default=defaults.friends)
+    parser.add_argument("--rate", type=float, default=defaults.rate,
+                        help="chat messages per second per account")
+    parser.add_argument("--persona-rate", type=float, default=defaults.persona_rate,
+                        help="persona changes per second per account")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate,
+                        help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--not-logged-on-rate", type=float, default=defaults.not_logged_on_rate,
+                        help="fraction of polls answered with Not Logged On")
+    parser.add_argument("--latency", type=float, default=defaults.latency,
+                        help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter)
+    parser.add_argument("--max-poll-wait", type=float, default=defaults.max_poll_wait)
+
+
+def config_from(args):
+    return Config(args.friends, args.rate, args.persona_rate, args.error_rate,
+                  args.not_logged_on_rate, args.latency, args.jitter, args.max_poll_wait)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Synthetic Steam responses for the benchmarks."""
+from __future__ import division
+import json
+
+BASE_STEAM_ID = 76561197960265728
+OWN_ACCOUNT_ID = 46143802
+
+
+def persona(account_id, state=1):
+    """A persona as embedded in the /chat page."""
+    return {
+        "m_ulSteamID": str(BASE_STEAM_ID + account_id),
+        "m_strName": "friend {}".format(account_id),
+        "m_ePersonaState": state,
+        "m_nPersonaStateFlags": 0,
+        "m_strAvatarHash": "{:040x}".format(account_id),
+        "m_bInGame": account_id % 7 == 0,
+        "m_nInGameAppID": 440 if account_id % 7 == 0 else None,
+        "m_strInGameName": None
+    }
+
+
+def chat_page(friends, groups=10):
+    """A /chat page with ``friends`` friends spread over ``groups`` groups."""
+    own = persona(OWN_ACCOUNT_ID)
+    personas = [persona(idx + 1, idx % 4) for idx in range(friends)]
+    friend_groups = [{"name": "group {}".format(g),
+                      "members": list(range(g + 1, friends + 1, groups))}
+                     for g in range(groups)]
+    return ("<html><script>var chat = new CWebChat( WebAPI, {}, {}, {} );"
+            "</script></html>").format(json.dumps(own), json.dumps(personas),
+                                       json.dumps(friend_groups))
+
+
+def poll_messages(count, friends=100, persona_every=50):
+    """A poll's ``messages``: chat messages, typing notifications and
+    every ``persona_every``-th a persona change."""
+    messages = []
+    for idx in range(count):
+        accountid = idx % friends + 1
+        if persona_every and idx % persona_every == persona_every - 1:
+            messages.append({"type": "personastate", "accountid_from": accountid,
+                             "utc_timestamp": 1500000000 + idx})
+        elif idx % 5 == 4:
+            messages.append({"type": "typing", "accountid_from": accountid,
+                             "utc_timestamp": 1500000000 + idx})
+        else:
+            messages.append({"type": "saytext", "accountid_from": accountid,
+                             "utc_timestamp": 1500000000 + idx,
+                             "text": "message number {}".format(idx)})
+    return messages
+
+
+def friendstate(accountid):
+    """A /chat/friendstate response."""
+    return {"m_strName": "friend {}".format(accountid), "m_ePersonaState": 1,
+            "m_strAvatarHash": "{:040x}".format(accountid)}
+
+
+def chat_log(entries, accountid=1):
+    """A /chat/chatlog response of ``entries`` messages between us and a friend."""
+    return [{"m_unAccountID": accountid if idx % 2 else OWN_ACCOUNT_ID,
+             "m_tsTimestamp": 1500000000 + idx * 30,
+             "m_strMessage": "chat log line {}".format(idx)}
+            for idx in range(entries)]
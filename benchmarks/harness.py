@@ -0,0 +1,77 @@
+"""Timing and baseline comparison shared by the benchmarks."""
+from __future__ import division
+import gc
+import time
+
+
+def measure(func, setup=None, repeat=5, number=1):
+    """Fastest seconds per call of ``func`` over several rounds.
+
+    The fastest round is the least disturbed by other processes, which
+    makes it the most repeatable figure to compare against a baseline.
+
+    Parameters
+    ----------
+    func : function
+        Called with the return value of ``setup``, if given.
+    setup : function, optional
+        Called before every timed round and excluded from the timing.
+    repeat : int, optional
+        Number of timed rounds.
+    number : int, optional
+        Calls per round.
+
+    Returns
+    -------
+    float
+    """
+    timings = []
+    # one untimed round to warm caches and lazy imports
+    for round_ in range(repeat + 1):
+        args = (setup(),) if setup is not None else ()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for _ in range(number):
+                func(*args)
+            elapsed = time.perf_counter() - started
+        finally:
+            gc.enable()
+        if round_:
+            timings.append(elapsed / number)
+
+    return min(timings)
+
+
+def compare(results, baseline, threshold=0.25):
+    """Finds benchmarks which got slower than their baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Seconds per benchmark name.
+    baseline : dict
+        As stored by ``python -m benchmarks --save-baseline``: ``results``
+        plus optional per-benchmark ``thresholds``.
+    threshold : float, optional
+        Allowed slowdown, as a fraction of the baseline, for benchmarks
+        without their own threshold.
+
+    Returns
+    -------
+    list of dict
+        One entry per regression, with ``name``, ``baseline``, ``result``
+        and ``ratio``.
+    """
+    thresholds = baseline.get("thresholds", {})
+    regressions = []
+
+    for name, expected in sorted(baseline.get("results", {}).items()):
+        if name not in results or not expected:
+            continue
+        ratio = results[name] / expected
+        if ratio > 1 + thresholds.get(name, threshold):
+            regressions.append({"name": name, "baseline": expected,
+                                "result": results[name], "ratio": ratio})
+
+    return regressions
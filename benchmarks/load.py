@@ -0,0 +1,187 @@
+"""Drives simulated accounts through the real client against a fake Steam.
+
+Every account is its own ``steamapi.Chat`` logged on through the shared
+session, exactly as in production; only the transport is pointed at a
+`benchmarks.fakesteam` server. Run from the repository root::
+
+    python -m benchmarks.load --accounts 50 --duration 30 --rate 2
+
+The report is printed as JSON: messages per second, delivery latency
+percentiles from the moment the server queued a message until its
+``chat_message`` handler ran, resident memory and thread counts.
+"""
+from __future__ import division, print_function
+import argparse
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+import steamapi
+from steamapi import enums
+from steamapi.chat import Chat
+from . import fakesteam
+
+
+def rss_bytes():
+    """Current resident set size, or the peak where that is unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class LoadDriver(object):
+    """Logs on accounts and measures what the client delivers.
+
+    Parameters
+    ----------
+    accounts : int
+        Number of simulated accounts.
+    url : str
+        Base URL of the fake Steam server.
+    ramp : float, optional
+        Seconds over which the accounts log on.
+    """
+
+    def __init__(self, accounts, url, ramp=0):
+        self.accounts = accounts
+        self.url = url
+        self.ramp = ramp
+        self.chats = []
+        self.latencies = []
+        self.delivered = 0
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def on_message(self, steam_id, text, own):
+        received = time.time()
+        if not text.startswith("load|"):
+            return
+        sent = float(text.rsplit("|", 1)[1])
+        with self._lock:
+            self.delivered += 1
+            self.latencies.append(received - sent)
+
+    def sample(self):
+        self.samples.append({"time": time.time(), "rss": rss_bytes(),
+                             "threads": threading.active_count(),
+                             "delivered": self.delivered})
+
+    def setup(self):
+        fakesteam.install(self.url)
+        steam = steamapi.steamapi()
+        status = steam.login(username="load", password="load")
+        if status != enums.LoginStatus.LoginSuccessful:
+            raise RuntimeError("Login to fake Steam failed: {}".format(status))
+        steam.event.on("chat_message", self.on_message)
+        self.steam = steam
+
+    def run(self, duration):
+        self.sample()
+        started = time.time()
+
+        for idx in range(self.accounts):
+            chat = Chat()
+            chat.login()
+            self.chats.append(chat)
+            if self.ramp:
+                time.sleep(self.ramp / self.accounts)
+
+        logged_on = time.time()
+        with self._lock:
+            measured_from = self.delivered
+            self.latencies = []
+        while time.time() - logged_on < duration:
+            time.sleep(1)
+            self.sample()
+        elapsed = time.time() - logged_on
+
+        with self._lock:
+            delivered = self.delivered - measured_from
+            latencies = sorted(self.latencies)
+        polls = [chat.poll_stats.as_dict() for chat in self.chats]
+        connected = sum(1 for chat in self.chats if chat.state is enums.ChatState.LoggedOn)
+
+        for chat in self.chats:
+            if chat._umqid:
+                chat.logout()
+
+        return {
+            "accounts": self.accounts,
+            "logged_on": connected,
+            "logon_seconds": logged_on - started,
+            "duration": elapsed,
+            "delivered": delivered,
+            "messages_per_second": delivered / elapsed,
+            "latency": {
+                "p50": percentile(latencies, 50),
+                "p90": percentile(latencies, 90),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1] if latencies else None
+            },
+            "rss_mb": {
+                "start": self.samples[0]["rss"] / 2 ** 20,
+                "peak": max(s["rss"] for s in self.samples) / 2 ** 20,
+                "end": self.samples[-1]["rss"] / 2 ** 20
+            },
+            "threads": {
+                "start": self.samples[0]["threads"],
+                "peak": max(s["threads"] for s in self.samples),
+                "end": self.samples[-1]["threads"]
+            },
+            "polls": {
+                "completed": sum(p["polls"] for p in polls),
+                "errors": sum(p["errors"] for p in polls),
+                "relogs": sum(p["relogs"] for p in polls)
+            }
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30,
+                        help="seconds to measure once all accounts are logged on")
+    parser.add_argument("--ramp", type=float, default=0,
+                        help="seconds over which accounts log on")
+    parser.add_argument("--server", help="URL of a running fake server; "
+                        "by default one is started in this process")
+    parser.add_argument("--verbose", action="store_true")
+    fakesteam.add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    fake = None
+    url = args.server
+    if url is None:
+        fake = fakesteam.FakeSteam(fakesteam.config_from(args)).start()
+        url = fake.url
+
+    driver = LoadDriver(args.accounts, url, args.ramp)
+    driver.setup()
+    report = driver.run(args.duration)
+
+    if fake is not None:
+        report["server"] = fake.stats()
+        fake.stop()
+
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
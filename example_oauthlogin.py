@@ -1,8 +1,10 @@
 from sys import argv
 import IPython
 from builtins import input
+import logging
 
 import steamapi
+logging.basicConfig(level=logging.INFO)
 steam = steamapi.steamapi()
 
 try:
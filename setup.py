@@ -26,14 +26,14 @@ setup(
     install_requires=[
         'requests',
         'pycryptodome',
-        'pyee',
+        'pyee>=9',
         'enum34',
-        'pyquery',
         'future',
         'munch'
     ],
     extras_require={
         'test':  ['pytest'],
+        'images': ['Pillow'],
     },
     keywords='steam web chat',
 )
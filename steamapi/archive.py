@@ -0,0 +1,241 @@
+from __future__ import unicode_literals
+import sqlite3
+from threading import Lock
+from munch import Munch
+from .steamid import SteamID
+import logging
+logger = logging.getLogger(__name__)
+
+# seconds a polled message's timestamp may differ from the same message's
+# timestamp in the chat log
+LIVE_TIMESTAMP_TOLERANCE = 60
+
+_TABLE = (
+    'CREATE TABLE IF NOT EXISTS messages ('
+    'id INTEGER PRIMARY KEY, account INTEGER NOT NULL, sender INTEGER NOT NULL, '
+    'timestamp INTEGER NOT NULL, message TEXT NOT NULL, '
+    'occurrence INTEGER NOT NULL DEFAULT 0, live INTEGER NOT NULL DEFAULT 0, '
+    'UNIQUE (account, timestamp, sender, message, occurrence))')
+
+_SCHEMA = [
+    _TABLE,
+    'CREATE INDEX IF NOT EXISTS messages_account_timestamp '
+    'ON messages (account, timestamp)'
+]
+
+_FTS_SCHEMA = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5('
+    'message, content=messages, content_rowid=id)',
+    'CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN '
+    'INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message); END',
+    'CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN '
+    "INSERT INTO messages_fts (messages_fts, rowid, message) VALUES ('delete', old.id, old.message); END"
+]
+
+
+class ChatArchive(object):
+    """A local SQLite archive of chat messages.
+
+    Messages are stored per conversation, identified by the account ID
+    of the friend, and indexed by timestamp. Full-text search uses FTS5
+    when the SQLite build supports it.
+
+    Assign an instance to ``Chat.archive`` to archive polled messages
+    and chat history automatically.
+
+    The chat log is authoritative: a message is identified by its
+    conversation, sender, text, timestamp and how many identical messages
+    precede it in the same second, so repeated messages are kept apart.
+    Polled messages carry no such count and are stored as the first
+    occurrence; they are replaced by the matching chat log entry, even if
+    its timestamp differs slightly, once history is synced.
+
+    Parameters
+    ----------
+    filename : str
+        The SQLite database file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+
+        with self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._migrate()
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+
+            try:
+                for statement in _FTS_SCHEMA:
+                    self._db.execute(statement)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                logger.warning("SQLite lacks FTS5, chat archive search will be slow")
+                self.full_text = False
+
+    def _migrate(self):
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(messages)')]
+        if not columns or 'occurrence' in columns:
+            return
+
+        # the unique key changed, which requires rebuilding the table; ids
+        # are kept so the full-text index stays valid
+        self._db.execute('ALTER TABLE messages RENAME TO messages_old')
+        self._db.execute(_TABLE)
+        self._db.execute('INSERT INTO messages (id, account, sender, timestamp, message) '
+                         'SELECT id, account, sender, timestamp, message FROM messages_old')
+        self._db.execute('DROP TABLE messages_old')
+
+    def close(self):
+        """Closes the database.
+        """
+        self._db.close()
+
+    def add(self, account, sender, timestamp, message):
+        """Archives a single polled message; duplicates are ignored.
+
+        Identical messages sent in the same second collapse into one row
+        until the chat log is synced with `add_many`.
+
+        Parameters
+        ----------
+        account : int
+            Account ID of the friend the conversation is with.
+        sender : int
+            Account ID of the user who sent the message.
+        timestamp : int
+            UTC timestamp of the message.
+        message : str
+            The message.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR IGNORE INTO messages (account, sender, timestamp, message, live) '
+                'VALUES (?, ?, ?, ?, 1)', (account, sender, timestamp, message))
+
+    def add_many(self, rows):
+        """Archives chat log entries in a single transaction.
+
+        Entries already archived are ignored, and polled copies of them
+        are replaced. Each call must pass a conversation's entries in log
+        order, so identical messages sent in the same second are numbered
+        the same way every time.
+
+        Parameters
+        ----------
+        rows : iterable of tuple
+            ``(account, sender, timestamp, message)`` tuples.
+        """
+        seen = {}
+        with self._lock, self._db:
+            for row in rows:
+                occurrence = seen[row] = seen.get(row, -1) + 1
+                account, sender, timestamp, message = row
+
+                archived = self._db.execute(
+                    'SELECT id, live FROM messages WHERE account = ? AND sender = ? AND timestamp = ? '
+                    'AND message = ? AND occurrence = ?', row + (occurrence,)).fetchone()
+                if archived is not None:
+                    if archived[1]:
+                        # the log confirms the polled copy, so no later
+                        # entry may replace it
+                        self._db.execute('UPDATE messages SET live = 0 WHERE id = ?', archived[:1])
+                    continue
+
+                live = self._db.execute(
+                    'SELECT id FROM messages WHERE live = 1 AND account = ? AND sender = ? '
+                    'AND message = ? AND timestamp BETWEEN ? AND ? '
+                    'ORDER BY ABS(timestamp - ?) LIMIT 1',
+                    (account, sender, message, timestamp - LIVE_TIMESTAMP_TOLERANCE,
+                     timestamp + LIVE_TIMESTAMP_TOLERANCE, timestamp)).fetchone()
+                if live is not None:
+                    self._db.execute('DELETE FROM messages WHERE id = ?', live)
+
+                self._db.execute(
+                    'INSERT INTO messages (account, sender, timestamp, message, occurrence) '
+                    'VALUES (?, ?, ?, ?, ?)', row + (occurrence,))
+
+    def latest_timestamp(self, account):
+        """Gets the timestamp of the newest archived message of a conversation.
+
+        Parameters
+        ----------
+        account : int
+            Account ID of the friend the conversation is with.
+
+        Returns
+        -------
+        int or None
+            None if nothing is archived.
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT MAX(timestamp) FROM messages WHERE account = ?',
+                (account,)).fetchone()[0]
+
+    def _query(self, sql, params, batch=500):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            rows = cursor.fetchmany(batch)
+
+        while rows:
+            for sender, timestamp, message in rows:
+                yield Munch({
+                    "steam_id": SteamID.from_account_id(sender),
+                    "timestamp": timestamp,
+                    "message": message
+                })
+
+            with self._lock:
+                rows = cursor.fetchmany(batch)
+
+    def history(self, account, since=None):
+        """Iterates over the archived messages of a conversation, oldest first.
+
+        Parameters
+        ----------
+        account : int
+            Account ID of the friend the conversation is with.
+        since : int, optional
+            Only messages newer than this UTC timestamp.
+
+        Returns
+        -------
+        generator of dict
+            Entries in the format of ``Chat.get_chat_history``.
+        """
+        return self._query(
+            'SELECT sender, timestamp, message FROM messages '
+            'WHERE account = ? AND timestamp > ? ORDER BY timestamp, id',
+            (account, since if since is not None else -1))
+
+    def search(self, query, account=None):
+        """Searches archived messages.
+
+        Parameters
+        ----------
+        query : str
+            An FTS5 query, or a plain substring if FTS5 is unavailable.
+        account : int, optional
+            Only search the conversation with this friend.
+
+        Returns
+        -------
+        generator of dict
+            Entries in the format of ``Chat.get_chat_history``.
+        """
+        if self.full_text:
+            sql = ('SELECT m.sender, m.timestamp, m.message FROM messages_fts f '
+                   'JOIN messages m ON m.id = f.rowid WHERE messages_fts MATCH ?')
+        else:
+            sql = ("SELECT sender, timestamp, message FROM messages m "
+                   "WHERE message LIKE '%' || ? || '%'")
+        params = (query,)
+
+        if account is not None:
+            sql += ' AND m.account = ?'
+            params += (account,)
+
+        return self._query(sql + ' ORDER BY m.timestamp', params)
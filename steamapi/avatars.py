@@ -0,0 +1,166 @@
+from __future__ import unicode_literals
+import os
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+import requests
+from . import utils
+import logging
+logger = logging.getLogger(__name__)
+
+QUALITIES = ('icon', 'medium', 'full')
+
+
+class AvatarCache(object):
+    """Downloads avatars and keeps them in a size-bounded on-disk cache.
+
+    Avatar hashes identify the image content, so a cached file never goes
+    stale. Files are sharded into subdirectories by the first characters
+    of the hash and evicted least recently used first once the cache
+    grows beyond `max_bytes`. Concurrent requests for the same avatar
+    share a single download.
+
+    Parameters
+    ----------
+    directory : str
+        Where to keep the cached files.
+    max_bytes : int, optional
+        Size the cache is kept under.
+    workers : int, optional
+        Number of concurrent downloads.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, workers=4):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._session = requests.Session()
+        self._lock = Lock()
+        self._in_flight = {}
+        self._entries = None
+        self._size = 0
+
+    def path(self, avatar_hash, quality='full'):
+        """Gets where an avatar is stored in the cache.
+
+        Returns
+        -------
+        str
+        """
+        return os.path.join(self.directory, avatar_hash[:2], avatar_hash[2:4],
+                            '{}_{}.jpg'.format(avatar_hash, quality))
+
+    def _load_entries(self):
+        # called with the lock held; index existing files, oldest first
+        entries = []
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.jpg'):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, os.path.join(root, name), stat.st_size))
+
+        self._entries = OrderedDict((path, size) for mtime, path, size in sorted(entries))
+        self._size = sum(self._entries.values())
+
+    def _touch(self, path, size=None):
+        with self._lock:
+            if self._entries is None:
+                self._load_entries()
+
+            if size is None:
+                if path in self._entries:
+                    self._entries[path] = self._entries.pop(path)
+                return
+
+            self._size += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                try:
+                    os.unlink(old)
+                except OSError:
+                    pass
+
+    def _download(self, avatar_hash, quality, path):
+        try:
+            resp = self._session.get(utils.url_avatar(avatar_hash, quality), timeout=30)
+            if not resp.ok:
+                logger.error("Avatar download error: %s", resp.status_code)
+                return None
+
+            # other qualities of the same avatar may be creating it too
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            utils.atomic_write(path, resp.content)
+            self._touch(path, len(resp.content))
+            return path
+        except (requests.exceptions.RequestException, IOError, OSError) as e:
+            logger.error("Avatar download error: %s", e)
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.pop(path, None)
+
+    def fetch_async(self, avatar_hash, quality='full'):
+        """Starts fetching an avatar unless it is cached or already being fetched.
+
+        Returns
+        -------
+        ``concurrent.futures.Future``
+            Resolves to the path of the cached file, or None on error.
+        """
+        path = self.path(avatar_hash, quality)
+
+        with self._lock:
+            future = self._in_flight.get(path)
+            if future is None and not os.path.isfile(path):
+                future = self._pool.submit(self._download, avatar_hash, quality, path)
+                self._in_flight[path] = future
+
+        if future is None:
+            self._touch(path)
+            # resolved right away rather than queued behind downloads
+            future = Future()
+            future.set_result(path)
+
+        return future
+
+    def get(self, avatar_hash, quality='full'):
+        """Gets the path of a cached avatar, downloading it if needed.
+
+        Parameters
+        ----------
+        avatar_hash : str
+            The avatar hash, e.g. from a persona.
+        quality : str, optional
+            One of ``icon``, ``medium`` or ``full``.
+
+        Returns
+        -------
+        str or None
+            The path of the cached file, None if it could not be downloaded.
+        """
+        return self.fetch_async(avatar_hash, quality).result()
+
+    def fetch(self, avatar_hash, qualities=QUALITIES):
+        """Fetches several sizes of an avatar concurrently.
+
+        Returns
+        -------
+        dict
+            Cached file path (or None) per quality.
+        """
+        futures = [(q, self.fetch_async(avatar_hash, q)) for q in qualities]
+        return {q: future.result() for q, future in futures}
+
+    def prefetch_on_change(self, steam_id, persona, old_persona, qualities=QUALITIES):
+        """A ``chat_persona_state`` handler which prefetches changed avatars.
+
+        Register it with ``steam.event.on('chat_persona_state', cache.prefetch_on_change)``.
+        """
+        avatar_hash = persona.get('avatar_hash') if persona else None
+        if avatar_hash and avatar_hash != (old_persona or {}).get('avatar_hash'):
+            for quality in qualities:
+                self.fetch_async(avatar_hash, quality)
@@ -0,0 +1,229 @@
+from __future__ import division, unicode_literals
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import open
+from threading import Event, Lock
+from .steamid import SteamID
+from .ratelimit import RateLimiter
+from . import utils
+import logging
+logger = logging.getLogger(__name__)
+
+
+class JSONLSink(object):
+    """Appends chat log entries to a JSON lines file.
+
+    Each line holds ``account``, ``sender``, ``timestamp`` and ``message``.
+
+    Parameters
+    ----------
+    filename : str
+        The file to append to.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, 'a', encoding='utf-8')
+        self._lock = Lock()
+
+    def write(self, account, entries):
+        lines = ''.join(json.dumps({
+            "account": account,
+            "sender": msg["m_unAccountID"],
+            "timestamp": msg["m_tsTimestamp"],
+            "message": msg["m_strMessage"]
+        }, ensure_ascii=False) + '\n' for msg in entries)
+
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ArchiveSink(object):
+    """Writes chat log entries into a ``steamapi.archive.ChatArchive``.
+
+    Parameters
+    ----------
+    archive : ``steamapi.archive.ChatArchive``
+        The archive to write to.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def write(self, account, entries):
+        self.archive.add_many(
+            (account, msg["m_unAccountID"], msg["m_tsTimestamp"], msg["m_strMessage"])
+            for msg in entries)
+
+    def close(self):
+        pass
+
+
+class Backfill(object):
+    """Downloads the chat history of many friends in parallel.
+
+    Fetches run on a bounded thread pool, throttled by a rate limiter, and
+    each friend's log is handed to the sink as soon as it arrives.
+    Finished friends are appended to a journal next to the checkpoint
+    file as they complete, and folded into the checkpoint when the run
+    ends, so an interrupted backfill picks up where it left off.
+
+    Parameters
+    ----------
+    chat : ``steamapi.chat.Chat``
+        A logged on chat, used to fetch chat logs.
+    sink : `JSONLSink` or `ArchiveSink`
+        Where to write the entries to.
+    checkpoint : str, optional
+        File to record finished friends in.
+    workers : int, optional
+        Number of concurrent fetches.
+    limiter : ``steamapi.ratelimit.RateLimiter``, optional
+        Rate limit for the fetches. Defaults to 2 requests per second.
+    progress : function, optional
+        Called with the `stats` dict after every friend.
+    """
+
+    def __init__(self, chat, sink, checkpoint=None, workers=4, limiter=None, progress=None):
+        self.chat = chat
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.limiter = limiter if limiter is not None else RateLimiter(2)
+        self.progress = progress
+
+        self._lock = Lock()
+        self._cancelled = Event()
+        self._journal = None
+        self.done = self._load_checkpoint()
+        self.failed = set()
+        self.stats = {}
+
+    @property
+    def journal(self):
+        return self.checkpoint + '.journal' if self.checkpoint else None
+
+    def _load_checkpoint(self):
+        done = set()
+        if not self.checkpoint:
+            return done
+
+        if os.path.isfile(self.checkpoint):
+            with open(self.checkpoint, 'rb') as f:
+                done.update(json.loads(f.read().decode('utf-8'))["done"])
+
+        if os.path.isfile(self.journal):
+            with open(self.journal, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        done.add(int(line))
+                    except ValueError:
+                        # torn last line of an interrupted run
+                        pass
+        return done
+
+    def _record(self, accountid):
+        if self._journal is not None:
+            self._journal.write('{}\n'.format(accountid))
+            self._journal.flush()
+
+    def _compact(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+        if self.checkpoint:
+            utils.atomic_write(self.checkpoint, json.dumps(
+                {"done": sorted(self.done)}).encode('utf-8'))
+            if os.path.isfile(self.journal):
+                os.remove(self.journal)
+
+    def cancel(self):
+        """Stops the backfill; fetches in flight still complete.
+        """
+        self._cancelled.set()
+
+    def _fetch(self, accountid):
+        if self._cancelled.is_set():
+            return None
+
+        self.limiter.acquire()
+        return self.chat._fetch_chat_log(accountid)
+
+    def run(self, steam_ids=None):
+        """Runs the backfill until all friends are done or it is cancelled.
+
+        Parameters
+        ----------
+        steam_ids : iterable, optional
+            The users to backfill. Defaults to everyone in ``chat.friends``.
+
+        Returns
+        -------
+        dict
+            Final `stats`: friends done, failed and remaining, entries
+            written, elapsed seconds and throughput.
+        """
+        if steam_ids is None:
+            steam_ids = list(self.chat.friends.keys())
+
+        accounts = []
+        for steam_id in steam_ids:
+            if not isinstance(steam_id, SteamID):
+                steam_id = SteamID(steam_id)
+            if steam_id.accountid not in self.done:
+                accounts.append(steam_id.accountid)
+
+        started = time.time()
+        self.stats = {"done": 0, "failed": 0, "remaining": len(accounts),
+                      "entries": 0, "elapsed": 0, "friends_per_sec": 0, "entries_per_sec": 0}
+
+        if self.checkpoint:
+            self._journal = open(self.journal, 'a', encoding='utf-8')
+
+        try:
+            self._backfill(accounts, started)
+        finally:
+            self._compact()
+
+        return dict(self.stats)
+
+    def _backfill(self, accounts, started):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._fetch, acc): acc for acc in accounts}
+
+            for future in as_completed(futures):
+                accountid = futures[future]
+                try:
+                    entries = future.result()
+                except Exception as e:
+                    logger.error("Backfill of %s failed: %s", accountid, e)
+                    entries = None
+
+                with self._lock:
+                    if entries is None:
+                        if not self._cancelled.is_set():
+                            self.failed.add(accountid)
+                            self.stats["failed"] += 1
+                    else:
+                        self.sink.write(accountid, entries)
+                        self.done.add(accountid)
+                        self.failed.discard(accountid)
+                        self._record(accountid)
+                        self.stats["done"] += 1
+                        self.stats["entries"] += len(entries)
+
+                    self.stats["remaining"] -= 1
+                    elapsed = time.time() - started
+                    self.stats["elapsed"] = elapsed
+                    self.stats["friends_per_sec"] = self.stats["done"] / elapsed if elapsed else 0
+                    self.stats["entries_per_sec"] = self.stats["entries"] / elapsed if elapsed else 0
+
+                if self.progress:
+                    self.progress(dict(self.stats))
+
@@ -0,0 +1,352 @@
+from __future__ import unicode_literals
+import base64
+import io
+import json
+import re
+import time
+from collections import deque
+from threading import Lock
+from email.message import Message
+from requests.exceptions import ConnectionError
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+from .metrics import MetricsAdapter
+
+try:
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+except ImportError:
+    from urlparse import urlsplit, urlunsplit, parse_qsl
+    from urllib import urlencode
+import logging
+logger = logging.getLogger(__name__)
+
+REDACTED = 'REDACTED'
+
+# form, query and JSON fields whose values never end up in a cassette
+SECRET_FIELDS = frozenset([
+    "password", "access_token", "oauth_token", "token", "token_secure",
+    "auth", "webcookie", "wgtoken", "wgtoken_secure", "sessionid",
+    "emailauth", "twofactorcode", "captcha_text", "steamguard", "umqid"
+])
+
+# cookies whose values never end up in a cassette, matched by prefix
+SECRET_COOKIES = ("steamLogin", "steamMachineAuth", "steamRememberLogin",
+                  "sessionid", "steamparental")
+
+# secrets embedded in pages; replaced by zeros so the page still parses
+SECRET_PATTERNS = (
+    re.compile(r'"([0-9a-f]{32})" \);'),
+    re.compile(r'g_sessionID = "([^"]+)"')
+)
+
+# describe the transfer rather than the recorded body, which is stored
+# decoded and possibly redacted
+_DROPPED_HEADERS = ("content-encoding", "transfer-encoding", "content-length")
+
+
+class CassetteMiss(ConnectionError):
+    """Raised when replaying a request which is not in the cassette.
+    """
+
+
+def _redact_value(value):
+    # keep the Steam ID in front of the separator of steamLogin style values
+    for sep in ('%7C%7C', '||'):
+        if sep in value:
+            return value.split(sep, 1)[0] + sep + REDACTED
+    return REDACTED
+
+
+def redact_form(text):
+    """Redacts `SECRET_FIELDS` in a URL encoded form or query string.
+    """
+    fields = parse_qsl(text, keep_blank_values=True)
+    if not any(key in SECRET_FIELDS for key, value in fields):
+        return text
+    return urlencode([(key, _redact_value(value) if key in SECRET_FIELDS else value)
+                      for key, value in fields])
+
+
+def redact_url(url):
+    """Redacts `SECRET_FIELDS` in the query of a URL.
+    """
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    return urlunsplit(parts._replace(query=redact_form(parts.query)))
+
+
+def redact_json(value):
+    """Redacts `SECRET_FIELDS` anywhere in decoded JSON, including in
+    strings which hold JSON themselves.
+    """
+    if isinstance(value, dict):
+        return {key: _redact_value(str(item)) if key in SECRET_FIELDS and item is not None
+                else redact_json(item)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact_json(item) for item in value]
+    if isinstance(value, str) and value.startswith('{'):
+        try:
+            return json.dumps(redact_json(json.loads(value)))
+        except ValueError:
+            return value
+    return value
+
+
+def redact_text(text):
+    """Replaces `SECRET_PATTERNS` in a page with zeros of the same length.
+    """
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(
+            lambda m: m.group(0).replace(m.group(1), '0' * len(m.group(1))), text)
+    return text
+
+
+def redact_cookie(header):
+    """Redacts the value of a ``Set-Cookie`` header if it is a `SECRET_COOKIES`.
+    """
+    name, sep, rest = header.partition('=')
+    if not sep or not name.strip().startswith(SECRET_COOKIES):
+        return header
+    value, sep, attributes = rest.partition(';')
+    return name + '=' + _redact_value(value) + sep + attributes
+
+
+def _request_body(request):
+    body = request.body
+    if body is None:
+        return None
+    if not isinstance(body, (bytes, str)):
+        # a streamed upload, which cannot be recorded without consuming it
+        return None
+    if isinstance(body, bytes):
+        try:
+            body = body.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+
+    content_type = request.headers.get('Content-Type', '')
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        body = redact_form(body)
+    return body
+
+
+class _OriginalResponse(object):
+    """The part of ``http.client.HTTPResponse`` cookie extraction reads.
+    """
+
+    def __init__(self, headers):
+        self.msg = Message()
+        for name, value in headers:
+            self.msg[name] = value
+
+    def isclosed(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class CassetteAdapter(MetricsAdapter):
+    """A transport adapter which records traffic to, or replays it from, a
+    cassette file.
+
+    A cassette holds one JSON object per line, each a request and its
+    response. Secrets in URLs, forms, cookies, JSON and pages are redacted
+    before they are written. Replayed requests are matched by method, URL
+    and body after the same redaction, falling back to the next unplayed
+    request with the same method and URL.
+
+    Parameters
+    ----------
+    filename : str
+        The cassette.
+    mode : str, optional
+        ``"record"`` to send requests to Steam and write them to a new
+        cassette, ``"replay"`` to answer them from the cassette.
+    realtime : bool, optional
+        When replaying, wait as long as each response originally took.
+        Otherwise responses are returned immediately.
+    """
+
+    def __init__(self, filename, mode='replay', realtime=False, registry=None, **kwargs):
+        if mode not in ('record', 'replay'):
+            raise ValueError("Unknown cassette mode: {}".format(mode))
+
+        MetricsAdapter.__init__(self, registry, **kwargs)
+        self.filename = filename
+        self.mode = mode
+        self.realtime = realtime
+        self._lock = Lock()
+        self._mounted = None
+
+        if mode == 'record':
+            self._file = io.open(filename, 'w', encoding='utf-8')
+        else:
+            self._file = None
+            self._load()
+
+    def _load(self):
+        with io.open(self.filename, encoding='utf-8') as f:
+            self.interactions = [json.loads(line) for line in f if line.strip()]
+
+        self._exact = {}
+        self._endpoint = {}
+        for idx, interaction in enumerate(self.interactions):
+            request = interaction["request"]
+            key = (request["method"], request["url"])
+            self._exact.setdefault(key + (request["body"],), deque()).append(idx)
+            self._endpoint.setdefault(key, deque()).append(idx)
+        self._played = set()
+
+    @property
+    def remaining(self):
+        """Number of recorded interactions not replayed yet.
+        """
+        if self.mode != 'replay':
+            return 0
+        return len(self.interactions) - len(self._played)
+
+    def _next(self, queue):
+        while queue:
+            idx = queue.popleft()
+            if idx not in self._played:
+                self._played.add(idx)
+                return self.interactions[idx]
+        return None
+
+    def _send(self, request, **kwargs):
+        if self.mode == 'record':
+            return self._record(request, **kwargs)
+        return self._replay(request)
+
+    def _replay(self, request):
+        method, url = request.method, redact_url(request.url)
+        body = _request_body(request)
+
+        with self._lock:
+            interaction = self._next(self._exact.get((method, url, body), deque()))
+            if interaction is None:
+                interaction = self._next(self._endpoint.get((method, url), deque()))
+
+        if interaction is None:
+            raise CassetteMiss("No recorded response for {} {}".format(method, url), request=request)
+
+        if self.realtime:
+            time.sleep(interaction["elapsed"])
+
+        return self._build_response(request, interaction["response"])
+
+    def _record(self, request, **kwargs):
+        started = time.time()
+        resp = MetricsAdapter._send(self, request, **kwargs)
+        content = resp.content
+        elapsed = time.time() - started
+
+        raw_headers = resp.raw.headers
+        headers = [[name, value] for name, value in getattr(raw_headers, 'iteritems', raw_headers.items)()
+                   if name.lower() not in _DROPPED_HEADERS]
+
+        response = {"status": resp.status_code, "reason": resp.reason, "headers": headers}
+        live = dict(response, body=base64.b64encode(content).decode('ascii'), base64=True)
+
+        try:
+            text = content.decode('utf-8')
+        except UnicodeDecodeError:
+            response.update(body=live["body"], base64=True)
+        else:
+            if 'json' in resp.headers.get('content-type', ''):
+                try:
+                    text = json.dumps(redact_json(json.loads(text)))
+                except ValueError:
+                    text = redact_text(text)
+            else:
+                text = redact_text(text)
+            response.update(body=text, base64=False)
+
+        response["headers"] = [[name, redact_cookie(value) if name.lower() == 'set-cookie' else value]
+                               for name, value in headers]
+
+        interaction = {
+            "request": {"method": request.method, "url": redact_url(request.url),
+                        "body": _request_body(request)},
+            "response": response,
+            "elapsed": elapsed
+        }
+        line = json.dumps(interaction, sort_keys=True)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+        return self._build_response(request, live)
+
+    def _build_response(self, request, data):
+        if data.get("base64"):
+            body = base64.b64decode(data["body"])
+        else:
+            body = data["body"].encode('utf-8')
+
+        headers = HTTPHeaderDict()
+        for name, value in data["headers"]:
+            headers.add(name, value)
+        headers["Content-Length"] = str(len(body))
+
+        raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=data["status"],
+                           reason=data["reason"], preload_content=False, decode_content=False,
+                           original_response=_OriginalResponse(data["headers"]))
+        return self.build_response(request, raw)
+
+    def close(self):
+        """Finishes the cassette and restores the adapters it replaced.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self._mounted is not None:
+            session, previous = self._mounted
+            self._mounted = None
+            for prefix, adapter in previous.items():
+                session.mount(prefix, adapter)
+
+        MetricsAdapter.close(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def use_cassette(filename, mode='replay', realtime=False, session=None):
+    """Routes all requests of a session through a `CassetteAdapter`.
+
+    Usable as a context manager; otherwise call ``close()`` on the returned
+    adapter to restore the session's previous adapters.
+
+    Parameters
+    ----------
+    filename : str
+        The cassette.
+    mode : str, optional
+        ``"record"`` or ``"replay"``.
+    realtime : bool, optional
+        When replaying, keep the recorded response times.
+    session : ``requests.Session``, optional
+        Defaults to ``steamapi.session.session``.
+
+    Returns
+    -------
+    `CassetteAdapter`
+    """
+    if session is None:
+        from .session import session
+
+    adapter = CassetteAdapter(filename, mode, realtime)
+    previous = {}
+    for prefix in ('https://', 'http://'):
+        previous[prefix] = session.adapters.get(prefix)
+        session.mount(prefix, adapter)
+    adapter._mounted = (session, previous)
+    return adapter
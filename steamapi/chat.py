@@ -1,19 +1,48 @@
 from __future__ import unicode_literals
 import requests
 import re
+from requests.compat import urlencode
 import json
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from munch import Munch
 from .steamid import SteamID
 from .session import session, check_http_error
 from . import utils
 from . import enums
+from . import events
+from .dedupe import Deduplicator
+from .ratelimit import RateLimiter
+from .tracing import tracer, traced
+from .polling import (PollStats, FixedStepController, POLL_DEFAULT_TIMEOUT,
+                      POLL_SUCCESS_INCREMENT, POLL_MAX_TIMEOUT)
 import logging
 logger = logging.getLogger(__name__)
 
-# chat constants taken from chat.js
-POLL_DEFAULT_TIMEOUT = 20
-POLL_SUCCESS_INCREMENT = 5
-POLL_MAX_TIMEOUT = 120
+# chat state snapshot file header, see `Chat.save_state`
+SNAPSHOT_MAGIC = b'PSCS'
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct('>4sH')
+
+# seconds between full friend list reconciles, see `Chat.reconcile_relationships`
+RELATIONSHIP_RECONCILE_INTERVAL = 3600
+
+# relationship names used by ISteamUserOAuth/GetFriendList
+_RELATIONSHIP_NAMES = {
+    "none": enums.FriendRelationship.NONE,
+    "blocked": enums.FriendRelationship.Blocked,
+    "pendinginvitee": enums.FriendRelationship.RequestRecipient,
+    "requestrecipient": enums.FriendRelationship.RequestRecipient,
+    "friend": enums.FriendRelationship.Friend,
+    "pendinginviter": enums.FriendRelationship.RequestInitiator,
+    "requestinitiator": enums.FriendRelationship.RequestInitiator,
+    "ignored": enums.FriendRelationship.Ignored,
+    "ignoredfriend": enums.FriendRelationship.IgnoredFriend,
+    "suggestedfriend": enums.FriendRelationship.SuggestedFriend
+}
 
 
 def get_chat_oauth_token(return_response=False):
@@ -52,6 +81,58 @@ def get_chat_oauth_token(return_response=False):
     return ret
 
 
+def _generate_persona(friend):
+    """Builds a persona from a CWebChat friend entry.
+
+    Parameters
+    ----------
+    friend : dict
+        A persona entry as embedded in the chat page.
+
+    Returns
+    -------
+    ``munch.Munch``
+        The persona.
+    """
+    return Munch({
+        "steam_id": SteamID(friend['m_ulSteamID']),
+        "name": friend['m_strName'],
+        "state": enums.PersonaState(friend.get('m_ePersonaState', 0)),
+        "state_flags": enums.PersonaStateFlag(friend.get('m_nPersonaStateFlags') or 0),
+        "avatar_hash": friend['m_strAvatarHash'],
+        "ingame": friend.get('m_bInGame', False),
+        "ingame_app_id": friend.get('m_nInGameAppID', None),
+        "ingame_name": friend.get('m_strInGameName', None),
+        "nickname": friend.get("m_strNickname", None)
+    })
+
+
+def _pack_persona(persona):
+    """Flattens a persona into a list for `Chat.save_state`.
+    """
+    return [
+        persona.steam_id.as_64, persona.name, int(persona.state),
+        int(persona.state_flags), persona.avatar_hash, persona.ingame,
+        persona.ingame_app_id, persona.ingame_name, persona.nickname
+    ]
+
+
+def _unpack_persona(packed):
+    """Restores a persona flattened by `_pack_persona`.
+    """
+    return Munch({
+        "steam_id": SteamID(packed[0]),
+        "name": packed[1],
+        "state": enums.PersonaState(packed[2]),
+        "state_flags": enums.PersonaStateFlag(packed[3]),
+        "avatar_hash": packed[4],
+        "ingame": packed[5],
+        "ingame_app_id": packed[6],
+        "ingame_name": packed[7],
+        "nickname": packed[8]
+    })
+
+
 class Chat(object):
     """Allows for Steam Chat WebAPI communication.
 
@@ -61,10 +142,33 @@ class Chat(object):
         Chat OAuth token
     account_persona : dict
         Persona for logged in user
+    archive : ``steamapi.archive.ChatArchive`` or None
+        If set, chat messages and history are archived locally
+    batch_events : bool
+        If True, each poll is emitted as a single ``chat_batch`` event
+        instead of one event per message
+    deduplicator : ``steamapi.dedupe.Deduplicator`` or None
+        Drops chat messages Steam delivers more than once,
+        e.g. after a failed poll or reconnect
+    coalescer : ``steamapi.coalesce.Coalescer`` or None
+        If set, collapses repeated typing and persona events. Trailing
+        persona events are dispatched from a timer thread, so
+        ``chat_persona_state`` handlers may run concurrently with the
+        poll thread
     friend_groups : list
         Friends list groupings
     friends : list
         Friends list
+    relationships : dict
+        ``steamapi.enums.FriendRelationship`` per SteamID64 string,
+        kept current from poll events
+    relationship_reconcile_interval : int or None
+        Seconds between full friend list reconciles while logged on
+    poll_controller : ``steamapi.polling.FixedStepController``
+        Picks the ``sectimeout`` of each poll.
+        May be replaced, e.g. with ``steamapi.polling.AdaptiveController``
+    poll_stats : ``steamapi.polling.PollStats``
+        Telemetry of the poll loop
     state : ``steamapi.enums.chatState``
         Logged in state
     ui_mode : str
@@ -73,6 +177,14 @@ class Chat(object):
     """
 
     def __init__(self):
+        self.poll_controller = FixedStepController()
+        self.poll_stats = PollStats()
+        self.batch_events = False
+        self.coalescer = None
+        self.archive = None
+        self.deduplicator = Deduplicator()
+        self.relationship_reconcile_interval = RELATIONSHIP_RECONCILE_INTERVAL
+        self._reconcile_generation = 0
         self._restore_defaults()
 
     def _restore_defaults(self):
@@ -82,10 +194,11 @@ class Chat(object):
         self.access_token = ""
         self.ui_mode = "web"
         self._poll_id = 1
-        self._sec_timeout = POLL_DEFAULT_TIMEOUT
+        self._sec_timeout = self.poll_controller.initial
         self._reconnect_timer = -1
         self._umqid = ""
         self._message = 0
+        self._message_seq = -1
         self._session_id = utils.get_session_id()
         self._consecutive_poll_failures = 0
         self._logged_out_forcefully = False
@@ -94,8 +207,45 @@ class Chat(object):
         self.account_persona = {}
         self.friends = {}
         self.friend_groups = []
+        self.relationships = {}
         self.state = enums.ChatState.Offline
 
+    def _parse_chat_page(self, resp):
+        """Extracts the persona details embedded in the chat page.
+
+        Parameters
+        ----------
+        resp : str
+            The content of a page which has a call to CWebChat in its embedded script.
+            (namely https://steamcommunity.com/chat/)
+
+        Returns
+        -------
+        tuple of (own persona, friends: dict, friend groups: list) or None
+            None if the page does not contain the CWebChat details.
+        """
+        details_full = re.compile(r'WebAPI, (\{.*\}), (\[.*\]), (\[.*\]) \);')
+        matches = details_full.search(resp)
+
+        if not matches:
+            return None
+
+        groups = matches.groups()
+        own_persona = _generate_persona(json.loads(groups[0]))
+        friends = {}
+        friend_groups = json.loads(groups[2])
+
+        for friend in json.loads(groups[1]):
+            persona = _generate_persona(friend)
+            friends[str(persona.steam_id)] = persona
+
+        for group_idx, group in list(enumerate(friend_groups)):
+            for idx, member in list(enumerate(group["members"])):
+                friend_groups[group_idx]["members"][
+                    idx] = SteamID.from_account_id(member)
+
+        return own_persona, friends, friend_groups
+
     def _parse_initial_details(self, resp):
         """Parses the chat page for the initial persona details.
 
@@ -115,42 +265,91 @@ class Chat(object):
             The content of a page which has a call to CWebChat in its embedded script.
             (namely https://steamcommunity.com/chat/)
         """
-        details_full = re.compile(r'WebAPI, (\{.*\}), (\[.*\]), (\[.*\]) \);')
-        matches = details_full.search(resp)
-
-        def generate_persona(friend):
-            return Munch({
-                "steam_id": SteamID(friend['m_ulSteamID']),
-                "name": friend['m_strName'],
-                "state": enums.PersonaState(friend.get('m_ePersonaState', 0)),
-                "state_flags": enums.PersonaStateFlag(friend.get('m_nPersonaStateFlags') or 0),
-                "avatar_hash": friend['m_strAvatarHash'],
-                "ingame": friend.get('m_bInGame', False),
-                "ingame_app_id": friend.get('m_nInGameAppID', None),
-                "ingame_name": friend.get('m_strInGameName', None),
-                "nickname": friend.get("m_strNickname", None)
-            })
-
-        if matches:
-            groups = matches.groups()
-            own_persona = generate_persona(json.loads(groups[0]))
-            friends = json.loads(groups[1])
-            friend_groups = json.loads(groups[2])
-
-            for friend in friends:
-                persona = generate_persona(friend)
-                self.friends[str(persona.steam_id)] = persona
-
-            for group_idx, group in list(enumerate(friend_groups)):
-                for idx, member in list(enumerate(group["members"])):
-                    friend_groups[group_idx]["members"][
-                        idx] = SteamID.from_account_id(member)
+        details = self._parse_chat_page(resp)
 
+        if details:
+            own_persona, friends, friend_groups = details
+            self.friends.update(friends)
             self.friend_groups = friend_groups
             self.account_persona = own_persona
             utils.emit('initial', self.friends,
                        self.account_persona, self.friend_groups)
 
+    def _reconcile_details(self, resp):
+        """Merges a freshly fetched chat page into the existing persona store.
+
+        Unlike `_parse_initial_details`, the stored personas are kept and
+        only those which changed emit ``chat_persona_state``.
+
+        Parameters
+        ----------
+        resp : str
+            The content of a page which has a call to CWebChat in its embedded script.
+        """
+        details = self._parse_chat_page(resp)
+
+        if not details:
+            return
+
+        own_persona, friends, friend_groups = details
+
+        for key in list(self.friends.keys()):
+            if key not in friends:
+                del self.friends[key]
+
+        for key, persona in list(friends.items()):
+            old_persona = self.friends.get(key, {})
+            if old_persona:
+                # keep the stored SteamID instance, it is not comparable
+                persona.steam_id = old_persona.steam_id
+                if not utils.dict_diff(persona, old_persona):
+                    continue
+
+            self.friends[key] = persona
+            utils.emit('chat_persona_state',
+                       persona.steam_id, persona, old_persona)
+
+        self.friend_groups = friend_groups
+        self.account_persona = own_persona
+
+    def _logon(self, resume=False):
+        """Posts a ``Logon`` request with the current access token.
+
+        Parameters
+        ----------
+        resume : bool, optional
+            If True, the current umqid is sent along so Steam may
+            continue the existing message queue.
+
+        Returns
+        -------
+        tuple of (error: str or None, dict or None)
+            The error reported, or the decoded Logon response.
+        """
+        form = {"ui_mode": self.ui_mode, "access_token": self.access_token}
+        if resume and self._umqid:
+            form["umqid"] = self._umqid
+
+        try:
+            login = session.post(utils.url_api(
+                "ISteamWebUserPresenceOAuth", "Logon"), data=form)
+        except requests.exceptions.ConnectionError:
+            return ("Connection Error", None)
+
+        if not login.ok:
+            return ("HTTP Error {}".format(login.status_code), None)
+
+        try:
+            login_data = login.json()
+        except ValueError:
+            return ("Malformed Response", None)
+
+        if login_data.get("error") != "OK":
+            return (login_data.get("error", "Unknown Error"), None)
+
+        return (None, login_data)
+
+    @traced('chat.login')
     def login(self, ui_mode="web"):
         """Initiates login for Steam web chat.
 
@@ -193,35 +392,192 @@ class Chat(object):
         self.access_token = token
         self.ui_mode = ui_mode
         self._poll_id = 1
-        self._sec_timeout = POLL_DEFAULT_TIMEOUT
+        self._sec_timeout = self.poll_controller.initial
         self._reconnect_timer = -1
 
-        login = session.post(
-            utils.url_api("ISteamWebUserPresenceOAuth", "Logon"), data={"ui_mode": ui_mode, "access_token": token})
+        err, login_data = self._logon()
 
-        if not login.ok:
+        if err:
             self.state = enums.ChatState.LogOnFailed
-            logger.error("Error logging into webchat (%s)", login.status_code)
+            logger.error("Error logging into webchat: %s", err)
             self._reconnect_timer = -1
             self._relog_chat()
             return self.state
 
-        login_data = login.json()
+        self._umqid = login_data["umqid"]
+        self._message = login_data["message"]
+
+        self.state = enums.ChatState.LoggedOn
+        utils.emit('chat_logged_on')
+        utils.timer(0.5, self._poll, ())
+        self._schedule_reconcile(1.0)
+        return self.state
+
+    def resume(self):
+        """Re-establishes the chat session without discarding persona state.
+
+        The existing access token is reused and only refreshed if Steam
+        rejects it. If Steam continues the previous message queue the
+        ``messagelast`` cursor is kept, so missed events are delivered by the
+        next poll; otherwise the chat page is refetched and merged into
+        `friends`, emitting ``chat_persona_state`` only for changed personas.
+
+        Falls back to a full `login` if no session exists or resuming fails.
 
-        if login_data["error"] != "OK":
+        Returns
+        -------
+        ``steamapi.enums.chatState``
+            An enum value indicating current login state
+        """
+        # an account without friends is still a session worth resuming
+        if not self.access_token or not self._umqid:
+            return self.login(self.ui_mode)
+
+        logger.info("Resuming web chat session")
+        self.state = enums.ChatState.LoggingOn
+        resp = None
+
+        err, login_data = self._logon(resume=True)
+        if err:
+            # the access token has most likely expired, get a fresh one
+            logger.info("Chat token rejected (%s), refreshing", err)
+            err, token, resp = get_chat_oauth_token(return_response=True)
+            if not err:
+                self.access_token = token
+                err, login_data = self._logon(resume=True)
+
+        if err:
+            logger.error("Error resuming webchat: %s", err)
             self.state = enums.ChatState.LogOnFailed
-            logger.error("Error logging into webchat: %s", login_data["error"])
-            self._relog_chat()
+            self._reconnect_timer = -1
+            utils.timer(5.0, self.login, (self.ui_mode,))
             return self.state
 
-        self._umqid = login_data["umqid"]
-        self._message = login_data["message"]
+        if login_data["umqid"] != self._umqid:
+            # the old queue is gone along with any events we missed
+            self._umqid = login_data["umqid"]
+            self._message = login_data["message"]
+            self._message_seq = -1
+
+            if resp is None:
+                err, token, resp = get_chat_oauth_token(return_response=True)
+
+            if not err:
+                self._reconcile_details(resp)
+
+        self._poll_id = 1
+        self._reconnect_timer = -1
+        self._consecutive_poll_failures = 0
 
         self.state = enums.ChatState.LoggedOn
         utils.emit('chat_logged_on')
         utils.timer(0.5, self._poll, ())
+        self._schedule_reconcile(1.0)
         return self.state
 
+    def save_state(self, filename):
+        """Saves a snapshot of the chat session to a given filename.
+
+        The snapshot holds personas, friend groups, the access token, umqid,
+        message cursor and poll timeout, so that a restarted process can
+        `load_state` and `resume` instead of logging in from scratch.
+        The file is replaced atomically.
+
+        Parameters
+        ----------
+        filename : str
+            The filename to save the snapshot to.
+
+        Returns
+        -------
+        bool
+            True if the snapshot was written, False otherwise.
+        """
+        state = {
+            "access_token": self.access_token,
+            "ui_mode": self.ui_mode,
+            "umqid": self._umqid,
+            "message": self._message,
+            "sec_timeout": self._sec_timeout,
+            "account_persona": _pack_persona(self.account_persona) if self.account_persona else None,
+            "friends": [_pack_persona(p) for p in self.friends.values()],
+            "friend_groups": [dict(group, members=[m.accountid for m in group["members"]])
+                              for group in self.friend_groups]
+        }
+
+        payload = zlib.compress(json.dumps(
+            state, separators=(',', ':')).encode('utf-8'))
+
+        try:
+            utils.atomic_write(filename, _SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC, SNAPSHOT_VERSION) + payload)
+        except (IOError, OSError) as e:
+            logger.error("Error saving chat state: %s", e)
+            return False
+
+        return True
+
+    def load_state(self, filename):
+        """Loads a chat session snapshot written by `save_state`.
+
+        Call `resume` afterwards to reconnect; it falls back to a full
+        `login` if Steam rejects the restored session.
+
+        Parameters
+        ----------
+        filename : str
+            The filename to load the snapshot from.
+
+        Returns
+        -------
+        bool
+            True if the snapshot was loaded, False otherwise.
+        """
+        if not os.path.isfile(filename):
+            return False
+
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        try:
+            magic, version = _SNAPSHOT_HEADER.unpack_from(data)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                logger.error("Unsupported chat state snapshot: %s", filename)
+                return False
+
+            state = json.loads(zlib.decompress(
+                data[_SNAPSHOT_HEADER.size:]).decode('utf-8'))
+
+            # unpacked in full before anything is applied, so a snapshot
+            # missing a field leaves the chat untouched
+            account_persona = state["account_persona"]
+            if account_persona:
+                account_persona = _unpack_persona(account_persona)
+            friends = [_unpack_persona(packed) for packed in state["friends"]]
+            friend_groups = state["friend_groups"]
+            for group in friend_groups:
+                group["members"] = [SteamID.from_account_id(m)
+                                    for m in group["members"]]
+            restored = (state["access_token"], state["ui_mode"], state["umqid"],
+                       state["message"], state["sec_timeout"])
+        except (struct.error, zlib.error, ValueError, KeyError, TypeError) as e:
+            logger.error("Corrupt chat state snapshot: %s", e)
+            return False
+
+        self._restore_defaults()
+        (self.access_token, self.ui_mode, self._umqid,
+         self._message, self._sec_timeout) = restored
+
+        if account_persona:
+            self.account_persona = account_persona
+
+        for persona in friends:
+            self.friends[str(persona.steam_id)] = persona
+
+        self.friend_groups = friend_groups
+
+        return True
+
     def send_message(self, recipient, text, type_="saytext"):
         """Sends a message to a specified recipient.
 
@@ -260,6 +616,121 @@ class Chat(object):
         session.post(utils.url_api(
             "ISteamWebUserPresenceOAuth", "Message"), data=form)
 
+    def online_friends(self):
+        """Lists friends who are not offline.
+
+        Returns
+        -------
+        list of ``steamapi.SteamID``
+        """
+        return [persona.steam_id for persona in self.friends.values()
+                if persona.state is not enums.PersonaState.Offline]
+
+    def group_members(self, group):
+        """Lists the members of a friends list group.
+
+        Parameters
+        ----------
+        group : str or int
+            The name or ID of the group.
+
+        Returns
+        -------
+        list of ``steamapi.SteamID``
+            Empty if there is no such group.
+        """
+        for friend_group in self.friend_groups:
+            if group in (friend_group.get("name"), friend_group.get("groupid")):
+                return list(friend_group["members"])
+
+        return []
+
+    def broadcast(self, recipients, text, type_="saytext", workers=4, limiter=None):
+        """Sends one message to many recipients concurrently.
+
+        The form fields shared by every message are encoded once. Requests
+        run on a pool of `workers` threads over the session's connection
+        pool, throttled by `limiter`.
+
+        Parameters
+        ----------
+        recipients : iterable of ``steamapi.SteamID`` or str
+            The users to send to, e.g. `online_friends` or `group_members`.
+        text : str
+            The message to send.
+        type_ : str, optional
+            The type of message to be sent.
+        workers : int, optional
+            Number of concurrent requests. Keep at or below the session's
+            connection pool size (10 by default).
+        limiter : ``steamapi.ratelimit.RateLimiter``, optional
+            Rate budget for the requests. Defaults to 5 per second.
+
+        Returns
+        -------
+        list of dict
+            One result per recipient, in input order::
+
+                {
+                    "steam_id": ``steamapi.SteamID`` of the recipient,
+                                as given if it is not a valid Steam ID,
+                    "sent": True if Steam accepted the message,
+                    "error": error message or None
+                }
+
+        Raises
+        ------
+        Exception
+            Raised if you are not logged on.
+        """
+        if self.state is not enums.ChatState.LoggedOn:
+            raise Exception(
+                "Chat must be logged on before messages can be sent")
+
+        limiter = limiter if limiter is not None else RateLimiter(5)
+        url = utils.url_api("ISteamWebUserPresenceOAuth", "Message")
+        shared = urlencode({
+            "access_token": self.access_token,
+            "text": text.encode('utf-8'),
+            "type": type_,
+            "umqid": self._umqid
+        }) + "&steamid_dst="
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+        def send(recipient):
+            result = Munch(steam_id=recipient, sent=False, error=None)
+            if not isinstance(recipient, SteamID):
+                try:
+                    result.steam_id = recipient = SteamID(recipient)
+                except Exception as e:
+                    # SteamID raises plain exceptions on malformed input
+                    result.error = str(e)
+                    return result
+
+            limiter.acquire()
+
+            try:
+                resp = session.post(url, data=shared + str(recipient.as_64), headers=headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                result.error = str(e)
+                return result
+
+            if not resp.ok:
+                result.error = "HTTP error {}".format(resp.status_code)
+                return result
+
+            try:
+                error = resp.json().get("error")
+            except ValueError:
+                error = "Malformed Response"
+
+            result.sent = error == "OK"
+            result.error = None if result.sent else error
+            return result
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(send, recipients))
+
     def logout(self):
         """Requests a log out of Steam chat.
         """
@@ -278,19 +749,52 @@ class Chat(object):
             self._restore_defaults()
             self._logged_out_forcefully = True
 
-    def get_chat_history(self, steam_id):
+    def _fetch_chat_log(self, accountid):
+        """Retrieves the raw chat log with a given account ID.
+
+        Parameters
+        ----------
+        accountid : int
+            The account ID of the friend.
+
+        Returns
+        -------
+        list of dict or None
+            The decoded chat log, None if the request failed.
+        """
+        form = {"sessionid": utils.get_session_id()}
+        resp = session.post(utils.url_community(
+            "chat", "chatlog") + str(accountid), data=form)
+
+        if not resp.ok:
+            logger.error("Error in loading chatlog: %s", resp.status_code)
+            return None
+
+        return resp.json()
+
+    def get_chat_history(self, steam_id, cached=False, iterate=False):
         """Retrieves the chat history with a given steam ID.
 
+        If `archive` is set, the whole log is merged into the archive, so
+        entries missed while disconnected are kept, and the history is
+        served from the archive.
+
         Parameters
         ----------
         steam_id : ``steamapi.SteamID`` or str
             The Steam ID of which to retrieve chat history of.
             If not already an instance of ``steamapi.SteamID``, it will be converted into one.
+        cached : bool, optional
+            If True and `archive` is set, skip contacting Steam and
+            return only what is archived.
+        iterate : bool, optional
+            If True, return a generator instead of a list, so long
+            histories are not held in memory at once.
 
         Returns
         -------
-        list
-            A list of parsed history entries in the format::
+        list or generator
+            Parsed history entries in the format::
 
                 [
                     {
@@ -304,26 +808,31 @@ class Chat(object):
         if not isinstance(steam_id, SteamID):
             steam_id = SteamID(steam_id)
 
-        form = {"sessionid": utils.get_session_id()}
-        resp = session.post(utils.url_community(
-            "chat", "chatlog") + str(steam_id.accountid), data=form)
+        if self.archive is not None and cached:
+            history = self.archive.history(steam_id.accountid)
+            return history if iterate else list(history)
 
-        if not resp.ok:
-            logger.error("Error in loading chatlog: %s", resp.status_code)
-            return []
+        body = self._fetch_chat_log(steam_id.accountid)
+        if body is None:
+            return iter([]) if iterate else []
 
-        parsed = []
-        body = resp.json()
-        for msg in body:
-            steam_id = SteamID.from_account_id(msg["m_unAccountID"])
-            parsed.append(Munch({
-                "steam_id": steam_id,
-                "timestamp": msg["m_tsTimestamp"],
-                "message": msg["m_strMessage"]
-            }))
+        if self.archive is not None:
+            self.archive.add_many(
+                (steam_id.accountid, msg["m_unAccountID"], msg["m_tsTimestamp"], msg["m_strMessage"])
+                for msg in body)
+
+            history = self.archive.history(steam_id.accountid)
+            return history if iterate else list(history)
 
-        return parsed
+        history = (Munch({
+            "steam_id": SteamID.from_account_id(msg["m_unAccountID"]),
+            "timestamp": msg["m_tsTimestamp"],
+            "message": msg["m_strMessage"]
+        }) for msg in body)
 
+        return history if iterate else list(history)
+
+    @traced('chat.poll')
     def _poll(self):
         """Polls the Steam Web chat API for new events.
         """
@@ -343,17 +852,21 @@ class Chat(object):
             "access_token": self.access_token
         }
 
+        started = time.time()
         try:
-            response = session.post(
-                utils.url_api("ISteamWebUserPresenceOAuth", "Poll"), data=form, timeout=self._sec_timeout + 5)
-        except requests.exceptions.ConnectionError:
+            with tracer.span('chat.poll.request', sectimeout=self._sec_timeout):
+                response = session.post(
+                    utils.url_api("ISteamWebUserPresenceOAuth", "Poll"), data=form, timeout=self._sec_timeout + 5)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             self._poll_failed()
             return
+        rtt = time.time() - started
 
-        try:
-            body = response.json()
-        except:
-            body = {}
+        with tracer.span('chat.poll.decode'):
+            try:
+                body = response.json()
+            except:
+                body = {}
 
         if body.get("pollid") != self._poll_id:
             # discard old responses
@@ -371,40 +884,143 @@ class Chat(object):
         elif body["error"] != "OK":
             if body["error"] == "Timeout":
                 logger.debug("Timeout in chat poll: %s", body["error"])
-                if "sectimeout" in body and body["sectimeout"] > POLL_DEFAULT_TIMEOUT:
-                    self._sec_timeout = body["sectimeout"]
-
-                if self._sec_timeout < POLL_MAX_TIMEOUT:
-                    self._sec_timeout = min(
-                        self._sec_timeout + POLL_SUCCESS_INCREMENT, POLL_MAX_TIMEOUT)
+                self.poll_stats.timeouts += 1
+                self._sec_timeout = self.poll_controller.on_timeout(
+                    self._sec_timeout, rtt, body.get("sectimeout"))
             else:
                 logger.error("Error in chat poll: %s", body["error"])
                 self._poll_failed()
                 return
 
         self._message = body.get("messagelast", self._message)
+        messages = body.get("messages", [])
 
-        for message in body.get("messages", []):
-            sender = SteamID.from_account_id(message['accountid_from'])
-
-            type_ = message["type"]
-            if type_ == "personastate":
-                self._update_persona(sender)
-            elif type_ == "saytext" or type_ == "my_saytext":
-                utils.emit('chat_message', sender,
-                           message["text"], type_ == "my_saytext")
-            elif type_ == "typing":
-                utils.emit('chat_typing', sender)
-            # elif type_ == "personarelationship":
-            #     print("type == personarelationship:")
-            #     print(message)
-            else:
-                logger.warning("Unhandled message type: %s", type_)
+        if "messagebase" in body:
+            # messages are numbered from messagebase, skip any delivered before
+            base = body["messagebase"]
+            skip = max(0, self._message_seq + 1 - base)
+            messages = messages[skip:]
+            self._message_seq = max(self._message_seq, base + skip + len(messages) - 1)
+
+        self.poll_stats.polls += 1
+        self.poll_stats.rtt.observe(rtt)
+        self.poll_stats.messages.observe(len(messages))
+        if messages:
+            self._sec_timeout = self.poll_controller.on_messages(
+                self._sec_timeout, rtt, len(messages))
+
+        with tracer.span('chat.dispatch', messages=len(messages)):
+            self._dispatch(messages)
 
         self.state = enums.ChatState.LoggedOn
         self._consecutive_poll_failures = 0
         utils.timer(0.5, self._poll)
 
+    def _dispatch(self, messages):
+        """Turns polled messages into events and emits them.
+
+        Each message is emitted as its own event (``chat_message``,
+        ``chat_typing``, ``chat_persona_state``), unless `batch_events` is
+        set, in which case the whole poll is emitted once as ``chat_batch``
+        with a list of ``steamapi.events.ChatEvent``.
+
+        Parameters
+        ----------
+        messages : list of dict
+            The ``messages`` of a poll response.
+        """
+        batch = []
+
+        if self.coalescer is not None:
+            # only the last persona change per sender in a poll matters
+            last_persona = {}
+            for idx, message in enumerate(messages):
+                if message["type"] == "personastate":
+                    last_persona[message['accountid_from']] = idx
+
+        for idx, message in enumerate(messages):
+            with tracer.span('chat.message', type=message["type"]):
+                accountid = message['accountid_from']
+                timestamp = message.get("utc_timestamp")
+
+                type_ = message["type"]
+                if (type_ == "saytext" or type_ == "my_saytext") and \
+                        self.deduplicator is not None and self.deduplicator.check(message):
+                    logger.debug("Dropped duplicate chat message from %s", accountid)
+                    continue
+
+                if self.coalescer is not None and not self._coalesce(message, idx, last_persona):
+                    continue
+
+                if type_ == "personastate":
+                    persona, old_persona = self._update_persona(
+                        SteamID.from_account_id(accountid), emit=not self.batch_events)
+                    event = events.PersonaState(
+                        accountid, persona, old_persona, timestamp)
+                elif type_ == "saytext" or type_ == "my_saytext":
+                    event = events.ChatMessage(
+                        accountid, message["text"], type_ == "my_saytext", timestamp)
+                    if self.archive is not None:
+                        self._archive_message(event)
+                    if not self.batch_events:
+                        utils.emit('chat_message', event.steam_id,
+                                   event.text, event.own)
+                elif type_ == "typing":
+                    event = events.Typing(accountid, timestamp)
+                    if not self.batch_events:
+                        utils.emit('chat_typing', event.steam_id)
+                elif type_ == "personarelationship":
+                    event = events.Relationship(
+                        accountid, message.get("persona_state"), timestamp)
+                    self._set_relationship(
+                        event.steam_id, event.relationship, emit=not self.batch_events)
+                else:
+                    logger.warning("Unhandled message type: %s", type_)
+                    continue
+
+                batch.append(event)
+
+                if timestamp is not None:
+                    self.poll_stats.delivery.observe(
+                        max(0, time.time() - timestamp))
+
+        if self.batch_events and batch:
+            utils.emit('chat_batch', batch)
+
+    def _archive_message(self, event):
+        """Stores a polled chat message in `archive`.
+        """
+        sender = event.accountid
+        if event.own:
+            # the account ID is the recipient for our own messages
+            sender = self.account_persona.steam_id.accountid if self.account_persona else 0
+
+        self.archive.add(event.accountid, sender,
+                         event.timestamp or int(time.time()), event.text)
+
+    def _coalesce(self, message, idx, last_persona):
+        """Checks a polled message against `coalescer`.
+
+        Returns
+        -------
+        bool
+            True if the message should be dispatched.
+        """
+        accountid = message['accountid_from']
+        type_ = message["type"]
+
+        if type_ == "personastate":
+            if last_persona[accountid] != idx:
+                self.coalescer.merge(type_)
+                return False
+
+            def trailing():
+                self._dispatch([{"type": type_, "accountid_from": accountid}])
+
+            return self.coalescer.allow(type_, accountid, trailing)
+
+        return self.coalescer.allow(type_, accountid)
+
     def _poll_failed(self):
         """Tracks consecutive poll failures and reconnects if need be.
         """
@@ -415,9 +1031,9 @@ class Chat(object):
         # set chat to offline while failing
         self.state = enums.ChatState.Offline
 
-        if failures == 1:
-            if self._sec_timeout > POLL_DEFAULT_TIMEOUT:
-                self._sec_timeout -= POLL_SUCCESS_INCREMENT
+        self.poll_stats.errors += 1
+        self._sec_timeout = self.poll_controller.on_failure(
+            self._sec_timeout, failures)
 
         if failures < 3:
             logger.error(
@@ -432,11 +1048,12 @@ class Chat(object):
         """Re-initiates login to Steam chat.
         """
         logger.info("Attempting to relogin to web chat")
+        self.poll_stats.relogs += 1
         if not self._logged_out_forcefully and self._reconnect_timer == -1:
             self.state = enums.ChatState.Offline
             self._reconnect_timer = 5
 
-            self.login(self.ui_mode)
+            self.resume()
 
     def get_friends_list(self):
         """Loads friend data
@@ -466,10 +1083,11 @@ class Chat(object):
                 - ignoredfriend
                 - suggestedfriend
         """
+        steam_id = self.account_persona.steam_id if self.account_persona else utils.get_steam_id()
         form = {
             "access_token": self.access_token,
             "umqid": self._umqid,
-            "steamid": str(utils.get_steam_id())
+            "steamid": str(steam_id)
         }
 
         try:
@@ -497,7 +1115,98 @@ class Chat(object):
 
         return []
 
-    def _update_persona(self, steam_id):
+    def _set_relationship(self, steam_id, relationship, emit=True):
+        """Applies a relationship change to `relationships`.
+
+        Emits ``chat_relationship`` with the new and old relationship, as
+        well as ``friend_added`` or ``friend_removed`` when the user
+        becomes or stops being a friend.
+
+        Parameters
+        ----------
+        steam_id : ``steamapi.SteamID``
+            The user whose relationship changed.
+        relationship : ``steamapi.enums.FriendRelationship`` or int
+            The new relationship.
+        emit : bool, optional
+            Whether to emit events for the change.
+        """
+        relationship = enums.FriendRelationship(relationship or 0)
+        old = self.relationships.get(str(steam_id), enums.FriendRelationship.NONE)
+
+        if relationship is enums.FriendRelationship.NONE:
+            self.relationships.pop(str(steam_id), None)
+        else:
+            self.relationships[str(steam_id)] = relationship
+
+        if not emit or relationship is old:
+            return
+
+        utils.emit('chat_relationship', steam_id, relationship, old)
+        if relationship is enums.FriendRelationship.Friend:
+            utils.emit('friend_added', steam_id)
+        elif old is enums.FriendRelationship.Friend:
+            utils.emit('friend_removed', steam_id)
+
+    def reconcile_relationships(self):
+        """Brings `relationships` in line with the full friend list.
+
+        Relationship changes are normally applied from poll events; this
+        catches anything missed, e.g. while disconnected. Events are
+        emitted only for relationships which differ, and not at all when
+        `relationships` is first populated.
+
+        Returns
+        -------
+        bool
+            True if the friend list was retrieved, False otherwise.
+        """
+        friends = self.get_friends_list()
+        if not friends and self.relationships:
+            # most likely a failed request rather than an emptied list
+            return False
+
+        emit = bool(self.relationships)
+        current = {}
+        for friend in friends:
+            current[str(friend.steam_id)] = (friend.steam_id, _RELATIONSHIP_NAMES.get(
+                friend.relationship, enums.FriendRelationship.NONE))
+
+        for key in list(self.relationships.keys()):
+            if key not in current:
+                self._set_relationship(
+                    SteamID(key), enums.FriendRelationship.NONE, emit)
+
+        for steam_id, relationship in current.values():
+            self._set_relationship(steam_id, relationship, emit)
+
+        return True
+
+    def _schedule_reconcile(self, delay):
+        """Starts a new chain of periodic `reconcile_relationships` calls.
+
+        Any previously scheduled chain stops at its next run.
+        """
+        self._reconcile_generation += 1
+        utils.timer(delay, self._periodic_reconcile,
+                    (self._reconcile_generation,))
+
+    def _periodic_reconcile(self, generation):
+        if generation != self._reconcile_generation or self.state is not enums.ChatState.LoggedOn:
+            return
+
+        try:
+            self.reconcile_relationships()
+        except Exception as e:
+            # runs on a timer thread; an error must not end the chain
+            logger.warning("Error reconciling relationships: %s", e)
+
+        if self.relationship_reconcile_interval:
+            utils.timer(self.relationship_reconcile_interval,
+                        self._periodic_reconcile, (generation,))
+
+    @traced('chat.update_persona')
+    def _update_persona(self, steam_id, emit=True):
         """Retrieves new persona data for when persona event is received.
 
         Parameters
@@ -505,6 +1214,12 @@ class Chat(object):
         steam_id : ``steamapi.SteamID`` or str
             The Steam ID of the user to update persona of.
             If not already an instance of ``steamapi.SteamID``, it will be converted into one.
+        emit : bool, optional
+            Whether to emit ``chat_persona_state``.
+
+        Returns
+        -------
+        tuple of (persona: dict or None, old persona: dict)
         """
         if not isinstance(steam_id, SteamID):
             steam_id = SteamID(steam_id)
@@ -514,7 +1229,7 @@ class Chat(object):
 
         if not response.ok:
             logger.error("Chat update persona error: %s", response.status_code)
-            return
+            return (None, self.friends.get(str(steam_id), {}))
 
         if str(steam_id) in self.friends:
             old_persona = self.friends[str(steam_id)]
@@ -536,9 +1251,12 @@ class Chat(object):
             "nickname": old_persona.get("nickname", None)
         })
 
-        utils.emit('chat_persona_state', steam_id, persona, old_persona)
+        if emit:
+            utils.emit('chat_persona_state', steam_id, persona, old_persona)
         self.friends[str(steam_id)] = persona
 
+        return (persona, old_persona)
+
     @property
     def logged_in(self):
         """Checks whether instance is logged into the Steam chat.
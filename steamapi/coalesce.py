@@ -0,0 +1,142 @@
+import time
+from threading import Lock
+from . import utils
+
+# window length in seconds per message type, see `Coalescer`
+DEFAULT_WINDOWS = {
+    "typing": 5.0,
+    "personastate": 2.0
+}
+
+
+class Coalescer(object):
+    """Collapses repeated chat events from the same sender.
+
+    The first event of a type from a sender passes and opens a window.
+    Repeats inside that window are either dropped (typing) or merged into
+    a single trailing event fired when the window closes (persona
+    changes), so only the latest state is acted upon.
+
+    Trailing events are fired from a timer thread, not the thread which
+    called `allow`.
+
+    Assign an instance to ``Chat.coalescer`` to enable it.
+
+    Attributes
+    ----------
+    windows : dict
+        Window length in seconds per message type. Types missing
+        from it are never coalesced.
+    dropped : dict
+        Number of events dropped per message type.
+    merged : dict
+        Number of events folded into a trailing event per message type.
+    """
+
+    def __init__(self, windows=None):
+        self.windows = dict(DEFAULT_WINDOWS if windows is None else windows)
+        self._sender_windows = {}
+        self._open = {}
+        self._lock = Lock()
+        self.dropped = {}
+        self.merged = {}
+
+    def set_window(self, type_, seconds, accountid=None):
+        """Sets the window of a message type.
+
+        Parameters
+        ----------
+        type_ : str
+            The message type, e.g. ``"typing"``.
+        seconds : float or None
+            The window length; None disables coalescing.
+        accountid : int, optional
+            Only set the window for this sender.
+        """
+        windows = self.windows if accountid is None else self._sender_windows
+        key = type_ if accountid is None else (type_, accountid)
+
+        if seconds is None:
+            windows.pop(key, None)
+        else:
+            windows[key] = seconds
+
+    def _window(self, type_, accountid):
+        return self._sender_windows.get((type_, accountid), self.windows.get(type_))
+
+    def allow(self, type_, accountid, trailing=None):
+        """Decides whether an event passes or is coalesced.
+
+        Parameters
+        ----------
+        type_ : str
+            The message type.
+        accountid : int
+            Account ID of the sender.
+        trailing : function, optional
+            If given, a coalesced event is merged instead of dropped and
+            `trailing` is called once when the window closes.
+
+        Returns
+        -------
+        bool
+            True if the event should be handled now.
+        """
+        window = self._window(type_, accountid)
+        if not window:
+            return True
+
+        key = (type_, accountid)
+        now = time.time()
+
+        with self._lock:
+            opened = self._open.get(key)
+            if opened is None or now - opened[0] >= window:
+                self._open[key] = [now, False]
+                if len(self._open) > 4096:
+                    self._prune(now)
+                return True
+
+            if trailing is None:
+                self.dropped[type_] = self.dropped.get(type_, 0) + 1
+                return False
+
+            self._count_merged(type_)
+            if not opened[1]:
+                opened[1] = True
+                utils.timer(opened[0] + window - now,
+                            self._fire, (key, trailing))
+
+        return False
+
+    def merge(self, type_):
+        """Counts an event folded into a later one by the caller.
+        """
+        with self._lock:
+            self._count_merged(type_)
+
+    def _count_merged(self, type_):
+        self.merged[type_] = self.merged.get(type_, 0) + 1
+
+    def _fire(self, key, trailing):
+        with self._lock:
+            self._open.pop(key, None)
+        trailing()
+
+    def _prune(self, now):
+        longest = max(list(self.windows.values()) +
+                      list(self._sender_windows.values()))
+        for key, opened in list(self._open.items()):
+            if not opened[1] and now - opened[0] >= longest:
+                del self._open[key]
+
+    def stats(self):
+        """Counts of coalesced events.
+
+        Returns
+        -------
+        dict
+            ``{"dropped": {type: count}, "merged": {type: count}}``
+        """
+        with self._lock:
+            return {"dropped": dict(self.dropped), "merged": dict(self.merged)}
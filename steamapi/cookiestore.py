@@ -0,0 +1,218 @@
+from __future__ import unicode_literals
+import json
+import binascii
+import os
+import sqlite3
+from contextlib import contextmanager
+import requests
+from io import open
+from . import utils
+import logging
+logger = logging.getLogger(__name__)
+
+
+def dump_jar(jar):
+    """Serializes a cookie jar into compact JSON.
+
+    Parameters
+    ----------
+    jar : ``requests.cookies.RequestsCookieJar``
+        The cookie jar to serialize.
+
+    Returns
+    -------
+    bytes
+        The serialized cookies.
+    """
+    cookies = [[c.name, c.value, c.domain, c.path, c.secure, c.expires]
+               for c in jar]
+    return json.dumps(cookies, separators=(',', ':')).encode('utf-8')
+
+
+def load_jar(data):
+    """Deserializes cookies written by `dump_jar`.
+
+    Parameters
+    ----------
+    data : bytes or str
+        The serialized cookies.
+
+    Returns
+    -------
+    ``requests.cookies.RequestsCookieJar``
+        A cookie jar containing the cookies.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+
+    jar = requests.cookies.RequestsCookieJar()
+    for name, value, domain, path, secure, expires in json.loads(data):
+        jar.set_cookie(requests.cookies.create_cookie(
+            name, value, domain=domain, path=path, secure=secure, expires=expires))
+
+    return jar
+
+
+class FileCookieStore(object):
+    """Stores cookie jars of many accounts as one file per account.
+
+    Nothing is read until an account is loaded, so opening a store
+    is free regardless of how many accounts it holds.
+
+    Attributes
+    ----------
+    directory : str
+        The directory the cookie files are kept in.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _filename(self, account):
+        # hex keeps every account name distinct, even on case-insensitive
+        # file systems
+        encoded = binascii.hexlify(str(account).encode('utf-8')).decode('ascii')
+        return os.path.join(self.directory, encoded + '.cookies')
+
+    def save(self, account, jar):
+        """Atomically saves the cookie jar of an account.
+
+        Parameters
+        ----------
+        account : str
+            The account the cookies belong to.
+        jar : ``requests.cookies.RequestsCookieJar``
+            The cookies to save.
+        """
+        utils.atomic_write(self._filename(account), dump_jar(jar))
+
+    def load(self, account):
+        """Loads the cookie jar of an account.
+
+        Parameters
+        ----------
+        account : str
+            The account to load cookies of.
+
+        Returns
+        -------
+        ``requests.cookies.RequestsCookieJar`` or None
+            The stored cookies, or None if none are stored.
+        """
+        filename = self._filename(account)
+        if not os.path.isfile(filename):
+            return None
+
+        with open(filename, 'rb') as f:
+            return load_jar(f.read())
+
+    def delete(self, account):
+        """Removes the stored cookies of an account.
+        """
+        filename = self._filename(account)
+        if os.path.isfile(filename):
+            os.unlink(filename)
+
+    def accounts(self):
+        """Lists the accounts with stored cookies.
+
+        Returns
+        -------
+        list of str
+        """
+        accounts = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.cookies'):
+                continue
+            try:
+                accounts.append(binascii.unhexlify(name[:-len('.cookies')]).decode('utf-8'))
+            except (ValueError, TypeError, UnicodeDecodeError):
+                logger.warning("Ignoring unrecognized cookie file %s", name)
+        return accounts
+
+
+class SQLiteCookieStore(object):
+    """Stores cookie jars of many accounts in a single SQLite database.
+
+    Safe to share between worker processes; every call uses its own
+    connection and writes are done in a single transaction.
+
+    Attributes
+    ----------
+    filename : str
+        The SQLite database file.
+    timeout : float
+        Seconds to wait for another process to release the database.
+    """
+
+    def __init__(self, filename, timeout=30.0):
+        self.filename = filename
+        self.timeout = timeout
+
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS cookies ('
+                       'account TEXT PRIMARY KEY, jar BLOB NOT NULL)')
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.filename, timeout=self.timeout)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def save(self, account, jar):
+        """Saves the cookie jar of an account.
+
+        Parameters
+        ----------
+        account : str
+            The account the cookies belong to.
+        jar : ``requests.cookies.RequestsCookieJar``
+            The cookies to save.
+        """
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO cookies (account, jar) VALUES (?, ?)',
+                       (str(account), dump_jar(jar)))
+
+    def load(self, account):
+        """Loads the cookie jar of an account.
+
+        Parameters
+        ----------
+        account : str
+            The account to load cookies of.
+
+        Returns
+        -------
+        ``requests.cookies.RequestsCookieJar`` or None
+            The stored cookies, or None if none are stored.
+        """
+        with self._connect() as db:
+            row = db.execute('SELECT jar FROM cookies WHERE account = ?',
+                             (str(account),)).fetchone()
+
+        if row is None:
+            return None
+
+        return load_jar(bytes(row[0]))
+
+    def delete(self, account):
+        """Removes the stored cookies of an account.
+        """
+        with self._connect() as db:
+            db.execute('DELETE FROM cookies WHERE account = ?', (str(account),))
+
+    def accounts(self):
+        """Lists the accounts with stored cookies.
+
+        Returns
+        -------
+        list of str
+        """
+        with self._connect() as db:
+            return [row[0] for row in db.execute('SELECT account FROM cookies')]
@@ -0,0 +1,74 @@
+from collections import deque
+from threading import Lock
+
+
+class Deduplicator(object):
+    """Remembers a bounded window of recently seen message fingerprints.
+
+    Memory use is constant: once `size` fingerprints are held, the oldest
+    is forgotten for every new one.
+
+    Attributes
+    ----------
+    size : int
+        How many fingerprints to remember.
+    duplicates : int
+        Number of duplicates detected.
+    """
+
+    def __init__(self, size=2048):
+        self.size = size
+        self.duplicates = 0
+        self._ring = deque()
+        self._seen = set()
+        self._lock = Lock()
+
+    @staticmethod
+    def fingerprint(message):
+        """Builds the fingerprint of a polled message.
+
+        Parameters
+        ----------
+        message : dict
+            A message of a poll response.
+
+        Returns
+        -------
+        int
+        """
+        return hash((message["type"], message.get("accountid_from"), message.get("timestamp"),
+                     message.get("utc_timestamp"), message.get("text")))
+
+    def check(self, message):
+        """Checks whether a message was already seen, remembering it if not.
+
+        Parameters
+        ----------
+        message : dict
+            A message of a poll response.
+
+        Returns
+        -------
+        bool
+            True if the message is a duplicate.
+        """
+        fingerprint = self.fingerprint(message)
+
+        with self._lock:
+            if fingerprint in self._seen:
+                self.duplicates += 1
+                return True
+
+            self._seen.add(fingerprint)
+            self._ring.append(fingerprint)
+            if len(self._ring) > self.size:
+                self._seen.discard(self._ring.popleft())
+
+        return False
+
+    def clear(self):
+        """Forgets all fingerprints.
+        """
+        with self._lock:
+            self._ring.clear()
+            self._seen.clear()
@@ -0,0 +1,278 @@
+from __future__ import unicode_literals
+import sys
+import time
+import traceback
+from functools import partial
+from threading import Lock, Thread, get_ident
+from pyee import EventEmitter
+from .stats import Histogram
+import logging
+logger = logging.getLogger(__name__)
+
+# handlers usually take well under a millisecond
+HANDLER_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25,
+                   0.5, 1, 2.5, 5, 10)
+
+# seconds a handler may run before the watchdog warns about it
+SLOW_HANDLER_THRESHOLD = 0.5
+
+# seconds between repeated warnings about the same handler
+SLOW_HANDLER_WARN_INTERVAL = 60
+
+
+def handler_name(handler):
+    """Gets a readable name of an event handler.
+    """
+    if isinstance(handler, partial):
+        handler = handler.func
+
+    name = getattr(handler, '__qualname__', None) or getattr(handler, '__name__', None)
+    if name is None:
+        return repr(handler)
+
+    module = getattr(handler, '__module__', None)
+    return '{}.{}'.format(module, name) if module else name
+
+
+class HandlerStats(object):
+    """Timing of one handler of one event.
+
+    Attributes
+    ----------
+    time : ``steamapi.stats.Histogram``
+        Seconds per invocation; its ``count``, ``sum`` and ``max`` are the
+        invocation count, total and maximum time.
+    slow : int
+        Invocations which ran past the slow handler threshold.
+    """
+
+    def __init__(self):
+        self.time = Histogram(HANDLER_BUCKETS)
+        self.slow = 0
+        self._warned = 0
+        self._suppressed = 0
+
+    def as_dict(self):
+        stats = self.time.as_dict()
+        stats["slow"] = self.slow
+        return stats
+
+
+class TimedEmitter(EventEmitter):
+    """An event emitter which times every handler it calls.
+
+    Handlers are wrapped as they are added, so pyee only ever sees the
+    wrappers; `remove_listener` and `listeners` take and return the
+    handlers as given.
+
+    A watchdog thread checks running handlers; one running longer than
+    `slow_threshold` seconds is logged with a sample of its current stack,
+    at most once every `warn_interval` seconds per handler.
+
+    Attributes
+    ----------
+    slow_threshold : float or None
+        None disables the watchdog.
+    warn_interval : float
+    """
+
+    def __init__(self, slow_threshold=SLOW_HANDLER_THRESHOLD,
+                 warn_interval=SLOW_HANDLER_WARN_INTERVAL):
+        EventEmitter.__init__(self)
+        self.slow_threshold = slow_threshold
+        self.warn_interval = warn_interval
+        self._stats = {}
+        self._stats_lock = Lock()
+        # thread ident: [event, name, stats, started, warned by the watchdog]
+        self._running = {}
+        self._watchdog = None
+        # (event, handler): timing wrappers registered with pyee, and back
+        self._wrappers = {}
+        self._originals = {}
+
+    def _handler_stats(self, event, name):
+        key = (event, name)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._stats_lock:
+                stats = self._stats.setdefault(key, HandlerStats())
+        return stats
+
+    def _wrap(self, event, f):
+        if getattr(f, 'times_handlers', False):
+            # a dispatcher which times the handlers it calls through `call`
+            return f
+        name = handler_name(f)
+
+        def timed(*args, **kwargs):
+            return self._timed_call(event, name, f, args, kwargs)
+        return timed
+
+    def _remember(self, event, f, wrapper):
+        with self._stats_lock:
+            self._wrappers.setdefault((event, f), []).append(wrapper)
+            self._originals[wrapper] = f
+
+    def _forget(self, event, f, wrapper=None):
+        with self._stats_lock:
+            wrappers = self._wrappers.get((event, f))
+            if not wrappers:
+                return None
+            if wrapper is None:
+                wrapper = wrappers[-1]
+            elif wrapper not in wrappers:
+                return None
+            wrappers.remove(wrapper)
+            if not wrappers:
+                del self._wrappers[(event, f)]
+            self._originals.pop(wrapper, None)
+            return wrapper
+
+    def on(self, event, f=None):
+        if f is None:
+            return lambda f: self.add_listener(event, f)
+        return self.add_listener(event, f)
+
+    def add_listener(self, event, f):
+        wrapper = self._wrap(event, f)
+        self._remember(event, f, wrapper)
+        EventEmitter.add_listener(self, event, wrapper)
+        return f
+
+    def once(self, event, f=None):
+        def register(f):
+            timed = self._wrap(event, f)
+
+            def fire(*args, **kwargs):
+                self._forget(event, f, fire)
+                return timed(*args, **kwargs)
+
+            self._remember(event, f, fire)
+            EventEmitter.once(self, event, fire)
+            return f
+
+        return register if f is None else register(f)
+
+    def remove_listener(self, event, f):
+        wrapper = self._forget(event, f)
+        EventEmitter.remove_listener(self, event, f if wrapper is None else wrapper)
+
+    def remove_all_listeners(self, event=None):
+        with self._stats_lock:
+            for key in [key for key in self._wrappers if event is None or key[0] == event]:
+                for wrapper in self._wrappers.pop(key):
+                    self._originals.pop(wrapper, None)
+        EventEmitter.remove_all_listeners(self, event)
+
+    def listeners(self, event):
+        with self._stats_lock:
+            return [self._originals.get(f, f) for f in EventEmitter.listeners(self, event)]
+
+    def call(self, event, handler, *args, **kwargs):
+        """Calls and times a handler of an event on behalf of a dispatcher
+        registered with a true ``times_handlers`` attribute.
+
+        Parameters
+        ----------
+        event : str
+        handler : callable
+            Called with the remaining arguments.
+        name : str, optional
+            Name to report the timing under; defaults to the handler's.
+        """
+        name = kwargs.pop('name', None) or handler_name(handler)
+        return self._timed_call(event, name, handler, args, kwargs)
+
+    def _timed_call(self, event, name, f, args, kwargs):
+        if self.slow_threshold and self._watchdog is None:
+            self._start_watchdog()
+
+        ident = get_ident()
+        outer = self._running.get(ident)
+        stats = self._handler_stats(event, name)
+        started = time.time()
+        self._running[ident] = [event, name, stats, started, False]
+        try:
+            return f(*args, **kwargs)
+        finally:
+            elapsed = time.time() - started
+            stats.time.observe(elapsed)
+            if self.slow_threshold and elapsed > self.slow_threshold:
+                stats.slow += 1
+                if not self._running[ident][4]:
+                    # finished between two watchdog checks
+                    self._warn(event, name, stats, elapsed)
+
+            # handlers may emit events themselves
+            if outer is None:
+                self._running.pop(ident, None)
+            else:
+                self._running[ident] = outer
+
+    def _start_watchdog(self):
+        with self._stats_lock:
+            if self._watchdog is not None:
+                return
+            self._watchdog = Thread(target=self._watch, name='steamapi-handler-watchdog')
+            self._watchdog.daemon = True
+            self._watchdog.start()
+
+    def _watch(self):
+        while True:
+            threshold = self.slow_threshold
+            time.sleep(min(max(threshold or 1, 0.05), 1) / 2)
+            if not threshold:
+                continue
+
+            now = time.time()
+            frames = None
+            for ident, running in list(self._running.items()):
+                event, name, stats, started, flagged = running
+                if flagged or now - started <= threshold:
+                    continue
+
+                running[4] = True
+                if frames is None:
+                    frames = sys._current_frames()
+                frame = frames.get(ident)
+                stack = ''.join(traceback.format_stack(frame)) if frame is not None else None
+                self._warn(event, name, stats, now - started, stack)
+
+    def _warn(self, event, name, stats, elapsed, stack=None):
+        now = time.time()
+        if now - stats._warned < self.warn_interval:
+            stats._suppressed += 1
+            return
+
+        suppressed, stats._suppressed = stats._suppressed, 0
+        stats._warned = now
+
+        if stack is None:
+            logger.warning("Slow handler %s for %r took %.3fs (%d warnings suppressed)",
+                           name, event, elapsed, suppressed)
+        else:
+            logger.warning("Slow handler %s for %r running for %.3fs (%d warnings suppressed)\n%s",
+                           name, event, elapsed, suppressed, stack)
+
+    def handler_stats(self):
+        """Gets the timing of every handler called so far.
+
+        Returns
+        -------
+        dict
+            ``{event: {handler name: stats}}``, with stats as in
+            ``steamapi.stats.Histogram.as_dict`` plus the ``slow`` count.
+        """
+        with self._stats_lock:
+            items = list(self._stats.items())
+
+        result = {}
+        for (event, name), stats in items:
+            result.setdefault(event, {})[name] = stats.as_dict()
+        return result
+
+    def reset_handler_stats(self):
+        """Discards all handler timing.
+        """
+        with self._stats_lock:
+            self._stats = {}
@@ -0,0 +1,98 @@
+from .steamid import SteamID
+
+
+class ChatEvent(object):
+    """Base of the events delivered by ``chat_batch``.
+
+    Events carry the raw account ID of the user involved; the
+    ``steamapi.SteamID`` is only built when `steam_id` is accessed.
+
+    Attributes
+    ----------
+    accountid : int
+        Account ID (aka Steam32 ID) of the user the event is about.
+    timestamp : int or None
+        UTC timestamp Steam reported for the event, if any.
+    """
+    __slots__ = ('accountid', 'timestamp', '_steam_id')
+
+    def __init__(self, accountid, timestamp=None):
+        self.accountid = accountid
+        self.timestamp = timestamp
+        self._steam_id = None
+
+    @property
+    def steam_id(self):
+        """``steamapi.SteamID`` of the user the event is about.
+        """
+        if self._steam_id is None:
+            self._steam_id = SteamID.from_account_id(self.accountid)
+        return self._steam_id
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(name, getattr(self, name)) for name in self._fields()))
+
+    def _fields(self):
+        fields = []
+        for cls in reversed(type(self).__mro__):
+            fields.extend(n for n in getattr(cls, '__slots__', ()) if not n.startswith('_'))
+        return fields
+
+
+class ChatMessage(ChatEvent):
+    """A chat message, sent either by a friend or by yourself.
+
+    Attributes
+    ----------
+    text : str
+        The message.
+    own : bool
+        True if you sent the message from another client, in which case
+        `accountid` is the recipient.
+    """
+    __slots__ = ('text', 'own')
+
+    def __init__(self, accountid, text, own=False, timestamp=None):
+        ChatEvent.__init__(self, accountid, timestamp)
+        self.text = text
+        self.own = own
+
+
+class Typing(ChatEvent):
+    """A friend is typing a message.
+    """
+    __slots__ = ()
+
+
+class PersonaState(ChatEvent):
+    """A friend's persona changed.
+
+    Attributes
+    ----------
+    persona : dict or None
+        The refreshed persona, None if it could not be retrieved.
+    old_persona : dict
+        The previously stored persona.
+    """
+    __slots__ = ('persona', 'old_persona')
+
+    def __init__(self, accountid, persona=None, old_persona=None, timestamp=None):
+        ChatEvent.__init__(self, accountid, timestamp)
+        self.persona = persona
+        self.old_persona = old_persona or {}
+
+
+class Relationship(ChatEvent):
+    """Your relationship with a user changed.
+
+    Attributes
+    ----------
+    relationship : int
+        The new relationship, as reported by Steam.
+    """
+    __slots__ = ('relationship',)
+
+    def __init__(self, accountid, relationship, timestamp=None):
+        ChatEvent.__init__(self, accountid, timestamp)
+        self.relationship = relationship
@@ -0,0 +1,184 @@
+from __future__ import unicode_literals
+from threading import Lock
+from munch import Munch
+
+try:
+    from html.parser import HTMLParser
+except ImportError:
+    from HTMLParser import HTMLParser
+
+_VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                        'link', 'meta', 'param', 'source', 'track', 'wbr'])
+
+
+class _FormParser(HTMLParser):
+    """Collects the fields of one form and the page's error text in a single pass.
+    """
+
+    def __init__(self, form_id, skip_types):
+        HTMLParser.__init__(self)
+        self.form_id = form_id
+        self.skip_types = skip_types
+        self.values = {}
+        self.checked = {}
+        self.error = []
+
+        self._in_form = False
+        self._textarea = None
+        self._select = None
+        self._option = None
+        self._error_depth = 0
+        self._capture_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+
+        if tag not in _VOID_TAGS:
+            if self._capture_depth:
+                self._capture_depth += 1
+            elif self._error_depth and 'formRowFields' in (attrs.get('class') or '').split():
+                self._capture_depth = 1
+
+            if self._error_depth:
+                self._error_depth += 1
+            elif attrs.get('id') == 'errorText':
+                self._error_depth = 1
+
+        if tag == 'form':
+            self._in_form = attrs.get('id') == self.form_id
+            return
+
+        if not self._in_form:
+            return
+
+        name = attrs.get('name')
+        if tag == 'input' and name:
+            type_ = (attrs.get('type') or 'text').lower()
+            if type_ in self.skip_types:
+                return
+
+            if type_ in ('radio', 'checkbox'):
+                if 'checked' in attrs:
+                    self.values[name] = self.checked[name] = attrs.get('value') or 'on'
+                else:
+                    self.values.setdefault(name, None)
+            else:
+                self.values[name] = attrs.get('value')
+        elif tag == 'textarea' and name:
+            self._textarea = [name]
+        elif tag == 'select' and name:
+            self._select = (name, [])
+        elif tag == 'option' and self._select is not None:
+            self._option = [attrs.get('value'), 'selected' in attrs, 'disabled' in attrs, '']
+            self._select[1].append(self._option)
+
+    def handle_endtag(self, tag):
+        if tag not in _VOID_TAGS:
+            if self._capture_depth:
+                self._capture_depth -= 1
+            if self._error_depth:
+                self._error_depth -= 1
+
+        if tag == 'form':
+            self._in_form = False
+        elif tag == 'textarea' and self._textarea is not None:
+            self.values[self._textarea[0]] = ''.join(self._textarea[1:])
+            self._textarea = None
+        elif tag == 'option':
+            self._option = None
+        elif tag == 'select' and self._select is not None:
+            self.values[self._select[0]] = self._select_value(self._select[1])
+            self._select = None
+
+    def handle_data(self, data):
+        if self._textarea is not None:
+            self._textarea.append(data)
+        if self._option is not None:
+            self._option[3] += data
+        if self._capture_depth:
+            self.error.append(data)
+
+    @staticmethod
+    def _select_value(options):
+        # the last selected option, or else the first enabled one
+        chosen = [o for o in options if o[1]][-1:] or [o for o in options if not o[2]][:1]
+        if not chosen:
+            return None
+
+        value, selected, disabled, text = chosen[0]
+        return value if value is not None else text.strip()
+
+
+def extract_form(html, form_id='editForm', skip_types=()):
+    """Extracts the fields of a form without building a DOM.
+
+    Parameters
+    ----------
+    html : str
+        The page containing the form.
+    form_id : str, optional
+        The ``id`` of the form to extract.
+    skip_types : tuple of str, optional
+        Input types to leave out, e.g. ``('file',)``.
+
+    Returns
+    -------
+    dict
+        A dict in the format::
+
+            {
+                "fields": {field name: value},
+                "checked": {field name: value of the checked radio or checkbox},
+                "error": text of ``#errorText .formRowFields`` or None
+            }
+
+        Unchecked radio and checkbox fields have a value of None.
+    """
+    parser = _FormParser(form_id, skip_types)
+    parser.feed(html)
+    parser.close()
+
+    error = ' '.join(''.join(parser.error).split())
+    return Munch(fields=parser.values, checked=parser.checked, error=error or None)
+
+
+_cache = {}
+_cache_lock = Lock()
+
+
+def remember(url, form):
+    """Caches the last seen state of the form at a URL.
+    """
+    with _cache_lock:
+        _cache[url] = form
+
+
+def recall(url):
+    """Gets the cached state of the form at a URL.
+
+    Returns
+    -------
+    dict or None
+        A copy of what `extract_form` returned, None if nothing is cached.
+    """
+    with _cache_lock:
+        form = _cache.get(url)
+
+    if form is None:
+        return None
+
+    return Munch(fields=dict(form.fields), checked=dict(form.checked), error=form.error)
+
+
+def forget(url):
+    """Drops the cached state of the form at a URL.
+    """
+    with _cache_lock:
+        _cache.pop(url, None)
+
+
+def clear():
+    """Drops every cached form state, e.g. after logging in again.
+    """
+    with _cache_lock:
+        _cache.clear()
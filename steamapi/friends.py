@@ -0,0 +1,150 @@
+from __future__ import unicode_literals
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from munch import Munch
+from .steamid import SteamID
+from .session import session
+from .ratelimit import RateLimiter
+from . import utils
+import logging
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying an invite for
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+
+
+def post_invite(steam_id):
+    """Posts a friend invite, as used by ``add_friend`` and `add_friends`.
+
+    Parameters
+    ----------
+    steam_id : ``steamapi.SteamID``
+
+    Returns
+    -------
+    ``requests.Response``
+    """
+    form = {
+        "accept_invite": 0,
+        "sessionID": utils.get_session_id(),
+        "steamid": str(steam_id.as_64)
+    }
+    return session.post(utils.url_community('actions', 'AddFriendAjax'), data=form)
+
+
+def _send_invite(steam_id):
+    """Posts a single friend invite.
+
+    Returns
+    -------
+    tuple of (status: str, error: str or None)
+        Status is one of ``"invited"``, ``"failed"`` or ``"transient"``.
+    """
+    try:
+        response = post_invite(steam_id)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        return ("transient", str(e))
+
+    if response.status_code in TRANSIENT_STATUSES:
+        return ("transient", "HTTP error {}".format(response.status_code))
+
+    if not response.ok:
+        return ("failed", "HTTP error {}".format(response.status_code))
+
+    try:
+        body = response.json()
+    except ValueError:
+        return ("failed", "Malformed response")
+
+    if body.get("success") == 1:
+        return ("invited", None)
+
+    return ("failed", body.get("error_text") or "Steam returned {}".format(body.get("success")))
+
+
+@staticmethod
+def add_friends(steam_ids, workers=4, limiter=None, retries=2, backoff=1.0,
+                progress=None, cancel=None):
+    """Sends friend invites to many users concurrently.
+
+    Parameters
+    ----------
+    steam_ids : iterable of ``steamapi.SteamID``, str or int
+        The users to invite. Entries which are not ``steamapi.SteamID``
+        instances are converted into one.
+    workers : int, optional
+        Number of concurrent requests.
+    limiter : ``steamapi.ratelimit.RateLimiter``, optional
+        Rate budget shared by all requests, retries included.
+        Defaults to 1 request per second.
+    retries : int, optional
+        How often to retry a connection error or an HTTP 429/5xx.
+    backoff : float, optional
+        Seconds to wait before the first retry, doubled for every next one.
+    progress : function, optional
+        Called with each result as soon as it is known.
+    cancel : ``threading.Event``, optional
+        Set it to stop sending; remaining users are reported as cancelled.
+
+    Returns
+    -------
+    list of dict
+        One result per user, in input order::
+
+            {
+                "steam_id": ``steamapi.SteamID`` of the user,
+                "status": "invited", "failed", "invalid" or "cancelled",
+                "error": error message or None,
+                "attempts": number of requests made
+            }
+    """
+    limiter = limiter if limiter is not None else RateLimiter(1)
+
+    def invite(steam_id):
+        result = Munch(steam_id=steam_id, status="cancelled", error=None, attempts=0)
+
+        while result.attempts <= retries:
+            if cancel is not None and cancel.is_set():
+                break
+
+            if result.attempts:
+                time.sleep(backoff * 2 ** (result.attempts - 1))
+
+            limiter.acquire()
+            result.attempts += 1
+            status, result.error = _send_invite(steam_id)
+
+            if status != "transient":
+                result.status = status
+                break
+            result.status = "failed"
+
+        return result
+
+    results = []
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for idx, steam_id in enumerate(steam_ids):
+            try:
+                if not isinstance(steam_id, SteamID):
+                    steam_id = SteamID(steam_id)
+            except Exception as e:
+                results.append(Munch(steam_id=steam_id, status="invalid", error=str(e), attempts=0))
+                if progress:
+                    progress(results[-1])
+                continue
+
+            results.append(None)
+            pending[pool.submit(invite, steam_id)] = idx
+
+        for future in as_completed(pending):
+            result = future.result()
+            results[pending[future]] = result
+            if result.status == "failed":
+                logger.error("Error in adding friend %s: %s", result.steam_id, result.error)
+            if progress:
+                progress(result)
+
+    return results
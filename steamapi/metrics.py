@@ -0,0 +1,306 @@
+from __future__ import unicode_literals
+import re
+import time
+from threading import Lock, Thread
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from .stats import Histogram
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit
+
+_api_path = re.compile(r'^/([^/]+)/([^/]+)/v\d+')
+_profile_path = re.compile(r'^/(?:profiles|id)/[^/]+/?(.*)$')
+
+
+def endpoint_name(url):
+    """Derives the logical endpoint name of a request URL.
+
+    Web API calls are named by their method (``Poll``, ``Logon``...),
+    community pages by their last fixed path segment (``dologin``,
+    ``chatlog``, ``friendstate``, ``edit``...) so that per-user IDs in
+    the path are not part of the name.
+
+    Parameters
+    ----------
+    url : str
+        The request URL.
+
+    Returns
+    -------
+    str
+    """
+    parts = urlsplit(url)
+    path = parts.path
+
+    match = _api_path.match(path)
+    if match and parts.netloc.startswith('api.'):
+        return match.group(2)
+
+    match = _profile_path.match(path)
+    if match:
+        return match.group(1).strip('/') or 'profile'
+
+    if '/avatars/' in path:
+        return 'avatar'
+
+    segments = [s for s in path.split('/') if s]
+    if not segments:
+        return parts.netloc
+
+    if segments[-1].isdigit() and len(segments) > 1:
+        # e.g. /chat/chatlog/<accountid>
+        return segments[-2]
+
+    return segments[-1] if len(segments) > 1 else segments[0]
+
+
+class EndpointMetrics(object):
+    """Network metrics of a single endpoint.
+
+    Attributes
+    ----------
+    latency : ``steamapi.stats.Histogram``
+        Seconds from sending a request to having its body, or its headers
+        for streamed requests.
+    bytes_out : int
+        Request body bytes sent.
+    bytes_in : int
+        Response body bytes received, after content decoding. Streamed
+        bodies are counted as they are read through ``iter_content``.
+    statuses : dict
+        Response count per HTTP status.
+    errors : int
+        Requests which failed without a response.
+    """
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.statuses = {}
+        self.errors = 0
+
+    def as_dict(self):
+        return {
+            "latency": self.latency.as_dict(),
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "statuses": dict(self.statuses),
+            "errors": self.errors
+        }
+
+
+class MetricsRegistry(object):
+    """Collects `EndpointMetrics` by endpoint name.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.endpoints = {}
+
+    def endpoint(self, name):
+        """Gets the metrics of an endpoint, creating them if needed.
+        """
+        with self._lock:
+            metrics = self.endpoints.get(name)
+            if metrics is None:
+                metrics = self.endpoints[name] = EndpointMetrics()
+            return metrics
+
+    def record(self, name, latency, bytes_out, bytes_in=0, status=None):
+        """Records a finished request; a `status` of None records an error.
+        """
+        metrics = self.endpoint(name)
+        metrics.latency.observe(latency)
+
+        with self._lock:
+            metrics.bytes_out += bytes_out
+            metrics.bytes_in += bytes_in
+            if status is None:
+                metrics.errors += 1
+            else:
+                metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def received(self, name, bytes_in):
+        """Records more of a streamed response body being read.
+        """
+        metrics = self.endpoint(name)
+        with self._lock:
+            metrics.bytes_in += bytes_in
+
+    def reset(self):
+        """Discards all metrics.
+        """
+        with self._lock:
+            self.endpoints = {}
+
+    def snapshot(self):
+        """Gets all metrics.
+
+        Returns
+        -------
+        dict
+            `EndpointMetrics.as_dict` per endpoint name.
+        """
+        with self._lock:
+            endpoints = list(self.endpoints.items())
+        return {name: metrics.as_dict() for name, metrics in endpoints}
+
+    def prometheus(self):
+        """Renders all metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+        """
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+
+        lines = []
+
+        def family(name, type_, help_):
+            lines.append('# HELP {} {}'.format(name, help_))
+            lines.append('# TYPE {} {}'.format(name, type_))
+
+        name = 'steamapi_http_request_duration_seconds'
+        family(name, 'histogram', 'Latency of requests to Steam.')
+        for endpoint, metrics in endpoints:
+            hist = metrics.latency
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(
+                    name, endpoint, bound, cumulative))
+            lines.append('{}_bucket{{endpoint="{}",le="+Inf"}} {}'.format(name, endpoint, hist.count))
+            lines.append('{}_sum{{endpoint="{}"}} {}'.format(name, endpoint, hist.sum))
+            lines.append('{}_count{{endpoint="{}"}} {}'.format(name, endpoint, hist.count))
+
+        family('steamapi_http_responses_total', 'counter', 'Responses by HTTP status.')
+        for endpoint, metrics in endpoints:
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append('steamapi_http_responses_total{{endpoint="{}",status="{}"}} {}'.format(
+                    endpoint, status, count))
+
+        counters = [
+            ('steamapi_http_errors_total', 'errors', 'Requests which failed without a response.'),
+            ('steamapi_http_sent_bytes_total', 'bytes_out', 'Request body bytes sent.'),
+            ('steamapi_http_received_bytes_total', 'bytes_in', 'Response body bytes received.')
+        ]
+        for name, attr, help_ in counters:
+            family(name, 'counter', help_)
+            for endpoint, metrics in endpoints:
+                lines.append('{}{{endpoint="{}"}} {}'.format(name, endpoint, getattr(metrics, attr)))
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _body_length(body):
+    if body is None:
+        return 0
+    try:
+        return len(body)
+    except TypeError:
+        return 0
+
+
+class MetricsAdapter(HTTPAdapter):
+    """A transport adapter which records every request in a `MetricsRegistry`.
+
+    Parameters
+    ----------
+    registry : `MetricsRegistry`, optional
+        Defaults to the module's `registry`.
+    """
+
+    def __init__(self, registry=None, **kwargs):
+        self.registry = registry if registry is not None else globals()['registry']
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        name = endpoint_name(request.url)
+        bytes_out = _body_length(request.body)
+        started = time.time()
+
+        try:
+            resp = self._send(request, stream=stream, **kwargs)
+        except RequestException:
+            self.registry.record(name, time.time() - started, bytes_out)
+            raise
+
+        if stream:
+            bytes_in = 0
+            self._count_streamed(name, resp)
+        else:
+            # requests reads the body straight after, read it here to time it
+            bytes_in = len(resp.content)
+
+        self.registry.record(name, time.time() - started, bytes_out, bytes_in, resp.status_code)
+        return resp
+
+    def _count_streamed(self, name, resp):
+        # content, text, json and iter_lines all read through iter_content
+        iter_content = resp.iter_content
+        registry = self.registry
+
+        def counted(*args, **kwargs):
+            for chunk in iter_content(*args, **kwargs):
+                registry.received(name, len(chunk))
+                yield chunk
+        resp.iter_content = counted
+
+    def _send(self, request, **kwargs):
+        """Performs the request; overridden by adapters with another transport.
+        """
+        return HTTPAdapter.send(self, request, **kwargs)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve(port=9464, host='127.0.0.1', registry=None):
+    """Serves metrics in the Prometheus text format from a background thread.
+
+    Parameters
+    ----------
+    port : int, optional
+        The port to listen on; 0 picks a free one.
+    host : str, optional
+        The address to listen on. Defaults to local connections only.
+    registry : `MetricsRegistry`, optional
+        Defaults to the module's `registry`.
+
+    Returns
+    -------
+    ``http.server.HTTPServer``
+        The running server; call ``shutdown()`` to stop it.
+    """
+    source = registry if registry is not None else globals()['registry']
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = source.prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _Server((host, port), Handler)
+    thread = Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
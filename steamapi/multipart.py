@@ -0,0 +1,76 @@
+from __future__ import unicode_literals
+import io
+import os
+import uuid
+
+
+class MultipartEncoder(object):
+    """A ``multipart/form-data`` body which is read lazily.
+
+    Pass it as ``data`` to ``session.post``; requests sends it with a
+    ``Content-Length`` and reads files in small blocks, so file contents
+    are never held in memory as a whole.
+
+    Parameters
+    ----------
+    fields : dict
+        Plain form fields.
+    files : list of tuple
+        ``(field name, file name, binary file object, content type)``
+        tuples. File objects must be seekable.
+
+    Attributes
+    ----------
+    content_type : str
+        The ``Content-Type`` header to send the body with.
+    """
+
+    def __init__(self, fields, files):
+        boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=' + boundary
+        self._parts = []
+
+        for name, value in list(fields.items()):
+            self._parts.append(io.BytesIO((
+                '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'
+            ).format(boundary, name, value).encode('utf-8')))
+
+        for name, filename, fileobj, content_type in files:
+            self._parts.append(io.BytesIO((
+                '--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'
+                'Content-Type: {}\r\n\r\n'
+            ).format(boundary, name, filename, content_type).encode('utf-8')))
+            self._parts.append(fileobj)
+            self._parts.append(io.BytesIO(b'\r\n'))
+
+        self._parts.append(io.BytesIO('--{}--\r\n'.format(boundary).encode('utf-8')))
+        self._length = sum(_remaining(part) for part in self._parts)
+        self._current = 0
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        """Reads up to `size` bytes of the body, everything if negative.
+        """
+        chunks = []
+        while self._current < len(self._parts) and size != 0:
+            chunk = self._parts[self._current].read(size)
+            if not chunk:
+                self._current += 1
+                continue
+
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+
+        return b''.join(chunks)
+
+
+def _remaining(fileobj):
+    """Number of bytes left to read from a seekable file object.
+    """
+    position = fileobj.tell()
+    end = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(position)
+    return end - position
@@ -0,0 +1,193 @@
+from __future__ import division
+from .stats import Histogram
+
+# chat constants taken from chat.js
+POLL_DEFAULT_TIMEOUT = 20
+POLL_SUCCESS_INCREMENT = 5
+POLL_MAX_TIMEOUT = 120
+
+MESSAGE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class PollStats(object):
+    """Records how chat polls behave.
+
+    Attributes
+    ----------
+    rtt : ``steamapi.stats.Histogram``
+        Round-trip time of each poll request, in seconds.
+    messages : ``steamapi.stats.Histogram``
+        Messages received per successful poll.
+    delivery : ``steamapi.stats.Histogram``
+        Seconds from a message's server timestamp until it was emitted.
+    polls : int
+        Polls which completed, including timeouts.
+    timeouts : int
+        Polls which completed without any message.
+    errors : int
+        Polls which failed.
+    relogs : int
+        Reconnects triggered by the poll loop.
+    """
+
+    def __init__(self):
+        self.rtt = Histogram()
+        self.messages = Histogram(MESSAGE_BUCKETS)
+        self.delivery = Histogram()
+        self.reset()
+
+    def reset(self):
+        """Discards all recorded data.
+        """
+        self.rtt.reset()
+        self.messages.reset()
+        self.delivery.reset()
+        self.polls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.relogs = 0
+
+    def as_dict(self):
+        """Summarizes the recorded data.
+
+        Returns
+        -------
+        dict
+        """
+        return {
+            "polls": self.polls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "relogs": self.relogs,
+            "rtt": self.rtt.as_dict(),
+            "messages": self.messages.as_dict(),
+            "delivery": self.delivery.as_dict()
+        }
+
+
+class FixedStepController(object):
+    """Chooses the poll ``sectimeout`` the way Steam's chat.js does.
+
+    The timeout grows by a fixed step after every idle poll and shrinks
+    by one step on the first failure.
+
+    Any object with the same attribute and methods can be assigned to
+    ``Chat.poll_controller`` to change how the timeout is picked.
+
+    Attributes
+    ----------
+    initial : int
+        The timeout to start a chat session with.
+    """
+
+    def __init__(self, initial=POLL_DEFAULT_TIMEOUT, step=POLL_SUCCESS_INCREMENT,
+                 maximum=POLL_MAX_TIMEOUT):
+        self.initial = initial
+        self.step = step
+        self.maximum = maximum
+
+    def on_messages(self, timeout, rtt, count):
+        """Called after a poll which returned messages.
+
+        Parameters
+        ----------
+        timeout : int
+            The timeout the poll was made with.
+        rtt : float
+            Seconds the poll took.
+        count : int
+            Number of messages received.
+
+        Returns
+        -------
+        int
+            The timeout for the next poll.
+        """
+        return timeout
+
+    def on_timeout(self, timeout, rtt, server_timeout=None):
+        """Called after a poll which ended without any messages.
+
+        Parameters
+        ----------
+        timeout : int
+            The timeout the poll was made with.
+        rtt : float
+            Seconds the poll took.
+        server_timeout : int, optional
+            The ``sectimeout`` Steam reported back, if any.
+
+        Returns
+        -------
+        int
+            The timeout for the next poll.
+        """
+        if server_timeout and server_timeout > self.initial:
+            timeout = server_timeout
+
+        return min(timeout + self.step, self.maximum)
+
+    def on_failure(self, timeout, failures):
+        """Called after a poll failed.
+
+        Parameters
+        ----------
+        timeout : int
+            The timeout the poll was made with.
+        failures : int
+            Number of consecutive failures, including this one.
+
+        Returns
+        -------
+        int
+            The timeout for the next poll.
+        """
+        if failures == 1 and timeout > self.initial:
+            timeout -= self.step
+
+        return timeout
+
+
+class AdaptiveController(FixedStepController):
+    """Chooses the poll ``sectimeout`` from the observed message rate.
+
+    Keeps a moving average of the gap between messages and holds each
+    poll open for ``factor`` times that gap. Quiet conversations are held
+    open longer, saving reconnects, while busy ones use short polls.
+
+    Attributes
+    ----------
+    initial : int
+        The timeout to start a chat session with.
+    minimum : int
+        The shortest timeout to use.
+    maximum : int
+        The longest timeout to use.
+    factor : float
+        Multiple of the average message gap to hold a poll open for.
+    smoothing : float
+        Weight of the newest observation in the moving average.
+    """
+
+    def __init__(self, initial=POLL_DEFAULT_TIMEOUT, minimum=10, maximum=POLL_MAX_TIMEOUT,
+                 factor=2.0, smoothing=0.3):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.smoothing = smoothing
+        self._gap = initial / factor
+
+    def _observe(self, gap):
+        self._gap += self.smoothing * (gap - self._gap)
+        return int(max(self.minimum, min(self.maximum, self._gap * self.factor)))
+
+    def on_messages(self, timeout, rtt, count):
+        return self._observe(rtt / max(count, 1))
+
+    def on_timeout(self, timeout, rtt, server_timeout=None):
+        # nothing arrived, so the gap is at least as long as the poll
+        return self._observe(max(rtt, timeout))
+
+    def on_failure(self, timeout, failures):
+        return max(self.minimum, timeout // 2)
@@ -1,23 +1,60 @@
 from __future__ import unicode_literals
-from .session import session
+import hashlib
+import io
+import mimetypes
+import os
+from .session import session, probe
 from . import utils
 from . import enums
-from pyquery import PyQuery as pq
+from . import forms
+from .multipart import MultipartEncoder
 import logging
 logger = logging.getLogger(__name__)
 
+AVATAR_MAX_FILE_SIZE = 1048576
+AVATAR_MAX_DIMENSION = 184
+
 
 @staticmethod
 def setup_profile():
     """Initiates a new Steam Profile
     """
-    resp = session.get(utils.url_community(
+    resp = probe('GET', utils.url_community(
         'profiles', str(utils.get_steam_id())) + 'edit?welcomed=1')
     return resp and resp.ok
 
 
+def _cache_key(edit_url):
+    """Keys cached forms by session too, as their hidden fields belong to it.
+    """
+    return (edit_url, session.cookies.get('sessionid'))
+
+
+def _load_form(edit_url, use_cache, skip_types=()):
+    """Gets the state of an edit form, from the cache if allowed.
+    """
+    form = forms.recall(_cache_key(edit_url)) if use_cache else None
+    if form is None:
+        form = forms.extract_form(session.get(edit_url).text, skip_types=skip_types)
+        forms.remember(_cache_key(edit_url), form)
+
+    return form
+
+
+def _submit_form(edit_url, values, skip_types=()):
+    """Posts an edit form and parses the page Steam responds with.
+    """
+    form = forms.extract_form(session.post(edit_url, data=values).text, skip_types=skip_types)
+    if form.error:
+        forms.forget(_cache_key(edit_url))
+    else:
+        forms.remember(_cache_key(edit_url), form)
+
+    return form
+
+
 @staticmethod
-def edit_profile(new_values=None):
+def edit_profile(new_values=None, use_cache=False):
     """Updates your Steam profile information.
 
     Current values are returned if `new_values` is not supplied.
@@ -43,6 +80,11 @@ def edit_profile(new_values=None):
                 'personaName': 'new display name',
                 'summary': 'coolest guy ever'
             }
+    use_cache : bool, optional
+        When editing, reuse the form state seen by the last call in this
+        session instead of requesting the edit page again. Only safe if
+        nothing else edits the profile meanwhile: nothing is posted if
+        `new_values` matches that state.
 
     Returns
     -------
@@ -56,40 +98,24 @@ def edit_profile(new_values=None):
 
         return {k: v for k, v in list(values.items()) if k in valid}
 
-    def parseForValues(doc):
-        values = {}
-
-        all_inputs = doc('#editForm :input').filter(
-            lambda i, this: this.tag != "button")
-        # visible = all_inputs.filter("[type!='hidden']")
-        without_file = all_inputs.filter("[type!='file']")
-
-        for inp in without_file:
-            values[inp.name] = inp.value
-
-        return values
-
     edit_url = utils.url_community(
         'profiles', str(utils.get_steam_id())) + 'edit'
-    doc = pq(session.get(edit_url).text)
-
-    values = parseForValues(doc)
+    form = _load_form(edit_url, new_values and use_cache, ('file',))
+    values = dict(form.fields)
 
     if not new_values:
         return (None, editables(values))
-    else:
-        values.update(new_values)
-        update_resp = pq(session.post(edit_url, data=values).text)
-        values = parseForValues(update_resp)
-        error = update_resp('#errorText .formRowFields')
-        if error:
-            return (error.text.strip(), editables(values))
 
+    if all(values.get(k) == v for k, v in list(new_values.items())):
         return (None, editables(values))
 
+    values.update(new_values)
+    form = _submit_form(edit_url, values, ('file',))
+    return (form.error, editables(form.fields))
+
 
 @staticmethod
-def edit_privacy_settings(new_values=None):
+def edit_privacy_settings(new_values=None, use_cache=False):
     """Updates your Steam privacy settings.
 
     Current values are returned if `new_values` is not supplied.
@@ -110,6 +136,11 @@ def edit_privacy_settings(new_values=None):
                 'personaName': 'new display name',
                 'summary': 'coolest guy ever'
             }
+    use_cache : bool, optional
+        When editing, reuse the form state seen by the last call in this
+        session instead of requesting the settings page again. Only safe if
+        nothing else edits the profile meanwhile: nothing is posted if
+        `new_values` matches that state.
 
     Returns
     -------
@@ -123,20 +154,16 @@ def edit_privacy_settings(new_values=None):
 
         return {k: v for k, v in list(values.items()) if k in valid}
 
-    def parseForValues(doc):
-        all_inputs = doc('#editForm :input').filter(
-            lambda i, this: this.tag != "button")
+    def parseForValues(form):
+        values = dict(form.fields)
 
-        values = {inp.name: inp.value for inp in all_inputs}
+        for name, value in list(form.checked.items()):
+            if name in ['privacySetting', 'inventoryPrivacySetting']:
+                values[name] = enums.PrivacyState(int(value))
+            if name == 'commentSetting':
+                values[name] = enums.CommentPrivacyState(value)
 
-        for inp in doc('#editForm input:checked'):
-            values[inp.name] = inp.value
-            if inp.name in ['privacySetting', 'inventoryPrivacySetting']:
-                values[inp.name] = enums.PrivacyState(int(inp.value))
-            if inp.name == 'commentSetting':
-                values[inp.name] = enums.CommentPrivacyState(inp.value)
-
-        if values['inventoryGiftPrivacy'] is not None:
+        if values.get('inventoryGiftPrivacy') is not None:
             values['inventoryGiftPrivacy'] = bool(
                 int(values['inventoryGiftPrivacy']))
         else:
@@ -146,50 +173,133 @@ def edit_privacy_settings(new_values=None):
 
     edit_url = utils.url_community('profiles', str(
         utils.get_steam_id())) + 'edit/settings'
-    doc = pq(session.get(edit_url).text)
-    values = parseForValues(doc)
+    form = _load_form(edit_url, new_values and use_cache)
+    values = parseForValues(form)
 
     if not new_values:
         return (None, editables(values))
-    else:
-        values.update(new_values)
-        for k, v in list(editables(values).items()):
-            if k == 'inventoryGiftPrivacy':
-                values[k] = int(v)
-            else:
-                values[k] = v.value
-
-        resp = session.post(edit_url, data=values)
-        update_resp = pq(resp.text)
-        values = parseForValues(update_resp)
-        error = update_resp('#errorText .formRowFields')
-        if error:
-            return (error.text.strip(), editables(values))
 
+    if all(values.get(k) == v for k, v in list(new_values.items())):
         return (None, editables(values))
 
+    values.update(new_values)
+    for k, v in list(editables(values).items()):
+        if k == 'inventoryGiftPrivacy':
+            values[k] = int(v)
+        else:
+            values[k] = v.value
+
+    form = _submit_form(edit_url, values)
+    return (form.error, editables(parseForValues(form)))
+
+
+def fit_avatar(image, max_bytes=AVATAR_MAX_FILE_SIZE, max_dimension=AVATAR_MAX_DIMENSION):
+    """Downsizes and re-encodes an image as JPEG so it is accepted as an avatar.
+
+    Requires Pillow (``pip install Pillow``).
+
+    Parameters
+    ----------
+    image : file
+        File-like object, in binary mode.
+    max_bytes : int, optional
+        The largest file size to produce.
+    max_dimension : int, optional
+        The largest width or height to produce.
+
+    Returns
+    -------
+    ``io.BytesIO``
+        The re-encoded image.
+    """
+    from PIL import Image
+
+    img = Image.open(image)
+    img.thumbnail((max_dimension, max_dimension))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    for quality in (95, 85, 75, 60, 45, 30):
+        out = io.BytesIO()
+        img.save(out, 'JPEG', quality=quality, optimize=True)
+        if out.tell() <= max_bytes:
+            out.seek(0)
+            return out
+
+    raise Exception("Avatar does not fit in {} bytes".format(max_bytes))
+
+
+def _hash_file(fileobj):
+    """Gets the SHA-1 and size of the rest of a seekable file, then rewinds it.
+    """
+    position = fileobj.tell()
+    digest = hashlib.sha1()
+    size = 0
+
+    for chunk in iter(lambda: fileobj.read(65536), b''):
+        digest.update(chunk)
+        size += len(chunk)
+
+    fileobj.seek(position)
+    return digest.hexdigest(), size
+
 
 @staticmethod
-def upload_avatar(image):
+def upload_avatar(image, resize=False, current_hash=None):
     """Sets the current account's avatar on Steam.
 
+    The image is streamed rather than loaded into memory, and nothing is
+    uploaded if it is too large or has the SHA-1 `current_hash`.
+
     Parameters
     ----------
     image : file
         File-like object, in binary mode.
+    resize : bool, optional
+        Downsize and re-encode the image with `fit_avatar` first.
+    current_hash : str, optional
+        The ``sha1`` of an earlier result, to skip uploading the same
+        image again. Steam's avatar hash is not a hash of the uploaded file.
+
+    Returns
+    -------
+    dict or None
+        Steam's response, ``{"success": True, "skipped": True}`` if the upload
+        was skipped, or None on error. Both carry the ``sha1`` of the file
+        sent, after resizing, to pass as `current_hash` next time.
     """
+    if resize:
+        image = fit_avatar(image)
+    elif not (hasattr(image, 'seekable') and image.seekable()):
+        image = io.BytesIO(image.read())
+
+    steam_id = str(utils.get_steam_id())
+    digest, size = _hash_file(image)
+
+    if digest == current_hash:
+        logger.info('Avatar upload: image is already set, skipping')
+        return {"success": True, "skipped": True, "sha1": digest}
+
+    if size > AVATAR_MAX_FILE_SIZE:
+        logger.error('Avatar upload: image is %d bytes, the limit is %d',
+                     size, AVATAR_MAX_FILE_SIZE)
+        return
+
     data = {
-        'MAX_FILE_SIZE': 1048576,
+        'MAX_FILE_SIZE': AVATAR_MAX_FILE_SIZE,
         'type': 'player_avatar_image',
-        'sId': str(utils.get_steam_id()),
+        'sId': steam_id,
         'sessionid': utils.get_session_id(),
         'doSub': 1,
         'json': 1
     }
 
-    files = {'avatar': image}
-    resp = session.post(utils.url_community(
-        'actions', 'FileUploader'), files=files, data=data)
+    filename = os.path.basename(getattr(image, 'name', '') or 'avatar.jpg')
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    body = MultipartEncoder(data, [('avatar', filename, image, content_type)])
+
+    resp = session.post(utils.url_community('actions', 'FileUploader'), data=body,
+                        headers={'Content-Type': body.content_type})
 
     if not resp.ok:
         logger.error('Avatar upload: HTTP error %s', resp.status_code)
@@ -206,4 +316,5 @@ def upload_avatar(image):
     if not body.get('success') and body.get('message'):
         logger.error('Avatar upload: %s', body['message'])
 
+    body["sha1"] = digest
     return body
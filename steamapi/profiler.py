@@ -0,0 +1,318 @@
+from __future__ import unicode_literals, division
+import io
+import marshal
+import os
+import signal
+import sys
+import time
+from collections import Counter
+from threading import Lock, Thread, Event, get_ident
+import logging
+logger = logging.getLogger(__name__)
+
+# innermost matching function decides what a sample is attributed to
+CATEGORIES = {
+    "_timed_call": "handlers",
+    "_update_persona": "persona",
+    "_poll": "poll"
+}
+
+# python frames a thread sits in while waiting rather than using CPU
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("socket.py", "readinto"),
+    ("ssl.py", "read"),
+    ("ssl.py", "recv_into"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker")
+}
+
+
+def _frame_key(code):
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def _is_idle(code):
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+class SamplingProfiler(object):
+    """A statistical profiler which samples the stacks of all threads.
+
+    Sampling runs on its own daemon thread and only reads other threads'
+    frames, so profiled threads are never paused or locked. Each sample is
+    attributed to the innermost of `CATEGORIES` on its stack (poll loop,
+    persona updates or event handlers), or ``other``.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Seconds between samples.
+    include_idle : bool, optional
+        Also count threads waiting on a socket, lock or queue; by default
+        only stacks which are doing work are kept.
+
+    Attributes
+    ----------
+    stacks : ``collections.Counter``
+        Sample count per stack, a tuple of the category followed by
+        ``(filename, first line, function)`` from the outermost frame.
+    samples : int
+        Sampling rounds taken.
+    duration : float
+        Seconds spent sampling, excluding the current run.
+    """
+
+    def __init__(self, interval=0.01, include_idle=False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self._lock = Lock()
+        self._thread = None
+        self._stop = Event()
+        self.reset()
+
+    def reset(self):
+        """Discards all samples.
+        """
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+            self.duration = 0
+            self._started = time.time() if self.running else None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Starts sampling; does nothing if already running.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._started = time.time()
+            self._thread = Thread(target=self._run, name='steamapi-profiler')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stops sampling, keeping the samples taken so far.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._stop.set()
+            self.duration += time.time() - self._started
+            self._started = None
+
+        if thread.ident != get_ident():
+            thread.join()
+
+    def toggle(self):
+        """Starts sampling if stopped, stops it if running.
+
+        Returns
+        -------
+        bool
+            Whether the profiler is now running.
+        """
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+        return self.running
+
+    def _run(self):
+        own = get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(own)
+
+    def sample(self, skip=None):
+        """Takes one sample of every thread.
+
+        Parameters
+        ----------
+        skip : int, optional
+            Ident of a thread to leave out.
+        """
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            if not self.include_idle and _is_idle(frame.f_code):
+                continue
+
+            stack = []
+            category = None
+            while frame is not None:
+                code = frame.f_code
+                if category is None:
+                    category = CATEGORIES.get(code.co_name)
+                stack.append(_frame_key(code))
+                frame = frame.f_back
+
+            stack.append(category or "other")
+            stack.reverse()
+            stacks.append(tuple(stack))
+
+        with self._lock:
+            self.samples += 1
+            self.stacks.update(stacks)
+
+    def categories(self):
+        """Counts samples per category.
+
+        Returns
+        -------
+        dict
+            e.g. ``{"poll": 120, "handlers": 40, "other": 3}``.
+        """
+        counts = Counter()
+        with self._lock:
+            for stack, count in self.stacks.items():
+                counts[stack[0]] += count
+        return dict(counts)
+
+    def collapsed(self):
+        """Renders the samples in the collapsed stack format.
+
+        Each line is a category followed by its frames from the outermost,
+        separated by ``;``, and the sample count, as read by flamegraph.pl,
+        speedscope and similar tools.
+
+        Returns
+        -------
+        str
+        """
+        with self._lock:
+            stacks = sorted(self.stacks.items())
+
+        lines = []
+        for stack, count in stacks:
+            frames = [stack[0]] + ['{} ({}:{})'.format(name, filename, line)
+                                   for filename, line, name in stack[1:]]
+            lines.append('{} {}'.format(';'.join(frames), count))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def pstats(self):
+        """Converts the samples to the ``pstats`` data layout.
+
+        Times are estimated as samples multiplied by `interval`; call
+        counts are sample counts.
+
+        Returns
+        -------
+        dict
+            Loadable with ``pstats.Stats`` once written by `write_pstats`.
+        """
+        own = Counter()
+        cumulative = Counter()
+        callers = {}
+
+        with self._lock:
+            stacks = list(self.stacks.items())
+
+        for stack, count in stacks:
+            frames = stack[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+
+            seen = set()
+            for idx, key in enumerate(frames):
+                if key in seen:
+                    # recursion, only count once towards cumulative time
+                    continue
+                seen.add(key)
+                cumulative[key] += count
+                if idx:
+                    edges = callers.setdefault(key, Counter())
+                    edges[frames[idx - 1]] += count
+
+        stats = {}
+        for key in cumulative:
+            edges = {caller: (n, n, 0.0, n * self.interval)
+                     for caller, n in callers.get(key, {}).items()}
+            stats[key] = (cumulative[key], cumulative[key], own[key] * self.interval,
+                          cumulative[key] * self.interval, edges)
+        return stats
+
+    def write_collapsed(self, filename):
+        """Writes `collapsed` to a file.
+        """
+        with io.open(filename, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+
+    def write_pstats(self, filename):
+        """Writes `pstats` to a file, for ``pstats.Stats(filename)`` or snakeviz.
+        """
+        with open(filename, 'wb') as f:
+            marshal.dump(self.pstats(), f)
+
+    def write(self, filename):
+        """Writes the samples, as pstats if `filename` ends in ``.pstats`` or
+        ``.prof``, otherwise as collapsed stacks.
+        """
+        if filename.endswith(('.pstats', '.prof')):
+            self.write_pstats(filename)
+        else:
+            self.write_collapsed(filename)
+
+
+profiler = SamplingProfiler()
+
+
+def install_signal_handler(signum=getattr(signal, 'SIGUSR2', None), directory='.', fmt='collapsed'):
+    """Toggles the library's `profiler` whenever the process receives a signal.
+
+    The first signal starts sampling; the next one stops it, writes the
+    samples to ``<directory>/steamapi-<pid>-<time>.<fmt>`` and discards them.
+    Must be called from the main thread.
+
+    Parameters
+    ----------
+    signum : int, optional
+        Defaults to ``SIGUSR2``.
+    directory : str, optional
+    fmt : str, optional
+        ``collapsed`` or ``pstats``.
+    """
+    if signum is None:
+        raise ValueError("No signal given and SIGUSR2 is not available")
+
+    def dump():
+        filename = os.path.join(directory, 'steamapi-{}-{}.{}'.format(
+            os.getpid(), int(time.time()), fmt))
+        try:
+            profiler.write(filename)
+            logger.info("Wrote %d profiler samples to %s", profiler.samples, filename)
+        except (IOError, OSError) as e:
+            logger.error("Cannot write profile: %s", e)
+        profiler.reset()
+
+    requested = Event()
+
+    def toggle():
+        while True:
+            requested.wait()
+            requested.clear()
+            if profiler.running:
+                profiler.stop()
+                dump()
+            else:
+                logger.info("Profiler started")
+                profiler.start()
+
+    def handler(signum, frame):
+        # the interrupted main thread may hold the profiler's lock, so the
+        # handler only wakes a thread which toggles the profiler instead
+        requested.set()
+
+    thread = Thread(target=toggle, name='steamapi-profiler-signal')
+    thread.daemon = True
+    thread.start()
+    signal.signal(signum, handler)
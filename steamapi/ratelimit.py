@@ -0,0 +1,55 @@
+from __future__ import division
+import time
+from threading import Lock
+
+
+class RateLimiter(object):
+    """A thread-safe token bucket.
+
+    Parameters
+    ----------
+    rate : float
+        Requests allowed per second on average.
+    burst : int, optional
+        Requests allowed back-to-back before the rate applies.
+        Defaults to one second's worth of `rate`.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.time()
+        self._lock = Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens +
+                           (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Takes a token if one is available.
+
+        Returns
+        -------
+        bool
+            True if a token was taken.
+        """
+        with self._lock:
+            self._refill(time.time())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it.
+        """
+        while True:
+            with self._lock:
+                self._refill(time.time())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,215 @@
+import weakref
+from functools import partial
+from threading import Lock
+from .steamid import SteamID
+from .emitter import handler_name
+from . import utils
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _key_of(steam_id):
+    """Normalizes anything identifying a user to its account ID.
+    """
+    if hasattr(steam_id, 'accountid'):
+        return int(steam_id.accountid)
+
+    if isinstance(steam_id, int) and steam_id <= 0xFFFFFFFF:
+        return steam_id
+
+    return SteamID(steam_id).accountid
+
+
+class Subscription(object):
+    """A handler registered with an `EventRouter`.
+
+    Call `cancel` to remove it early; weak subscriptions are also removed
+    once their handler is garbage collected.
+    """
+    __slots__ = ('event', 'key', 'predicate', '_handler', '_router', '__weakref__')
+
+    def __init__(self, router, event, handler, key=None, predicate=None, weak=False):
+        self.event = event
+        self.key = key
+        self.predicate = predicate
+        self._router = router
+
+        if not weak:
+            self._handler = lambda: handler
+        elif hasattr(handler, '__self__') and hasattr(handler, '__func__'):
+            self._handler = weakref.WeakMethod(handler, self._collected)
+        else:
+            self._handler = weakref.ref(handler, self._collected)
+
+    def _collected(self, ref):
+        # garbage collection can run anywhere, even while this thread holds
+        # the router's lock, so removal is queued rather than done here
+        self._router._dead.append(self)
+        self._router._purge()
+
+    @property
+    def handler(self):
+        """The handler, or None if it has been garbage collected.
+        """
+        return self._handler()
+
+    def cancel(self):
+        """Removes the subscription from its router.
+        """
+        self._router._remove(self)
+
+    def __call__(self, *args):
+        handler = self._handler()
+        if handler is None:
+            return
+
+        if self.predicate is None or self.predicate(*args):
+            handler(*args)
+
+
+class EventRouter(object):
+    """Routes emitted events to handlers by event type and user.
+
+    Instead of every handler being run and filtering on the sender itself,
+    handlers subscribe to an event for a specific user, and dispatch is
+    a dictionary lookup on the account ID of the event's first argument
+    (a ``steamapi.SteamID`` or ``steamapi.events.ChatEvent``).
+
+    Handlers subscribed with ``weak=True`` are held through weak
+    references, so a subscription made by a per-conversation object goes
+    away with it.
+
+    Parameters
+    ----------
+    emitter : ``pyee.EventEmitter``, optional
+        The emitter to listen on. Defaults to ``steamapi.utils.emitter``.
+    """
+
+    def __init__(self, emitter=None):
+        self.emitter = emitter if emitter is not None else utils.emitter
+        self._lock = Lock()
+        self._keyed = {}
+        self._unkeyed = {}
+        self._listeners = {}
+        # weak subscriptions whose handler was collected, removed on the
+        # next occasion the lock is free
+        self._dead = []
+
+    def subscribe(self, event, handler, steam_id=None, predicate=None, weak=False):
+        """Subscribes a handler to an event.
+
+        Parameters
+        ----------
+        event : str
+            The event to subscribe to, e.g. ``"chat_message"``.
+        handler : function
+            Called with the event's arguments.
+        steam_id : ``steamapi.SteamID``, str or int, optional
+            Only call `handler` for events about this user.
+        predicate : function, optional
+            Only call `handler` if ``predicate(*args)`` is true.
+        weak : bool, optional
+            Hold `handler` through a weak reference, removing the
+            subscription once it is garbage collected. Lambdas and closures
+            nothing else keeps alive would never be called, so this is off
+            by default.
+
+        Returns
+        -------
+        `Subscription`
+        """
+        key = _key_of(steam_id) if steam_id is not None else None
+        sub = Subscription(self, event, handler, key, predicate, weak)
+
+        with self._lock:
+            if key is None:
+                self._unkeyed[event] = self._unkeyed.get(event, ()) + (sub,)
+            else:
+                keyed = self._keyed.setdefault(event, {})
+                keyed[key] = keyed.get(key, ()) + (sub,)
+
+            if event not in self._listeners:
+                listener = partial(self._dispatch, event)
+                # time each subscription under its own handler's name
+                listener.times_handlers = hasattr(self.emitter, 'call')
+                self._listeners[event] = listener
+                self.emitter.on(event, listener)
+
+        self._purge()
+        return sub
+
+    def on(self, event, steam_id=None, predicate=None):
+        """Decorator form of `subscribe`.
+
+        The decorated function is held strongly, like ``emitter.on``.
+        """
+        def decorator(handler):
+            self.subscribe(event, handler, steam_id, predicate)
+            return handler
+        return decorator
+
+    def _remove(self, sub):
+        with self._lock:
+            self._discard(sub)
+        self._purge()
+
+    def _purge(self):
+        if not self._lock.acquire(False):
+            # whoever holds the lock purges when done
+            return
+        try:
+            while self._dead:
+                self._discard(self._dead.pop())
+        finally:
+            self._lock.release()
+
+    def _discard(self, sub):
+        if sub.key is None:
+            subs = self._unkeyed.get(sub.event, ())
+            self._unkeyed[sub.event] = tuple(s for s in subs if s is not sub)
+        else:
+            keyed = self._keyed.get(sub.event, {})
+            subs = tuple(s for s in keyed.get(sub.key, ()) if s is not sub)
+            if subs:
+                keyed[sub.key] = subs
+            else:
+                keyed.pop(sub.key, None)
+
+        if not self._unkeyed.get(sub.event) and not self._keyed.get(sub.event):
+            listener = self._listeners.pop(sub.event, None)
+            if listener is not None:
+                self.emitter.remove_listener(sub.event, listener)
+
+    def count(self, event=None):
+        """Counts live subscriptions.
+
+        Parameters
+        ----------
+        event : str, optional
+            Only count subscriptions to this event.
+
+        Returns
+        -------
+        int
+        """
+        events = [event] if event else set(self._keyed) | set(self._unkeyed)
+        return sum(len(self._unkeyed.get(e, ())) +
+                   sum(len(subs) for subs in self._keyed.get(e, {}).values())
+                   for e in events)
+
+    def _dispatch(self, event, *args):
+        subs = self._unkeyed.get(event, ())
+
+        keyed = self._keyed.get(event)
+        if keyed and args and hasattr(args[0], 'accountid'):
+            subs = keyed.get(int(args[0].accountid), ()) + subs
+
+        call = getattr(self.emitter, 'call', None)
+        for sub in subs:
+            if call is None:
+                sub(*args)
+            else:
+                call(event, sub, *args, name=handler_name(sub.handler))
+
+
+router = EventRouter()
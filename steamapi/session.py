@@ -1,10 +1,13 @@
 from .utils import emit
+from .metrics import MetricsAdapter
 import requests
 import re
 import logging
 logger = logging.getLogger(__name__)
 
 session = requests.Session()
+session.mount("https://", MetricsAdapter())
+session.mount("http://", MetricsAdapter())
 
 _mobileHeaders = {
     "X-Requested-With": "com.valvesoftware.android.steam.community",
@@ -54,3 +57,53 @@ def check_community_error(response):
 
 
 session.hooks = dict(response=validate_response)
+
+
+def validate_status(r, *args, **kwargs):
+    """Checks for Steam's definitions of errors without reading the body.
+    """
+    check_http_error(r)
+
+
+def probe(method, url, prefix=0, drain_limit=16384, **kwargs):
+    """Sends a request which is only needed for its side effect or status.
+
+    The response is streamed and at most `prefix` bytes of the body are
+    read. Afterwards a short remaining body is drained so the connection
+    can be reused, while a long one is abandoned by closing the connection.
+
+    Parameters
+    ----------
+    method : str
+        The HTTP method.
+    url : str
+        The URL to request.
+    prefix : int, optional
+        Number of body bytes to read, available as ``response.prefix``.
+    drain_limit : int, optional
+        Largest ``Content-Length`` which is still drained instead of closed.
+    **kwargs
+        Passed on to ``session.request``.
+
+    Returns
+    -------
+    ``requests.Response``
+        The response; its status and headers are available, its body is not.
+    """
+    kwargs["stream"] = True
+    kwargs.setdefault("hooks", dict(response=[validate_status]))
+
+    resp = session.request(method, url, **kwargs)
+    resp.prefix = resp.raw.read(prefix, decode_content=True) if prefix else b''
+
+    try:
+        length = int(resp.headers.get("content-length", -1))
+    except ValueError:
+        length = -1
+
+    if 0 <= length - len(resp.prefix) <= drain_limit:
+        for _ in resp.iter_content(8192):
+            pass
+    resp.close()
+
+    return resp
@@ -0,0 +1,103 @@
+from __future__ import division
+from bisect import bisect_left
+from threading import Lock
+
+# upper bounds in seconds, roughly doubling from 1ms to 2 minutes
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120)
+
+
+class Histogram(object):
+    """A fixed-bucket histogram, cheap enough to update on every event.
+
+    Attributes
+    ----------
+    buckets : tuple of float
+        Inclusive upper bounds of each bucket, in ascending order.
+        Observations above the last bound land in an overflow bucket.
+    counts : list of int
+        Observation count per bucket, plus the overflow bucket.
+    count : int
+        Total number of observations.
+    sum : float
+        Sum of all observed values.
+    max : float
+        Largest observed value.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """Discards all observations.
+        """
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0
+            self.max = 0
+
+    def observe(self, value):
+        """Records a single value.
+
+        Parameters
+        ----------
+        value : int or float
+            The value to record.
+        """
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0
+
+    def percentile(self, q):
+        """Estimates a percentile from the bucket counts.
+
+        Parameters
+        ----------
+        q : float
+            The percentile to estimate, between 0 and 100.
+
+        Returns
+        -------
+        float
+            The upper bound of the bucket containing the percentile,
+            or the largest observed value if it lies in the overflow bucket.
+        """
+        if not self.count:
+            return 0
+
+        rank = self.count * q / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def as_dict(self):
+        """Summarizes the histogram.
+
+        Returns
+        -------
+        dict
+            Count, sum, mean, max and the 50th, 90th and 99th percentiles.
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99)
+        }
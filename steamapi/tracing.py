@@ -0,0 +1,244 @@
+from __future__ import unicode_literals
+import functools
+import io
+import json
+import random
+import time
+from threading import Lock, local, current_thread
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _new_id():
+    return '%016x' % random.getrandbits(64)
+
+
+class Span(object):
+    """A timed operation, nested under the span active when it started.
+
+    Use as a context manager; the span is exported when it exits.
+
+    Attributes
+    ----------
+    name : str
+    trace_id : str
+        Shared by every span under the same root span.
+    span_id : str
+    parent_id : str or None
+    start : float
+        Unix time the span started.
+    end : float
+        Unix time the span ended.
+    attributes : dict
+    sampled : bool
+        Whether the span will be exported.
+    """
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'end',
+                 'attributes', 'sampled', 'thread', '_tracer')
+
+    def __init__(self, tracer, name, parent=None, attributes=None, sampled=True):
+        self.name = name
+        self.sampled = sampled
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else _new_id()
+        self.span_id = _new_id() if sampled else None
+        self.attributes = attributes or {}
+        self.thread = current_thread().name
+        self.start = self.end = None
+        self._tracer = tracer
+
+    @property
+    def duration(self):
+        """Seconds the span took, or None while it is running.
+        """
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def set(self, key, value):
+        """Sets an attribute on the span.
+        """
+        self.attributes[key] = value
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread,
+            "attributes": self.attributes
+        }
+
+    def __enter__(self):
+        self._tracer._push(self)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.time()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self._tracer._pop(self)
+        return False
+
+
+class _NoopSpan(object):
+    """Stands in for spans which are not recorded.
+    """
+    __slots__ = ()
+    sampled = False
+
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer(object):
+    """Creates spans and hands finished ones to an exporter.
+
+    Tracing is off while `exporter` is None, in which case `span` only
+    costs an attribute lookup. Whether a trace is recorded is decided
+    once, at its root span; spans nested under an unsampled root are
+    skipped without any bookkeeping.
+
+    Parameters
+    ----------
+    exporter : object, optional
+        Anything with an ``export(span)`` method, such as `JSONLExporter`.
+    sample_rate : float, optional
+        Fraction of root spans to record, from 0 to 1.
+    rates : dict, optional
+        Sample rates of specific root span names, overriding `sample_rate`.
+    """
+
+    def __init__(self, exporter=None, sample_rate=1.0, rates=None):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.rates = rates or {}
+        self._local = local()
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            return stack
+
+    def _push(self, span):
+        self._stack().append(span)
+
+    def _pop(self, span):
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+
+        if span.sampled:
+            exporter = self.exporter
+            if exporter is None:
+                return
+            try:
+                exporter.export(span)
+            except Exception:
+                logger.exception("Failed to export span %s", span.name)
+
+    @property
+    def current(self):
+        """The innermost active span of this thread, or None.
+        """
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def span(self, name, **attributes):
+        """Starts a span, nested under the current span of this thread.
+
+        Parameters
+        ----------
+        name : str
+        **attributes
+            Initial span attributes.
+
+        Returns
+        -------
+        `Span`
+            To be used as a context manager.
+        """
+        if self.exporter is None:
+            return _NOOP
+
+        parent = self.current
+        if parent is None:
+            rate = self.rates.get(name, self.sample_rate)
+            if rate < 1 and random.random() >= rate:
+                # still pushed, so that nested spans know to skip themselves
+                return Span(self, name, sampled=False)
+        elif not parent.sampled:
+            return _NOOP
+
+        return Span(self, name, parent, attributes)
+
+
+class JSONLExporter(object):
+    """Appends finished spans to a file, one JSON object per line.
+
+    Parameters
+    ----------
+    filename : str
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = Lock()
+        self._file = io.open(filename, 'a', encoding='utf-8')
+
+    def export(self, span):
+        line = json.dumps(span.as_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+tracer = Tracer()
+
+
+def configure(exporter=None, sample_rate=1.0, rates=None):
+    """Configures the library's tracer.
+
+    Parameters
+    ----------
+    exporter : object, optional
+        Anything with an ``export(span)`` method; None turns tracing off.
+    sample_rate : float, optional
+        Fraction of root spans to record, from 0 to 1.
+    rates : dict, optional
+        Sample rates of specific root span names, such as ``chat.poll``.
+    """
+    tracer.exporter = exporter
+    tracer.sample_rate = sample_rate
+    tracer.rates = rates or {}
+
+
+def traced(name):
+    """Decorates a function to run inside a span of the library's tracer.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,10 +1,12 @@
-﻿from Crypto import Random
-import codecs
-from pyee import EventEmitter
+﻿import codecs
+import os
+import tempfile
 from threading import Timer
 from .steamid import SteamID
+from .tracing import tracer
+from .emitter import TimedEmitter
 
-emitter = EventEmitter()
+emitter = TimedEmitter()
 
 
 def emit(event, *data):
@@ -20,7 +22,8 @@ def emit(event, *data):
     *data
         The data to be passed to the callback
     """
-    emitter.emit(event, *data)
+    with tracer.span('emit', event=event):
+        emitter.emit(event, *data)
 
 
 def timer(delay, func, args=()):
@@ -89,7 +92,7 @@ def generate_session_id():
     str
         A random 12 byte hex string.
     """
-    return codecs.getencoder('hex')(Random.get_random_bytes(12))[0].decode('utf-8')
+    return codecs.getencoder('hex')(os.urandom(12))[0].decode('utf-8')
 
 
 def get_session_id():
@@ -113,7 +116,9 @@ def get_steam_id():
         The currently logged in steam ID.
     """
     from .session import session
-    return SteamID(session.cookies.get('steamLogin', '%7C%7C').split("%7C%7C")[0])
+    # the separator is escaped in cookies Steam sets, but not in `oauth_login`'s
+    cookie = session.cookies.get('steamLogin', '%7C%7C').replace('%7C', '|')
+    return SteamID(cookie.split("||")[0])
 
 
 def url_avatar(hashed, quality='full'):
@@ -175,3 +180,29 @@ def dict_diff(a, b):
             diff[key] = a[key]
 
     return diff
+
+
+def atomic_write(filename, data):
+    """Writes bytes to a file so readers never observe a partial write.
+
+    The data is written to a temporary file in the same directory, which
+    then replaces ``filename`` in a single rename.
+
+    Parameters
+    ----------
+    filename : str
+        The file to write to.
+    data : bytes
+        The content to write.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filename)
+    except:
+        os.unlink(tmp)
+        raise
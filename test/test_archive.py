@@ -0,0 +1,61 @@
+from steamapi.archive import ChatArchive
+
+
+def test_history_and_latest(tmpdir):
+    archive = ChatArchive(str(tmpdir.join("chat.db")))
+    assert archive.latest_timestamp(1) is None
+
+    archive.add_many([(1, 1, 100, "hello"), (1, 2, 105, "hi there"), (3, 3, 90, "other")])
+    archive.add(1, 1, 100, "hello")
+
+    assert archive.latest_timestamp(1) == 105
+    assert [m.message for m in archive.history(1)] == ["hello", "hi there"]
+    assert [m.message for m in archive.history(1, since=100)] == ["hi there"]
+    assert next(archive.history(3)).steam_id.accountid == 3
+
+
+def test_search(tmpdir):
+    archive = ChatArchive(str(tmpdir.join("chat.db")))
+    archive.add_many([(1, 1, 100, "the quick brown fox"), (2, 2, 101, "lazy dog"),
+                      (2, 2, 102, "quick reply")])
+
+    assert [m.timestamp for m in archive.search("quick")] == [100, 102]
+    assert [m.timestamp for m in archive.search("quick", account=2)] == [102]
+
+
+def test_history_keeps_older_entries_and_replaces_live_copies(tmpdir):
+    archive = ChatArchive(str(tmpdir.join("chat.db")))
+    # polled live, with a timestamp a little off from the chat log's
+    archive.add(1, 1, 203, "newest")
+
+    archive.add_many([(1, 1, 100, "missed"), (1, 1, 100, "missed"), (1, 1, 200, "newest")])
+    archive.add_many([(1, 1, 100, "missed"), (1, 1, 100, "missed"), (1, 1, 200, "newest")])
+
+    assert [(m.timestamp, m.message) for m in archive.history(1)] == \
+        [(100, "missed"), (100, "missed"), (200, "newest")]
+    assert [m.timestamp for m in archive.search("newest")] == [200]
+
+
+def test_repeated_messages_in_one_second_are_kept(tmpdir):
+    archive = ChatArchive(str(tmpdir.join("chat.db")))
+    # polled with the same timestamp the chat log has
+    archive.add(1, 1, 100, "ok")
+
+    archive.add_many([(1, 1, 100, "ok"), (1, 1, 100, "ok")])
+    assert [m.message for m in archive.history(1)] == ["ok", "ok"]
+
+
+def test_migrates_old_schema(tmpdir):
+    import sqlite3
+    filename = str(tmpdir.join("chat.db"))
+    db = sqlite3.connect(filename)
+    db.execute('CREATE TABLE messages (id INTEGER PRIMARY KEY, account INTEGER NOT NULL, '
+               'sender INTEGER NOT NULL, timestamp INTEGER NOT NULL, message TEXT NOT NULL, '
+               'UNIQUE (account, timestamp, sender, message))')
+    db.execute("INSERT INTO messages (account, sender, timestamp, message) VALUES (1, 1, 5, 'x')")
+    db.commit()
+    db.close()
+
+    archive = ChatArchive(filename)
+    archive.add_many([(1, 1, 5, "x"), (1, 1, 5, "x")])
+    assert [m.message for m in archive.history(1)] == ["x", "x"]
@@ -0,0 +1,76 @@
+from steamapi.avatars import AvatarCache
+import os
+
+
+class Response(object):
+    ok = True
+
+    def __init__(self, content):
+        self.content = content
+
+
+def test_fetch_dedupes_and_evicts(tmpdir, monkeypatch):
+    cache = AvatarCache(str(tmpdir), max_bytes=300)
+    requested = []
+
+    def get(url, timeout=None):
+        requested.append(url)
+        return Response(b"x" * 100)
+
+    monkeypatch.setattr(cache._session, "get", get)
+
+    paths = cache.fetch("ab" * 20)
+    assert len(requested) == 3
+    assert cache.get("ab" * 20, "full") == paths["full"]
+    assert len(requested) == 3
+
+    cache.prefetch_on_change(None, {"avatar_hash": "cd" * 20}, {"avatar_hash": "ab" * 20},
+                             qualities=("full",))
+    cache.get("cd" * 20)
+    assert len(requested) == 4
+    # only three 100 byte files fit in the cache
+    assert sum(os.path.isfile(path) for path in paths.values()) == 2
+    assert cache.path("cd" * 20).startswith(os.path.join(str(tmpdir), "cd", "cd"))
+
+
+def test_cache_hits_do_not_wait_for_downloads(tmpdir, monkeypatch):
+    from threading import Event
+    cache = AvatarCache(str(tmpdir), workers=1)
+    monkeypatch.setattr(cache._session, "get", lambda url, timeout=None: Response(b"x"))
+    cached = cache.get("ab" * 20)
+
+    release = Event()
+    monkeypatch.setattr(cache._session, "get",
+                        lambda url, timeout=None: release.wait() and Response(b"y"))
+    slow = cache.fetch_async("cd" * 20)
+
+    hit = cache.fetch_async("ab" * 20)
+    assert hit.done() and hit.result() == cached
+    release.set()
+    slow.result()
+
+
+def test_upload_avatar_returns_hash_to_skip_with(monkeypatch):
+    import io
+    from steamapi import profile, utils
+    posted = []
+
+    class Uploaded(object):
+        ok = True
+
+        def json(self):
+            return {"success": True}
+
+    def post(url, data=None, headers=None):
+        posted.append(data.read())
+        return Uploaded()
+
+    monkeypatch.setattr(profile.session, "post", post)
+    monkeypatch.setattr(utils, "get_steam_id", lambda: 76561198006409530)
+    monkeypatch.setattr(utils, "get_session_id", lambda: "abc")
+
+    uploaded = profile.upload_avatar(io.BytesIO(b"image"))
+    assert uploaded["success"] and len(uploaded["sha1"]) == 40
+    skipped = profile.upload_avatar(io.BytesIO(b"image"), current_hash=uploaded["sha1"])
+    assert skipped == {"success": True, "skipped": True, "sha1": uploaded["sha1"]}
+    assert len(posted) == 1
@@ -0,0 +1,61 @@
+from steamapi.backfill import Backfill, JSONLSink
+from steamapi.ratelimit import RateLimiter
+import json
+import os
+
+
+class FakeChat(object):
+    friends = {str(76561197960265728 + i): None for i in range(1, 6)}
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.fetched = []
+
+    def _fetch_chat_log(self, accountid):
+        self.fetched.append(accountid)
+        if accountid in self.failing:
+            return None
+        return [{"m_unAccountID": accountid, "m_tsTimestamp": 1, "m_strMessage": "hi"}]
+
+
+def test_backfill_resumes_from_checkpoint(tmpdir):
+    output = str(tmpdir.join("history.jsonl"))
+    checkpoint = str(tmpdir.join("checkpoint.json"))
+
+    chat = FakeChat(failing=(2, 4))
+    sink = JSONLSink(output)
+    stats = Backfill(chat, sink, checkpoint, limiter=RateLimiter(1000)).run()
+    assert (stats["done"], stats["failed"], stats["entries"]) == (3, 2, 3)
+
+    chat = FakeChat()
+    stats = Backfill(chat, sink, checkpoint, limiter=RateLimiter(1000)).run()
+    sink.close()
+    assert sorted(chat.fetched) == [2, 4]
+    assert stats["done"] == 2
+
+    with open(output) as f:
+        accounts = sorted(json.loads(line)["account"] for line in f)
+    assert accounts == [1, 2, 3, 4, 5]
+
+
+def test_rate_limiter_burst():
+    limiter = RateLimiter(1, burst=2)
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+
+def test_journal_is_read_back_and_compacted(tmpdir):
+    checkpoint = str(tmpdir.join("checkpoint.json"))
+    with open(checkpoint + ".journal", "w") as f:
+        f.write("1\n3\n")
+
+    chat = FakeChat()
+    sink = JSONLSink(str(tmpdir.join("history.jsonl")))
+    Backfill(chat, sink, checkpoint, limiter=RateLimiter(1000)).run()
+    sink.close()
+
+    assert 1 not in chat.fetched and 3 not in chat.fetched
+    assert not os.path.exists(checkpoint + ".journal")
+    with open(checkpoint) as f:
+        assert set(json.load(f)["done"]) >= {1, 3}
@@ -0,0 +1,23 @@
+from benchmarks.harness import compare, measure
+from benchmarks import fixtures
+from steamapi.chat import Chat
+
+
+def test_compare_uses_per_benchmark_thresholds():
+    baseline = {"results": {"a": 1.0, "b": 1.0, "c": 1.0},
+                "thresholds": {"b": 1.0}}
+    regressions = compare({"a": 1.3, "b": 1.3, "d": 5.0}, baseline, threshold=0.25)
+    assert [r["name"] for r in regressions] == ["a"]
+
+
+def test_measure_runs_setup_every_round():
+    rounds = []
+    measure(lambda value: rounds.append(value), setup=lambda: len(rounds), repeat=3)
+    assert rounds == [0, 1, 2, 3]
+
+
+def test_chat_page_fixture_parses():
+    chat = Chat()
+    chat._parse_initial_details(fixtures.chat_page(100))
+    assert len(chat.friends) == 100
+    assert sum(len(group["members"]) for group in chat.friend_groups) == 100
@@ -0,0 +1,63 @@
+from steamapi.cassette import use_cassette, CassetteMiss
+from threading import Thread
+import json
+import pytest
+import requests
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"success": True, "response": {"token": "abc", "steamid": "7656"},
+                           "oauth": json.dumps({"oauth_token": "def"})}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Set-Cookie", "steamLoginSecure=76561198006409530%7C%7Csecret; path=/")
+        self.send_header("Set-Cookie", "Steam_Language=english; path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_record_then_replay(tmpdir):
+    filename = str(tmpdir.join("login.jsonl"))
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = Thread(target=server.handle_request)
+    thread.start()
+    url = "http://127.0.0.1:{}/login/dologin/".format(server.server_port)
+
+    session = requests.Session()
+    with use_cassette(filename, "record", session=session):
+        live = session.post(url, data={"username": "me", "password": "hunter2"})
+    thread.join()
+    server.server_close()
+
+    assert live.json()["response"]["token"] == "abc"
+    assert session.cookies["steamLoginSecure"] == "76561198006409530%7C%7Csecret"
+
+    with open(filename) as f:
+        recorded = f.read()
+    for secret in ("hunter2", "abc", "def", "secret"):
+        assert secret not in recorded
+
+    session = requests.Session()
+    with use_cassette(filename, session=session) as cassette:
+        replayed = session.post(url, data={"username": "me", "password": "other"})
+        assert cassette.remaining == 0
+        with pytest.raises(CassetteMiss):
+            session.post(url, data={"username": "me"})
+
+    assert replayed.status_code == 200
+    assert replayed.json()["response"] == {"token": "REDACTED", "steamid": "7656"}
+    assert json.loads(replayed.json()["oauth"]) == {"oauth_token": "REDACTED"}
+    assert session.cookies["steamLoginSecure"] == "76561198006409530%7C%7CREDACTED"
+    assert session.cookies["Steam_Language"] == "english"
+    # the previous adapter is back in place
+    assert not hasattr(session.adapters["http://"], "mode")
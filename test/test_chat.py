@@ -0,0 +1,268 @@
+from steamapi.chat import Chat
+from steamapi import SteamID
+from steamapi import utils
+import json
+
+
+def chat_page(friends, groups=None):
+    own = {"m_ulSteamID": "76561198006409530", "m_strName": "me",
+           "m_strAvatarHash": "0" * 40}
+    return "new CWebChat( WebAPI, {}, {}, {} );".format(
+        json.dumps(own), json.dumps(friends), json.dumps(groups or []))
+
+
+def friend(account_id, name, state=1):
+    return {"m_ulSteamID": str(76561197960265728 + account_id), "m_strName": name,
+            "m_ePersonaState": state, "m_strAvatarHash": "0" * 40}
+
+
+def test_parse_initial_details():
+    chat = Chat()
+    chat._parse_initial_details(chat_page(
+        [friend(1, "a"), friend(2, "b")], [{"members": [1, 2]}]))
+    assert len(chat.friends) == 2
+    assert chat.account_persona.name == "me"
+    assert chat.friend_groups[0]["members"][1].accountid == 2
+
+
+def test_reconcile_details_emits_only_changes(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(utils, "emit", lambda event, *data: emitted.append((event, data)))
+
+    chat = Chat()
+    chat._parse_initial_details(chat_page([friend(1, "a"), friend(2, "b")]))
+    kept = chat.friends["76561197960265729"]
+    emitted[:] = []
+
+    chat._reconcile_details(chat_page([friend(1, "a"), friend(3, "c", 0)]))
+
+    assert chat.friends["76561197960265729"] is kept
+    assert "76561197960265730" not in chat.friends
+    assert [data[1].name for event, data in emitted] == ["c"]
+    assert all(event == "chat_persona_state" for event, data in emitted)
+
+
+def test_state_snapshot_roundtrip(tmpdir):
+    chat = Chat()
+    chat._parse_initial_details(chat_page(
+        [friend(1, "a"), friend(2, "b", 3)], [{"members": [1, 2]}]))
+    chat.access_token = "f" * 32
+    chat._umqid = "12345"
+    chat._message = 42
+    chat._sec_timeout = 35
+
+    filename = str(tmpdir.join("chat.state"))
+    assert chat.save_state(filename)
+
+    restored = Chat()
+    assert restored.load_state(filename)
+    assert restored.access_token == chat.access_token
+    assert restored._umqid == "12345"
+    assert restored._message == 42
+    assert restored._sec_timeout == 35
+    assert restored.account_persona.name == "me"
+    assert restored.friends["76561197960265730"].state == 3
+    assert restored.friend_groups[0]["members"][0].accountid == 1
+
+
+def test_resume_without_friends(monkeypatch):
+    from steamapi import enums
+    monkeypatch.setattr(utils, "timer", lambda delay, func, args=(): None)
+    monkeypatch.setattr(utils, "emit", lambda event, *data: None)
+
+    chat = Chat()
+    chat.access_token = "f" * 32
+    chat._umqid = "12345"
+    monkeypatch.setattr(chat, "login", lambda ui_mode: "login")
+    monkeypatch.setattr(chat, "_logon", lambda resume=False: (None, {"umqid": "12345", "message": 1}))
+
+    assert chat.resume() is enums.ChatState.LoggedOn
+
+
+def test_state_snapshot_rejects_garbage(tmpdir):
+    filename = tmpdir.join("chat.state")
+    filename.write_binary(b"not a snapshot")
+    assert not Chat().load_state(str(filename))
+
+    from steamapi.chat import SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _SNAPSHOT_HEADER
+    import zlib
+    filename.write_binary(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION) +
+                          zlib.compress(json.dumps({"access_token": "f" * 32}).encode('utf-8')))
+    chat = Chat()
+    assert not chat.load_state(str(filename))
+    assert not chat.access_token
+
+
+def test_dispatch_batch_events(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(utils, "emit", lambda event, *data: emitted.append((event, data)))
+
+    chat = Chat()
+    chat.batch_events = True
+    chat._dispatch([
+        {"type": "saytext", "accountid_from": 46143802, "text": "hi", "utc_timestamp": 1},
+        {"type": "typing", "accountid_from": 46143802},
+        {"type": "unknown", "accountid_from": 46143802}
+    ])
+
+    assert [event for event, data in emitted] == ["chat_batch"]
+    batch = emitted[0][1][0]
+    assert [type(event).__name__ for event in batch] == ["ChatMessage", "Typing"]
+    assert batch[0].text == "hi" and not batch[0].own
+    assert batch[0].steam_id.as_64 == 76561198006409530
+
+
+def test_dispatch_per_message_events(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(utils, "emit", lambda event, *data: emitted.append((event, data)))
+
+    Chat()._dispatch([
+        {"type": "my_saytext", "accountid_from": 46143802, "text": "yo"},
+        {"type": "typing", "accountid_from": 46143802}
+    ])
+
+    assert [event for event, data in emitted] == ["chat_message", "chat_typing"]
+    assert emitted[0][1][1:] == ("yo", True)
+
+
+def test_dispatch_coalesces_typing_and_persona(monkeypatch):
+    from steamapi.coalesce import Coalescer
+    emitted = []
+    refreshed = []
+    monkeypatch.setattr(utils, "emit", lambda event, *data: emitted.append(event))
+
+    chat = Chat()
+    chat.coalescer = Coalescer()
+    monkeypatch.setattr(chat, "_update_persona",
+                        lambda steam_id, emit=True: refreshed.append(steam_id.accountid) or ({}, {}))
+    chat._dispatch([
+        {"type": "typing", "accountid_from": 1},
+        {"type": "personastate", "accountid_from": 2},
+        {"type": "typing", "accountid_from": 1},
+        {"type": "personastate", "accountid_from": 2},
+        {"type": "typing", "accountid_from": 3}
+    ])
+
+    assert emitted == ["chat_typing", "chat_typing"]
+    assert refreshed == [2]
+    assert chat.coalescer.stats() == {"dropped": {"typing": 1}, "merged": {"personastate": 1}}
+
+
+def test_relationship_tracking(monkeypatch):
+    from munch import Munch
+    from steamapi import SteamID, enums
+    emitted = []
+    monkeypatch.setattr(utils, "emit", lambda event, *data: emitted.append(event))
+
+    chat = Chat()
+    friend_list = [Munch(steam_id=SteamID.from_account_id(1), relationship="friend", friend_since=0)]
+    monkeypatch.setattr(chat, "get_friends_list", lambda: friend_list)
+
+    assert chat.reconcile_relationships()
+    assert emitted == []
+    assert chat.relationships == {"76561197960265729": enums.FriendRelationship.Friend}
+
+    chat._dispatch([
+        {"type": "personarelationship", "accountid_from": 2, "persona_state": 2},
+        {"type": "personarelationship", "accountid_from": 2, "persona_state": 3},
+        {"type": "personarelationship", "accountid_from": 1, "persona_state": 0}
+    ])
+    assert emitted == ["chat_relationship", "chat_relationship", "friend_added",
+                       "chat_relationship", "friend_removed"]
+    assert list(chat.relationships) == ["76561197960265730"]
+
+    del emitted[:]
+    chat.reconcile_relationships()
+    assert emitted == ["chat_relationship", "friend_removed",
+                       "chat_relationship", "friend_added"]
+
+
+def test_dispatch_archives_messages(tmpdir, monkeypatch):
+    from steamapi.archive import ChatArchive
+    monkeypatch.setattr(utils, "emit", lambda event, *data: None)
+
+    chat = Chat()
+    chat._parse_initial_details(chat_page([]))
+    chat.archive = ChatArchive(str(tmpdir.join("chat.db")))
+    chat._dispatch([
+        {"type": "saytext", "accountid_from": 1, "text": "hi", "utc_timestamp": 10},
+        {"type": "my_saytext", "accountid_from": 1, "text": "hey", "utc_timestamp": 11}
+    ])
+
+    history = chat.get_chat_history(SteamID.from_account_id(1), cached=True)
+    assert [(m.steam_id.accountid, m.message) for m in history] == [(1, "hi"), (46143802, "hey")]
+
+
+def test_dispatch_drops_redelivered_messages(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(utils, "emit", lambda event, *data: emitted.append(data[1]))
+
+    chat = Chat()
+    batch = [{"type": "saytext", "accountid_from": 1, "text": "hi", "utc_timestamp": 10}]
+    chat._dispatch(batch)
+    chat._dispatch(batch + [{"type": "saytext", "accountid_from": 1, "text": "hi",
+                             "utc_timestamp": 11}])
+
+    assert emitted == ["hi", "hi"]
+    assert chat.deduplicator.duplicates == 1
+
+
+def test_broadcast(monkeypatch):
+    from steamapi import chat as chat_module, enums
+    from steamapi.ratelimit import RateLimiter
+    posted = []
+
+    class Response(object):
+        ok = True
+
+        def __init__(self, error):
+            self.error = error
+
+        def json(self):
+            return {"error": self.error}
+
+    def post(url, data=None, headers=None):
+        posted.append(data)
+        return Response("OK" if data.endswith("76561197960265729") else "Not Friends")
+
+    monkeypatch.setattr(chat_module.session, "post", post)
+
+    chat = Chat()
+    chat._parse_initial_details(chat_page(
+        [friend(1, "a"), friend(2, "b"), friend(3, "c", 0)], [{"name": "pals", "members": [1, 2]}]))
+    chat.state = enums.ChatState.LoggedOn
+
+    assert sorted(s.accountid for s in chat.online_friends()) == [1, 2]
+    results = chat.broadcast(chat.group_members("pals"), "hi all", limiter=RateLimiter(1000))
+
+    assert [(r.steam_id.accountid, r.sent, r.error) for r in results] == [
+        (1, True, None), (2, False, "Not Friends")]
+    assert all("text=hi+all" in data for data in posted)
+
+    results = chat.broadcast(["not a steam id", "76561197960265729"], "hi", limiter=RateLimiter(1000))
+    assert results[0].steam_id == "not a steam id" and not results[0].sent and results[0].error
+    assert results[1].sent
+
+
+def test_periodic_reconcile_survives_errors(monkeypatch):
+    from steamapi import enums
+    scheduled = []
+    monkeypatch.setattr(utils, "timer", lambda delay, func, args=(): scheduled.append(args))
+
+    chat = Chat()
+    chat.state = enums.ChatState.LoggedOn
+
+    def fail():
+        raise ValueError("not JSON")
+    monkeypatch.setattr(chat, "reconcile_relationships", fail)
+
+    chat._schedule_reconcile(1.0)
+    chat._periodic_reconcile(*scheduled[0])
+    assert len(scheduled) == 2
+
+
+def test_steam_id_from_oauth_cookie(monkeypatch):
+    from steamapi.session import session
+    monkeypatch.setattr(session, "cookies", __import__("requests").cookies.RequestsCookieJar())
+    session.cookies.set("steamLogin", "76561198006409530||token")
+    assert utils.get_steam_id().accountid == 46143802
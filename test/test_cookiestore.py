@@ -0,0 +1,42 @@
+from steamapi.cookiestore import FileCookieStore, SQLiteCookieStore, dump_jar, load_jar
+import requests
+import pytest
+
+
+def make_jar():
+    jar = requests.cookies.RequestsCookieJar()
+    jar.set("sessionid", "abc", domain="steamcommunity.com", path="/")
+    jar.set("steamLogin", "76561198006409530||token", domain="steamcommunity.com",
+            path="/", secure=True)
+    return jar
+
+
+def test_jar_roundtrip():
+    jar = load_jar(dump_jar(make_jar()))
+    assert jar.get("sessionid") == "abc"
+    assert jar.get("steamLogin") == "76561198006409530||token"
+    assert [c.secure for c in jar if c.name == "steamLogin"] == [True]
+
+
+@pytest.mark.parametrize("kind", ["file", "sqlite"])
+def test_store_per_account(tmpdir, kind):
+    if kind == "file":
+        store = FileCookieStore(str(tmpdir.join("cookies")))
+    else:
+        store = SQLiteCookieStore(str(tmpdir.join("cookies.db")))
+
+    assert store.load("alice") is None
+
+    store.save("alice", make_jar())
+    store.save("bob", requests.cookies.RequestsCookieJar())
+    assert sorted(store.accounts()) == ["alice", "bob"]
+    assert store.load("alice").get("sessionid") == "abc"
+    assert len(store.load("bob")) == 0
+
+    store.delete("alice")
+    assert store.load("alice") is None
+
+    store.save("a@b", make_jar())
+    store.save("a_b", requests.cookies.RequestsCookieJar())
+    assert "a@b" in store.accounts() and "a_b" in store.accounts()
+    assert store.load("a@b").get("sessionid") == "abc"
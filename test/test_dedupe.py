@@ -0,0 +1,22 @@
+from steamapi.dedupe import Deduplicator
+
+
+def message(text, timestamp=1):
+    return {"type": "saytext", "accountid_from": 1, "utc_timestamp": timestamp, "text": text}
+
+
+def test_detects_duplicates():
+    dedupe = Deduplicator()
+    assert not dedupe.check(message("hi"))
+    assert dedupe.check(message("hi"))
+    assert not dedupe.check(message("hi", timestamp=2))
+    assert dedupe.duplicates == 1
+
+
+def test_window_is_bounded():
+    dedupe = Deduplicator(size=2)
+    for text in ["a", "b", "c"]:
+        dedupe.check(message(text))
+
+    assert len(dedupe._seen) == 2
+    assert not dedupe.check(message("a"))
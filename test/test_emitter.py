@@ -0,0 +1,79 @@
+from steamapi.emitter import TimedEmitter
+import logging
+import time
+
+
+def test_handler_stats():
+    emitter = TimedEmitter()
+
+    def fast(text):
+        pass
+
+    emitter.on("chat_message", fast)
+    emitter.on("chat_message", lambda text: None)
+    for _ in range(3):
+        emitter.emit("chat_message", "hi")
+
+    stats = emitter.handler_stats()["chat_message"]
+    name = [name for name in stats if name.endswith("test_handler_stats.<locals>.fast")][0]
+    assert stats[name]["count"] == 3
+    assert len(stats) == 2
+    assert all(s["slow"] == 0 for s in stats.values())
+
+    emitter.reset_handler_stats()
+    assert emitter.handler_stats() == {}
+
+
+def test_slow_handler_warning_is_rate_limited(caplog):
+    emitter = TimedEmitter(slow_threshold=0.05, warn_interval=60)
+    emitter.on("chat_message", lambda: time.sleep(0.2))
+
+    with caplog.at_level(logging.WARNING, logger="steamapi.emitter"):
+        emitter.emit("chat_message")
+        emitter.emit("chat_message")
+
+    warnings = [r.getMessage() for r in caplog.records]
+    assert len(warnings) == 1
+    assert "'chat_message'" in warnings[0]
+    # the watchdog samples the stack while the handler is still running
+    assert "time.sleep" in warnings[0]
+
+    stats = emitter.handler_stats()["chat_message"]
+    assert list(stats.values())[0]["slow"] == 2
+
+
+def test_remove_listener_takes_the_handler_as_given():
+    emitter = TimedEmitter()
+    calls = []
+
+    def handler(text):
+        calls.append(text)
+
+    emitter.on("chat_message", handler)
+    assert emitter.listeners("chat_message") == [handler]
+    emitter.once("chat_message", lambda text: calls.append("once"))
+    emitter.emit("chat_message", "hi")
+    emitter.emit("chat_message", "again")
+    assert calls == ["hi", "once", "again"]
+
+    emitter.remove_listener("chat_message", handler)
+    assert emitter.listeners("chat_message") == []
+    emitter.emit("chat_message", "gone")
+    assert calls == ["hi", "once", "again"]
+
+
+def test_routed_handlers_are_timed_under_their_own_name():
+    from steamapi.routing import EventRouter
+    from steamapi.steamid import SteamID
+    emitter = TimedEmitter()
+    router = EventRouter(emitter)
+
+    def on_message(steam_id, text):
+        pass
+
+    router.subscribe("chat_message", on_message)
+    emitter.emit("chat_message", SteamID(76561197960287930), "hi")
+
+    names = list(emitter.handler_stats()["chat_message"])
+    assert len(names) == 1
+    assert names[0].endswith("test_routed_handlers_are_timed_under_their_own_name.<locals>.on_message")
@@ -0,0 +1,59 @@
+from benchmarks.fakesteam import FakeSteam, Config, install
+from steamapi import utils
+import re
+import requests
+
+
+def test_chat_flow_against_fake_steam():
+    fake = FakeSteam(Config(friends=3, rate=0, max_poll_wait=0.1)).start()
+    try:
+        session = requests.Session()
+        install(fake.url, session)
+
+        page = session.get("https://steamcommunity.com/chat").text
+        token = re.search(r'"([0-9a-f]{32})" \);', page).group(1)
+        account = fake.tokens[token]
+        assert len(account.friends) == 3
+
+        logon = session.post(utils.url_api("ISteamWebUserPresenceOAuth", "Logon"),
+                             data={"access_token": token}).json()
+        assert logon["error"] == "OK"
+
+        poll_url = utils.url_api("ISteamWebUserPresenceOAuth", "Poll")
+        form = {"access_token": token, "umqid": logon["umqid"], "pollid": 1,
+                "message": logon["message"], "sectimeout": 20}
+        assert session.post(poll_url, data=form).json()["error"] == "Timeout"
+
+        account.push({"type": "saytext", "accountid_from": 1, "text": "hi"})
+        body = session.post(poll_url, data=dict(form, pollid=2)).json()
+        assert body["pollid"] == 2
+        assert [m["text"] for m in body["messages"]] == ["hi"]
+
+        # acknowledged messages are not delivered again
+        form.update(pollid=3, message=body["messagelast"])
+        assert session.post(poll_url, data=form).json()["error"] == "Timeout"
+        assert fake.stats()["requests"]["Poll"] == 3
+    finally:
+        fake.stop()
+
+
+def test_idle_chats_keep_polling(monkeypatch):
+    from collections import OrderedDict
+    from benchmarks.load import LoadDriver
+    from steamapi.session import session
+    monkeypatch.setattr(session, "adapters", OrderedDict(session.adapters))
+    monkeypatch.setattr(session, "cookies", requests.cookies.RequestsCookieJar())
+
+    fake = FakeSteam(Config(friends=2, rate=0, max_poll_wait=0.1)).start()
+    driver = LoadDriver(1, fake.url)
+    try:
+        driver.setup()
+        report = driver.run(1.5)
+    finally:
+        utils.emitter.remove_listener("chat_message", driver.on_message)
+        fake.stop()
+
+    # every poll times out, and each timeout must lead to the next poll
+    assert report["logged_on"] == 1
+    assert report["polls"]["completed"] >= 3
+    assert report["polls"]["errors"] == 0
@@ -0,0 +1,54 @@
+from steamapi.forms import extract_form
+from steamapi import forms
+
+PAGE = """
+<html><body>
+<form id="searchForm"><input name="q" value="ignored"></form>
+<div id="errorText"><div class="formRowTitle">Error</div>
+  <div class="formRowFields">Profile name
+    is too short.<br></div></div>
+<form id="editForm" method="post">
+  <input type="hidden" name="sessionID" value="abc">
+  <input type="text" name="personaName" value="me">
+  <input type="file" name="avatar">
+  <textarea name="summary">hello &amp; welcome</textarea>
+  <select name="country"><option value="">-</option><option value="NZ" selected>NZ</option></select>
+  <select name="state"><option disabled>x</option><option>Auckland</option></select>
+  <input type="radio" name="privacySetting" value="1">
+  <input type="radio" name="privacySetting" value="3" checked>
+  <input type="radio" name="privacySetting" value="2">
+  <input type="checkbox" name="inventoryGiftPrivacy" value="1">
+  <button name="save">Save</button>
+</form>
+</body></html>
+"""
+
+
+def test_extract_form():
+    form = extract_form(PAGE, skip_types=("file",))
+    assert form.fields == {
+        "sessionID": "abc",
+        "personaName": "me",
+        "summary": "hello & welcome",
+        "country": "NZ",
+        "state": "Auckland",
+        "privacySetting": "3",
+        "inventoryGiftPrivacy": None
+    }
+    assert form.checked == {"privacySetting": "3"}
+    assert form.error == "Profile name is too short."
+
+
+def test_extract_form_without_error():
+    form = extract_form('<form id="editForm"><input name="a"></form>')
+    assert form.fields == {"a": None}
+    assert form.error is None
+
+
+def test_cache_is_cleared():
+    forms.remember(("https://example.com/edit", "session"), extract_form(PAGE))
+    assert forms.recall(("https://example.com/edit", "session")).fields["personaName"] == "me"
+    assert forms.recall(("https://example.com/edit", "other session")) is None
+
+    forms.clear()
+    assert forms.recall(("https://example.com/edit", "session")) is None
@@ -0,0 +1,34 @@
+from steamapi import friends, steamapi
+from steamapi.ratelimit import RateLimiter
+from threading import Event
+
+
+def test_add_friends_outcomes(monkeypatch):
+    calls = {}
+
+    def send_invite(steam_id):
+        calls[steam_id.accountid] = calls.get(steam_id.accountid, 0) + 1
+        if steam_id.accountid == 2 and calls[2] == 1:
+            return ("transient", "HTTP error 503")
+        if steam_id.accountid == 3:
+            return ("failed", "Steam returned 2")
+        return ("invited", None)
+
+    monkeypatch.setattr(friends, "_send_invite", send_invite)
+    streamed = []
+    results = steamapi.add_friends(
+        ["76561197960265729", 76561197960265730, "[U:1:3]", "bogus"],
+        limiter=RateLimiter(1000), backoff=0, progress=streamed.append)
+
+    assert [r.status for r in results] == ["invited", "invited", "failed", "invalid"]
+    assert [r.attempts for r in results] == [1, 2, 1, 0]
+    assert len(streamed) == 4
+
+
+def test_add_friends_cancelled(monkeypatch):
+    monkeypatch.setattr(friends, "_send_invite", lambda steam_id: ("invited", None))
+    cancel = Event()
+    cancel.set()
+
+    results = steamapi.add_friends(["[U:1:1]"], cancel=cancel)
+    assert results[0].status == "cancelled"
@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+HEAVY = ("requests", "Crypto", "pyee", "munch", "pyquery", "lxml")
+
+
+def loaded_after(statement):
+    code = "import sys; {}; print(' '.join(sys.modules))".format(statement)
+    modules = subprocess.check_output([sys.executable, "-c", code]).decode().split()
+    return sorted(set(m.split(".")[0] for m in modules) & set(HEAVY))
+
+
+def test_steamid_has_no_third_party_imports():
+    assert loaded_after("import steamapi.steamid") == []
+    assert loaded_after("from steamapi import SteamID, enums") == []
+
+
+def test_client_defers_crypto_and_pyquery():
+    assert "Crypto" not in loaded_after("import steamapi; steamapi.steamapi()")
+    assert "pyquery" not in loaded_after("import steamapi; steamapi.steamapi()")
+
+
+def test_missing_dependency_is_not_an_attribute_error():
+    code = ("import sys; sys.modules['munch'] = None; import steamapi\n"
+            "try:\n    steamapi.chat\nexcept ImportError as e:\n    print(e.name)\n"
+            "try:\n    steamapi.nonexistent\nexcept AttributeError:\n    print('missing')")
+    output = subprocess.check_output([sys.executable, "-c", code]).decode().split()
+    assert output == ["munch", "missing"]
+
+
+def test_session_is_the_shared_requests_session():
+    code = ("import steamapi, steamapi.chat, requests\n"
+            "from steamapi.session import session\n"
+            "print(steamapi.session is session and isinstance(session, requests.Session))")
+    assert subprocess.check_output([sys.executable, "-c", code]).decode().split() == ["True"]
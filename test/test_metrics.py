@@ -0,0 +1,50 @@
+from steamapi.metrics import MetricsRegistry, endpoint_name
+from steamapi import utils
+
+
+def test_endpoint_names():
+    assert endpoint_name(utils.url_api("ISteamWebUserPresenceOAuth", "Poll")) == "Poll"
+    assert endpoint_name(utils.url_community("login", "dologin")) == "dologin"
+    assert endpoint_name(utils.url_community("chat", "chatlog") + "46143802") == "chatlog"
+    assert endpoint_name(utils.url_community("profiles", "76561198006409530") + "edit") == "edit"
+    assert endpoint_name(utils.url_avatar("ab" * 20)) == "avatar"
+
+
+def test_registry_prometheus():
+    registry = MetricsRegistry()
+    registry.record("Poll", 0.2, 100, 50, 200)
+    registry.record("Poll", 30, 100)
+
+    poll = registry.snapshot()["Poll"]
+    assert poll["statuses"] == {200: 1}
+    assert poll["errors"] == 1
+    assert poll["bytes_out"] == 200
+
+    text = registry.prometheus()
+    assert 'steamapi_http_request_duration_seconds_bucket{endpoint="Poll",le="0.25"} 1' in text
+    assert 'steamapi_http_request_duration_seconds_count{endpoint="Poll"} 2' in text
+    assert 'steamapi_http_responses_total{endpoint="Poll",status="200"} 1' in text
+    assert 'steamapi_http_errors_total{endpoint="Poll"} 1' in text
+
+
+def test_streamed_bodies_are_counted_as_read():
+    import io
+    import requests
+    from urllib3 import HTTPResponse
+    from steamapi.metrics import MetricsAdapter
+
+    class Adapter(MetricsAdapter):
+        def _send(self, request, **kwargs):
+            # chunked, so there is no Content-Length to go by
+            raw = HTTPResponse(body=io.BytesIO(b"x" * 5000), headers={"Transfer-Encoding": "chunked"},
+                               status=200, preload_content=False)
+            return self.build_response(request, raw)
+
+    registry = MetricsRegistry()
+    session = requests.Session()
+    session.mount("https://", Adapter(registry))
+
+    resp = session.get(utils.url_api("ISteamWebUserPresenceOAuth", "Poll"), stream=True)
+    assert registry.snapshot()["Poll"]["bytes_in"] == 0
+    assert len(resp.content) == 5000
+    assert registry.snapshot()["Poll"]["bytes_in"] == 5000
@@ -0,0 +1,23 @@
+from steamapi.multipart import MultipartEncoder
+import io
+
+
+def test_body_streams_in_blocks():
+    image = io.BytesIO(b"\xff\xd8" + b"\x00" * 20000)
+    body = MultipartEncoder({"json": 1}, [("avatar", "a.jpg", image, "image/jpeg")])
+    boundary = body.content_type.split("boundary=")[1]
+
+    chunks = []
+    while True:
+        chunk = body.read(4096)
+        if not chunk:
+            break
+        assert len(chunk) <= 4096
+        chunks.append(chunk)
+
+    data = b"".join(chunks)
+    assert len(data) == len(body)
+    assert data.startswith(b"--" + boundary.encode())
+    assert b'name="json"\r\n\r\n1\r\n' in data
+    assert b'filename="a.jpg"\r\nContent-Type: image/jpeg\r\n\r\n\xff\xd8' in data
+    assert data.endswith(b"\r\n--" + boundary.encode() + b"--\r\n")
@@ -0,0 +1,39 @@
+from steamapi.polling import FixedStepController, AdaptiveController
+from steamapi.stats import Histogram
+
+
+def test_histogram_percentiles():
+    hist = Histogram((1, 2, 5, 10))
+    for value in [0.5] * 50 + [3] * 40 + [20] * 10:
+        hist.observe(value)
+
+    assert hist.count == 100
+    assert hist.percentile(50) == 1
+    assert hist.percentile(90) == 5
+    assert hist.percentile(99) == 20
+    assert hist.max == 20
+
+
+def test_fixed_step_controller_matches_chat_js():
+    controller = FixedStepController()
+    assert controller.initial == 20
+    assert controller.on_timeout(20, 20.0) == 25
+    assert controller.on_timeout(20, 20.0, server_timeout=60) == 65
+    assert controller.on_timeout(120, 120.0) == 120
+    assert controller.on_messages(30, 1.0, 3) == 30
+    assert controller.on_failure(30, 1) == 25
+    assert controller.on_failure(30, 2) == 30
+
+
+def test_adaptive_controller_tracks_message_rate():
+    controller = AdaptiveController(minimum=5, maximum=120)
+    timeout = controller.initial
+    for _ in range(20):
+        timeout = controller.on_messages(timeout, 1.0, 2)
+    assert timeout == 5
+
+    for _ in range(20):
+        timeout = controller.on_timeout(timeout, float(timeout))
+    assert timeout == 120
+
+    assert controller.on_failure(timeout, 1) == 60
@@ -0,0 +1,85 @@
+from steamapi.profiler import SamplingProfiler
+from threading import Thread, Event
+import pstats
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _poll(stop):
+    busy(stop)
+
+
+def test_samples_are_attributed_to_categories(tmpdir):
+    stop = Event()
+    worker = Thread(target=_poll, args=(stop,))
+    worker.start()
+
+    profiler = SamplingProfiler()
+    for _ in range(20):
+        profiler.sample()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples == 20
+    assert profiler.categories()["poll"] == 20
+
+    collapsed = profiler.collapsed()
+    assert any(line.startswith("poll;") and ";busy (" in line for line in collapsed.splitlines())
+
+    filename = str(tmpdir.join("out.pstats"))
+    profiler.write(filename)
+    stats = pstats.Stats(filename)
+    busy_key = [key for key in stats.stats if key[2] == "busy"][0]
+    assert stats.stats[busy_key][3] > 0
+
+
+def test_start_stop():
+    profiler = SamplingProfiler(interval=0.001)
+    assert profiler.toggle()
+    stop = Event()
+    worker = Thread(target=busy, args=(stop,))
+    worker.start()
+    while not profiler.samples:
+        pass
+    assert not profiler.toggle()
+    stop.set()
+    worker.join()
+
+    # only other threads are sampled
+    assert all("_run" not in line for line in profiler.collapsed().splitlines())
+    assert profiler.duration > 0
+
+
+def test_signal_while_lock_is_held(tmpdir):
+    import os
+    import signal
+    import time
+    from steamapi.profiler import profiler, install_signal_handler
+
+    previous = signal.getsignal(signal.SIGUSR2)
+    install_signal_handler(signal.SIGUSR2, directory=str(tmpdir))
+    try:
+        with profiler._lock:
+            # would deadlock if the handler took the lock itself
+            os.kill(os.getpid(), signal.SIGUSR2)
+            time.sleep(0.05)
+
+        for _ in range(100):
+            if profiler.running:
+                break
+            time.sleep(0.01)
+        assert profiler.running
+
+        os.kill(os.getpid(), signal.SIGUSR2)
+        for _ in range(100):
+            if tmpdir.listdir():
+                break
+            time.sleep(0.01)
+        assert not profiler.running
+        assert len(tmpdir.listdir()) == 1
+    finally:
+        signal.signal(signal.SIGUSR2, previous)
+        profiler.stop()
@@ -0,0 +1,68 @@
+from steamapi.routing import EventRouter
+from steamapi import SteamID
+from pyee import EventEmitter
+import gc
+
+
+class Conversation(object):
+    def __init__(self):
+        self.received = []
+
+    def on_message(self, sender, text, own):
+        self.received.append(text)
+
+
+def test_routes_by_steam_id():
+    emitter = EventEmitter()
+    router = EventRouter(emitter)
+    alice, bob = Conversation(), Conversation()
+    router.subscribe("chat_message", alice.on_message, steam_id="76561198006409530")
+    router.subscribe("chat_message", bob.on_message, steam_id=SteamID.from_account_id(1))
+
+    emitter.emit("chat_message", SteamID.from_account_id(46143802), "hi alice", False)
+    emitter.emit("chat_message", SteamID.from_account_id(1), "hi bob", False)
+
+    assert alice.received == ["hi alice"]
+    assert bob.received == ["hi bob"]
+
+
+def test_predicate_and_cancel():
+    emitter = EventEmitter()
+    router = EventRouter(emitter)
+    seen = []
+    sub = router.subscribe("chat_message", lambda s, text, own: seen.append(text),
+                           predicate=lambda s, text, own: own)
+
+    emitter.emit("chat_message", SteamID.from_account_id(1), "theirs", False)
+    emitter.emit("chat_message", SteamID.from_account_id(1), "mine", True)
+    sub.cancel()
+    emitter.emit("chat_message", SteamID.from_account_id(1), "late", True)
+
+    assert seen == ["mine"]
+    assert router.count() == 0
+    assert emitter.listeners("chat_message") == []
+
+
+def test_weak_subscriptions_are_released():
+    router = EventRouter(EventEmitter())
+    conversation = Conversation()
+    router.subscribe("chat_message", conversation.on_message, steam_id=1, weak=True)
+    assert router.count("chat_message") == 1
+
+    del conversation
+    gc.collect()
+    assert router.count("chat_message") == 0
+
+
+def test_collected_while_locked_is_removed_later():
+    router = EventRouter(EventEmitter())
+    conversation = Conversation()
+    router.subscribe("chat_message", conversation.on_message, steam_id=1, weak=True)
+
+    with router._lock:
+        del conversation
+        gc.collect()
+        assert router.count("chat_message") == 1
+
+    router.subscribe("chat_message", lambda s, text, own: None)
+    assert router.count("chat_message") == 1
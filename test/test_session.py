@@ -0,0 +1,32 @@
+from steamapi.session import probe
+from threading import Thread
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"<h1>Sorry!</h1>" + b"x" * 100000
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_probe_reads_only_prefix():
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = Thread(target=server.handle_request)
+    thread.start()
+
+    resp = probe("GET", "http://127.0.0.1:{}/".format(server.server_port), prefix=8)
+    thread.join()
+    server.server_close()
+
+    assert resp.ok
+    assert resp.prefix == b"<h1>Sorr"
+    assert resp.headers["content-length"] == "100015"
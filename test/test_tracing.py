@@ -0,0 +1,67 @@
+from steamapi.tracing import Tracer, JSONLExporter
+from steamapi import tracing
+from steamapi.chat import Chat
+import json
+
+
+class Collector(object):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+def test_spans_nest_within_a_thread():
+    collector = Collector()
+    tracer = Tracer(collector)
+
+    with tracer.span("poll") as root:
+        with tracer.span("message", type="saytext"):
+            pass
+
+    message, poll = collector.spans
+    assert poll is root and poll.parent_id is None
+    assert message.parent_id == poll.span_id
+    assert message.trace_id == poll.trace_id
+    assert message.attributes == {"type": "saytext"}
+    assert poll.duration >= message.duration
+
+
+def test_sampling_is_decided_at_the_root():
+    collector = Collector()
+    tracer = Tracer(collector, sample_rate=0, rates={"login": 1})
+
+    with tracer.span("poll"):
+        with tracer.span("message"):
+            pass
+    with tracer.span("login"):
+        pass
+
+    assert [span.name for span in collector.spans] == ["login"]
+    assert tracer.current is None
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span("poll") as span:
+        span.set("messages", 1)
+    assert tracer.current is None
+
+
+def test_dispatch_spans_to_jsonl(tmpdir, monkeypatch):
+    filename = str(tmpdir.join("spans.jsonl"))
+    exporter = JSONLExporter(filename)
+    monkeypatch.setattr(tracing.tracer, "exporter", exporter)
+
+    chat = Chat()
+    with tracing.tracer.span("chat.dispatch"):
+        chat._dispatch([{"type": "saytext", "accountid_from": 1, "text": "hi"}])
+    exporter.close()
+
+    with open(filename) as f:
+        spans = [json.loads(line) for line in f]
+    names = [span["name"] for span in spans]
+    assert names == ["emit", "chat.message", "chat.dispatch"]
+    assert spans[0]["attributes"] == {"event": "chat_message"}
+    assert spans[1]["parent_id"] == spans[2]["span_id"]